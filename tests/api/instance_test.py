@@ -7,6 +7,7 @@ import mock
 import yaml
 
 from treadmill import admin
+from treadmill import authz
 from treadmill import exc
 from treadmill import master
 from treadmill.api import instance
@@ -70,6 +71,35 @@ class ApiInstanceTest(unittest.TestCase):
         with self.assertRaises(exc.TreadmillError):
             self.instance.create('proid.app', yaml.load(doc))
 
+    @mock.patch('treadmill.context.ZkContext.conn', mock.Mock())
+    @mock.patch('treadmill.master.delete_apps', mock.Mock())
+    def test_bulk_delete(self):
+        """Test every instance delete is authorized, deleted at once."""
+        authorizer = mock.Mock()
+        api = instance.init(authorizer)
+
+        api.bulk_delete(['proid.app#1', 'proid.app#2'])
+
+        authorizer.authorize.assert_has_calls([
+            mock.call('treadmill.api.instance', 'delete',
+                      ('proid.app#1',), {}),
+            mock.call('treadmill.api.instance', 'delete',
+                      ('proid.app#2',), {}),
+        ])
+        self.assertEqual(authorizer.authorize.call_count, 2)
+        master.delete_apps.assert_called_once_with(
+            mock.ANY, ['proid.app#1', 'proid.app#2']
+        )
+
+        # Nothing is deleted if any instance delete is not authorized.
+        master.delete_apps.reset_mock()
+        authorizer.authorize.side_effect = [
+            None, authz.AuthorizationError(['denied'])
+        ]
+        with self.assertRaises(authz.AuthorizationError):
+            api.bulk_delete(['proid.app#1', 'proid.app#2'])
+        self.assertFalse(master.delete_apps.called)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,9 +1,16 @@
 """State API tests."""
 
+import os
+import shutil
+import sqlite3
+import tempfile
 import unittest
 
+import kazoo.client
 import mock
+import yaml
 
+from treadmill import master
 from treadmill.api import state
 
 
@@ -11,15 +18,16 @@ class ApiStateTest(unittest.TestCase):
     """treadmill.api.state tests."""
 
     def setUp(self):
+        self.root = tempfile.mkdtemp()
         self.cell_state = state.CellState()
 
-        self.cell_state.placement = {
+        self.cell_state.set_placement({
             'foo.bar#0000000001': {
                 'state': 'running', 'expires': 1234567890.1, 'host': 'baz1'
             }
-        }
+        })
 
-        self.cell_state.finished = {
+        finished = {
             'foo.bar#0000000002': {
                 'data': '0.0', 'host': 'baz1',
                 'when': '123456789.2', 'state': 'finished'
@@ -45,9 +53,14 @@ class ApiStateTest(unittest.TestCase):
                 'when': '1234567890.7', 'state': 'aborted'
             }
         }
+        self.cell_state.finished.update(
+            (name, yaml.dump(data).encode())
+            for name, data in finished.items()
+        )
 
     def tearDown(self):
-        pass
+        if self.root and os.path.isdir(self.root):
+            shutil.rmtree(self.root)
 
     @mock.patch('treadmill.context.GLOBAL', mock.Mock())
     @mock.patch('treadmill.api.state.watch_running', mock.Mock())
@@ -126,6 +139,217 @@ class ApiStateTest(unittest.TestCase):
             ]
         )
 
+        self.cell_state.update_placement(
+            'foo.baz#0000000001',
+            {'state': 'pending', 'expires': None, 'host': None}
+        )
+        self.assertEqual(
+            [item['name'] for item in state_api.list('foo.ba?')],
+            ['foo.bar#0000000001', 'foo.baz#0000000001']
+        )
+        self.assertEqual(
+            [item['name'] for item in state_api.list('foo.baz')],
+            ['foo.baz#0000000001']
+        )
+        self.assertEqual(state_api.list('foo.bar#00000000017'), [])
+
+    def test_watch_running(self):
+        """Tests updating placement state from running instances."""
+        watches = {}
+
+        def _watch(path):
+            """Capture watch callback."""
+            def _decorator(func):
+                watches[path] = func
+                return func
+            return _decorator
+
+        zkclient = mock.Mock()
+        zkclient.ChildrenWatch.side_effect = _watch
+
+        self.cell_state.update_placement(
+            'foo.bar#0000000002',
+            {'state': 'pending', 'expires': None, 'host': None}
+        )
+        state.watch_running(zkclient, self.cell_state)
+
+        watches['/running'](['foo.bar#0000000001'])
+        self.assertEqual(
+            'running', self.cell_state.placement['foo.bar#0000000001']['state']
+        )
+
+        watches['/running']([])
+        self.assertEqual(
+            'scheduled',
+            self.cell_state.placement['foo.bar#0000000001']['state']
+        )
+        self.assertEqual(
+            'pending', self.cell_state.placement['foo.bar#0000000002']['state']
+        )
+
+    def test_finished_store(self):
+        """Tests loading finished snapshot and parsed entries cache."""
+        db_path = os.path.join(self.root, 'finished.db')
+        conn = sqlite3.connect(db_path)
+        conn.execute('create table finished (path text, data text)')
+        conn.executemany(
+            'insert into finished values (?, ?)',
+            [
+                ('/finished/foo.bar#0000000002', None),
+                ('/finished/foo.baz#0000000001',
+                 '{"data": "0.0", "host": "baz2", "when": "1.0",'
+                 ' "state": "finished"}'),
+            ]
+        )
+        conn.commit()
+        conn.close()
+
+        finished = state.FinishedStore(cache_size=1)
+        finished.update([('foo.bar#0000000002', b'state: finished\n')])
+        self.assertEqual({'state': 'finished'},
+                         finished.get('foo.bar#0000000002'))
+
+        # Snapshot entries replace current ones.
+        finished.load_snapshot(db_path)
+        self.assertEqual(2, len(finished))
+        self.assertIsNone(finished.get('foo.bar#0000000002'))
+        self.assertEqual('baz2', finished.get('foo.baz#0000000001')['host'])
+        self.assertIsNone(finished.get('foo.bar#0000000003'))
+
+        self.assertIn('foo.bar#0000000002', finished)
+        self.assertEqual(['foo.baz#0000000001'], finished.names('foo.baz'))
+        self.assertEqual(
+            ['foo.bar#0000000002', 'foo.baz#0000000001'],
+            finished.names()
+        )
+
+    def test_watch_placement(self):
+        """Tests loading placement snapshot and deltas."""
+        watches = {}
+
+        def _watch(path):
+            """Capture watch callback."""
+            def _decorator(func):
+                watches[path] = func
+                return func
+            return _decorator
+
+        zkclient = mock.Mock()
+        zkclient.DataWatch.side_effect = _watch
+        zkclient.ChildrenWatch.side_effect = _watch
+
+        deltas = {
+            '/placement.deltas/0000000002': {
+                'placement': [['foo.bar#0000000002', 'baz2', 200.0]],
+                'removed': [],
+            },
+            '/placement.deltas/0000000003': {
+                'placement': [['foo.bar#0000000001', None, None]],
+                'removed': ['foo.bar#0000000002'],
+            },
+        }
+        zkclient.get.side_effect = lambda path: (
+            master.encode_placement(deltas[path]), None
+        )
+        zkclient.get_children.return_value = ['0000000002']
+
+        cell_state = state.CellState()
+        cell_state.running = set(['foo.bar#0000000001'])
+        state.watch_placement(zkclient, cell_state)
+
+        # Snapshot includes the first delta, second is applied.
+        watches['/placement'](
+            master.encode_placement({
+                'delta': 1,
+                'placement': [['foo.bar#0000000001', 'baz1', 100.0]],
+            }),
+            None,
+            None
+        )
+        self.assertEqual(2, cell_state.placement_delta)
+        self.assertEqual(
+            {
+                'foo.bar#0000000001': {
+                    'state': 'running', 'host': 'baz1', 'expires': 100.0,
+                },
+                'foo.bar#0000000002': {
+                    'state': 'scheduled', 'host': 'baz2', 'expires': 200.0,
+                },
+            },
+            cell_state.placement
+        )
+
+        watches['/placement.deltas'](['0000000002', '0000000003'])
+        self.assertEqual(3, cell_state.placement_delta)
+        self.assertEqual(
+            {
+                'foo.bar#0000000001': {
+                    'state': 'pending', 'host': None, 'expires': None,
+                },
+            },
+            cell_state.placement
+        )
+        self.assertEqual(['foo.bar#0000000001'], cell_state.placement_index)
+
+        # Out of order delta is not applied.
+        watches['/placement.deltas'](['0000000005'])
+        self.assertEqual(3, cell_state.placement_delta)
+
+        # Legacy YAML snapshot.
+        watches['/placement'](
+            yaml.dump(
+                [['foo.bar#0000000001', None, None, 'baz1', 100.0]]
+            ).encode(),
+            None,
+            None
+        )
+        self.assertIsNone(cell_state.placement_delta)
+        self.assertEqual(
+            {
+                'foo.bar#0000000001': {
+                    'state': 'running', 'host': 'baz1', 'expires': 100.0,
+                },
+            },
+            cell_state.placement
+        )
+
+    def test_watch_placement_no_deltas(self):
+        """Tests deltas are watched once created by the master."""
+        watches = {}
+
+        def _watch(path):
+            """Capture watch callback."""
+            def _decorator(func):
+                watches[path] = func
+                return func
+            return _decorator
+
+        zkclient = mock.Mock()
+        zkclient.DataWatch.side_effect = _watch
+        zkclient.ChildrenWatch.side_effect = _watch
+        zkclient.get_children.side_effect = kazoo.client.NoNodeError
+        zkclient.exists.return_value = None
+        snapshot = master.encode_placement({
+            'delta': 0,
+            'placement': [['foo.bar#0000000001', 'baz1', 100.0]],
+        })
+
+        state.watch_placement(zkclient, state.CellState())
+        watches['/placement'](None, None, None)
+        watches['/placement'](snapshot, None, None)
+
+        self.assertFalse(zkclient.ChildrenWatch.called)
+
+        # Created by the master, watched from the next snapshot on.
+        zkclient.exists.return_value = mock.Mock()
+        zkclient.get_children.side_effect = None
+        zkclient.get_children.return_value = []
+        watches['/placement'](snapshot, None, None)
+        watches['/placement'](snapshot, None, None)
+
+        zkclient.ChildrenWatch.assert_called_once_with('/placement.deltas')
+        self.assertIn('/placement.deltas', watches)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -2,9 +2,12 @@
 Unit test for appcfgmgr - configuring node apps
 """
 
+import errno
+import functools
 import os
 import shutil
 import tempfile
+import threading
 import time
 import unittest
 
@@ -297,87 +300,243 @@ class AppCfgMgrTest(unittest.TestCase):
             instance_names=set(['foo#1'])
         )
 
+    @mock.patch('treadmill.appcfgmgr.AppCfgMgr._configure', mock.Mock())
+    @mock.patch('treadmill.appcfgmgr.AppCfgMgr._refresh_supervisor',
+                mock.Mock())
+    @mock.patch('treadmill.appcfgmgr.AppCfgMgr._terminate', mock.Mock())
+    @mock.patch('treadmill.appcfg.eventfile_unique_name', mock.Mock())
+    def test__synchronize_unchanged(self):
+        """Tests that sync only configures changed cache entries.
+        """
+        # Access to a protected member _synchronize of a client class
+        # pylint: disable=W0212
+
+        def _fake_unique_name(name):
+            """Fake container unique name function.
+            """
+            uniquename = os.path.basename(name)
+            uniquename = uniquename.replace('#', '-')
+            uniquename += '_1234'
+            return uniquename
+        treadmill.appcfg.eventfile_unique_name.side_effect = _fake_unique_name
+        for app in ('proid.app#0', 'proid.app#1'):
+            # Create cache/ entry
+            with open(os.path.join(self.cache, app), 'w'):
+                pass
+            # Create configured app/ dir
+            uniquename = _fake_unique_name(app)
+            os.mkdir(os.path.join(self.apps, uniquename))
+            with open(os.path.join(self.apps, uniquename, 'manifest.yml'),
+                      'w'):
+                pass
+            # Create running/ symlink
+            os.symlink(os.path.join(self.apps, uniquename),
+                       os.path.join(self.running, app))
+
+        # Cache entry modified after the app was configured.
+        os.utime(os.path.join(self.cache, 'proid.app#1'),
+                 (time.time() + 10, time.time() + 10))
+
+        self.appcfgmgr._synchronize()
+
+        self.assertFalse(treadmill.appcfgmgr.AppCfgMgr._terminate.called)
+        treadmill.appcfgmgr.AppCfgMgr._configure.assert_called_once_with(
+            'proid.app#1'
+        )
+        treadmill.appcfgmgr.AppCfgMgr._refresh_supervisor.assert_called_with(
+            instance_names=set(['proid.app#0', 'proid.app#1'])
+        )
+
+    @mock.patch('treadmill.appcfgmgr.AppCfgMgr._configure',
+                mock.Mock(return_value=True))
+    @mock.patch('treadmill.appcfgmgr.AppCfgMgr._refresh_supervisor',
+                mock.Mock())
+    @mock.patch('treadmill.appcfgmgr.AppCfgMgr._terminate', mock.Mock())
+    def test__on_events(self):
+        """Tests cache events are handled by the worker pool.
+        """
+        # Access to a protected member of a client class
+        # pylint: disable=W0212
+        self.appcfgmgr._is_active = True
+
+        self.appcfgmgr._on_created(os.path.join(self.cache, 'foo#1'))
+        self.appcfgmgr._on_created(os.path.join(self.cache, '.foo#2'))
+        self.appcfgmgr._on_deleted(os.path.join(self.cache, 'bar#1'))
+        self.appcfgmgr._queue.wait()
+
+        treadmill.appcfgmgr.AppCfgMgr._configure.assert_called_once_with(
+            'foo#1'
+        )
+        treadmill.appcfgmgr.AppCfgMgr._terminate.assert_called_once_with(
+            'bar#1'
+        )
+
+        self.appcfgmgr._refresh_completed()
+        treadmill.appcfgmgr.AppCfgMgr._refresh_supervisor.assert_called_with(
+            instance_names=['foo#1']
+        )
+        self.assertEqual(
+            treadmill.appcfgmgr.AppCfgMgr._refresh_supervisor.call_count, 1
+        )
+        self.assertEqual(self.appcfgmgr.stats['configured'], 1)
+        self.assertEqual(self.appcfgmgr.stats['depth'], 0)
+
+        # Nothing completed, nothing to refresh.
+        treadmill.appcfgmgr.AppCfgMgr._refresh_supervisor.reset_mock()
+        self.appcfgmgr._refresh_completed()
+        self.assertFalse(
+            treadmill.appcfgmgr.AppCfgMgr._refresh_supervisor.called
+        )
+
+    def test_instance_queue(self):
+        """Tests tasks of an instance are run in order, one at a time.
+        """
+        # Access to a protected member of a client class
+        # pylint: disable=W0212
+        queue = appcfgmgr._InstanceQueue(workers=4)
+        events = []
+        lock = threading.Lock()
+
+        def _task(instance_name, action, delay):
+            """Record task start/end."""
+            with lock:
+                events.append((instance_name, action, 'start'))
+            time.sleep(delay)
+            with lock:
+                events.append((instance_name, action, 'end'))
+            if action == 'fail':
+                raise Exception('Boom')
+            return True
+
+        queue.submit('foo#1', 'configure',
+                     functools.partial(_task, 'foo#1', 'configure', 0.05))
+        queue.submit('bar#1', 'configure',
+                     functools.partial(_task, 'bar#1', 'configure', 0))
+        queue.submit('foo#1', 'terminate',
+                     functools.partial(_task, 'foo#1', 'terminate', 0))
+        queue.submit('foo#1', 'fail',
+                     functools.partial(_task, 'foo#1', 'fail', 0))
+        self.assertEqual(queue.stats()['max_depth'], 4)
+        queue.wait()
+
+        foo_events = [event for event in events if event[0] == 'foo#1']
+        self.assertEqual(
+            [
+                ('foo#1', 'configure', 'start'),
+                ('foo#1', 'configure', 'end'),
+                ('foo#1', 'terminate', 'start'),
+                ('foo#1', 'terminate', 'end'),
+                ('foo#1', 'fail', 'start'),
+                ('foo#1', 'fail', 'end'),
+            ],
+            foo_events
+        )
+        # Other instances are not blocked.
+        self.assertLess(events.index(('bar#1', 'configure', 'end')),
+                        events.index(('foo#1', 'configure', 'end')))
+
+        self.assertEqual(
+            sorted(queue.completed()),
+            [
+                ('bar#1', 'configure', True),
+                ('foo#1', 'configure', True),
+                ('foo#1', 'fail', False),
+                ('foo#1', 'terminate', True),
+            ]
+        )
+        self.assertEqual(queue.completed(), [])
+
+        stats = queue.stats()
+        self.assertEqual(stats['depth'], 0)
+        self.assertEqual(stats['configured'], 2)
+        self.assertGreaterEqual(stats['configure_time_max'], 0.05)
+
     @mock.patch('time.sleep', mock.Mock())
-    @mock.patch('treadmill.subproc.call',
-                mock.Mock(side_effect=[1, 1, 0, 1, 0]))
     @mock.patch('treadmill.subproc.check_call', mock.Mock())
+    @mock.patch('treadmill.s6.supervise.is_supervised',
+                mock.Mock(side_effect=[False, False, True, False, True]))
+    @mock.patch('treadmill.s6.supervise.control', mock.Mock())
     def test__refresh_supervisor(self):
         """Check how the supervisor is beeing refreshed.
         """
         # Access to a protected member _refresh_supervisor of a client class
         # pylint: disable=W0212
+        os.symlink(os.path.join(self.apps, 'foo-1'),
+                   os.path.join(self.running, 'foo#1'))
+        os.symlink(os.path.join(self.apps, 'bar-2'),
+                   os.path.join(self.running, 'bar#2'))
 
         self.appcfgmgr._refresh_supervisor(
             instance_names=['foo#1', 'bar#2']
         )
 
-        treadmill.subproc.check_call.assert_has_calls(
+        treadmill.subproc.check_call.assert_called_with(
             [
-                mock.call(
-                    [
-                        's6_svscanctl',
-                        '-an',
-                        self.running
-                    ]
-                ),
-                mock.call(
-                    [
-                        's6_svc',
-                        '-uO',
-                        os.path.join(self.running, 'foo#1'),
-                    ]
-                ),
-                mock.call(
-                    [
-                        's6_svc',
-                        '-uO',
-                        os.path.join(self.running, 'bar#2'),
-                    ]
-                ),
-            ],
-            any_order=True
+                's6_svscanctl',
+                '-an',
+                self.running
+            ]
+        )
+        treadmill.s6.supervise.control.assert_has_calls(
+            [
+                mock.call(os.path.join(self.running, 'foo#1'), 'uO'),
+                mock.call(os.path.join(self.running, 'bar#2'), 'uO'),
+            ]
         )
         # Make sure we did the right amount of retries
-        treadmill.subproc.call.assert_has_calls(
+        treadmill.s6.supervise.is_supervised.assert_has_calls(
             [
-                mock.call(
-                    [
-                        's6_svok',
-                        os.path.join(self.running, 'foo#1'),
-                    ]
-                ),
-                mock.call(
-                    [
-                        's6_svok',
-                        os.path.join(self.running, 'foo#1'),
-                    ]
-                ),
-                mock.call(
-                    [
-                        's6_svok',
-                        os.path.join(self.running, 'foo#1'),
-                    ]
-                ),
-                mock.call(
-                    [
-                        's6_svok',
-                        os.path.join(self.running, 'bar#2'),
-                    ]
-                ),
-                mock.call(
-                    [
-                        's6_svok',
-                        os.path.join(self.running, 'bar#2'),
-                    ]
-                ),
-            ],
-            any_order=True
+                mock.call(os.path.join(self.running, 'foo#1')),
+                mock.call(os.path.join(self.running, 'foo#1')),
+                mock.call(os.path.join(self.running, 'foo#1')),
+                mock.call(os.path.join(self.running, 'bar#2')),
+                mock.call(os.path.join(self.running, 'bar#2')),
+            ]
         )
         self.assertEqual(
             time.sleep.call_count,
             3
         )
 
+    @mock.patch('time.sleep', mock.Mock())
+    @mock.patch('treadmill.subproc.check_call', mock.Mock())
+    @mock.patch('treadmill.s6.supervise.is_supervised',
+                mock.Mock(return_value=False))
+    @mock.patch('treadmill.s6.supervise.control', mock.Mock())
+    def test__refresh_supervisor_terminated(self):
+        """Check instances terminated concurrently are skipped.
+        """
+        # Access to a protected member _refresh_supervisor of a client class
+        # pylint: disable=W0212
+        treadmill.s6.supervise.control.side_effect = [
+            OSError(errno.ENOENT, 'No such file or directory'),
+            OSError(errno.ENXIO, 'No such device or address'),
+        ]
+        os.symlink(os.path.join(self.apps, 'bar-2'),
+                   os.path.join(self.running, 'bar#2'))
+
+        self.appcfgmgr._refresh_supervisor(
+            instance_names=['foo#1', 'bar#2']
+        )
+
+        treadmill.s6.supervise.control.assert_has_calls(
+            [
+                mock.call(os.path.join(self.running, 'foo#1'), 'uO'),
+                mock.call(os.path.join(self.running, 'bar#2'), 'uO'),
+            ]
+        )
+        # No wait for the supervisor once the running link is gone.
+        self.assertEqual(
+            treadmill.s6.supervise.is_supervised.call_count,
+            51
+        )
+
+        treadmill.s6.supervise.control.side_effect = OSError(
+            errno.EACCES, 'Permission denied'
+        )
+        with self.assertRaises(OSError):
+            self.appcfgmgr._refresh_supervisor(instance_names=['bar#2'])
+
 
 if __name__ == '__main__':
     unittest.main()
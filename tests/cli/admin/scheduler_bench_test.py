@@ -0,0 +1,111 @@
+"""Unit test for treadmill.cli.admin.scheduler_bench
+"""
+
+import unittest
+
+from treadmill import scheduler
+from treadmill.cli.admin import scheduler_bench
+
+
+def _params(**kwargs):
+    """Small cell benchmark parameters."""
+    params = {
+        'servers': 20,
+        'servers_per_rack': 5,
+        'racks_per_building': 2,
+        'capacity': [100, 100, 100],
+        'traits': 2,
+        'partitions': 2,
+        'tenants': 2,
+        'allocations': 4,
+        'reserved': 0.8,
+        'apps': 60,
+        'affinities': 10,
+        'max_demand': 0.25,
+        'identity_groups': 2,
+        'identity_count': 3,
+        'rounds': 3,
+        'churn': 0.1,
+        'new_apps': 0,
+        'seed': 1,
+        'capacity_store': False,
+        'incremental': False,
+    }
+    params.update(kwargs)
+    return params
+
+
+def _placements(results):
+    """Per-round schedule stats, without timing."""
+    return [
+        {key: value for key, value in stats.items() if key != 'time'}
+        for stats in results['schedules']
+    ]
+
+
+class SchedulerBenchTest(unittest.TestCase):
+    """Tests for teadmill.cli.admin.scheduler_bench"""
+
+    def setUp(self):
+        self.dimension_count = scheduler.DIMENSION_COUNT
+
+    def tearDown(self):
+        scheduler.DIMENSION_COUNT = self.dimension_count
+
+    def test_run_bench(self):
+        """Test benchmark runs, same schedule stats in all cell modes."""
+        results = scheduler_bench.run_bench(_params())
+
+        self.assertEqual(len(results['schedules']), 4)
+        self.assertEqual(results['summary']['servers'], 20)
+        self.assertEqual(results['summary']['apps'], 60)
+        self.assertEqual(
+            [stats['round'] for stats in results['schedules']],
+            [0, 1, 2, 3]
+        )
+        first = results['schedules'][0]
+        self.assertGreater(first['placed'], 0)
+        self.assertEqual(first['new'], first['placed'])
+        self.assertLessEqual(results['summary']['min'],
+                             results['summary']['max'])
+
+        expected = _placements(results)
+        for kwargs in ({'capacity_store': True},
+                       {'incremental': True},
+                       {'capacity_store': True, 'incremental': True}):
+            self.assertEqual(
+                _placements(scheduler_bench.run_bench(_params(**kwargs))),
+                expected,
+                kwargs
+            )
+
+    def test_modes_placement(self):
+        """Test every app is placed on the same server in all cell modes."""
+        # Access to a protected member
+        # pylint: disable=W0212
+        def _run(**kwargs):
+            """Return placement of every app, for each round."""
+            params = _params(apps=120, **kwargs)
+            scheduler.DIMENSION_COUNT = len(params['capacity'])
+            bench = scheduler_bench._Bench(params)
+            rounds = []
+            for round_idx in range(0, params['rounds'] + 1):
+                if round_idx:
+                    bench.churn()
+                bench.schedule()
+                rounds.append({
+                    name: app.server
+                    for name, app in bench.cell.apps.items()
+                })
+            return rounds
+
+        expected = _run()
+        self.assertIn(None, expected[0].values())
+        for kwargs in ({'capacity_store': True},
+                       {'incremental': True},
+                       {'capacity_store': True, 'incremental': True}):
+            self.assertEqual(_run(**kwargs), expected, kwargs)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+"""Performance test for the directory watcher.
+
+A writer thread creates and rewrites files at a fixed rate (10k writes per
+second) while the watcher processes the events; reports the number of
+callbacks and the watcher processing time per file write, for the default mode,
+close_write mode, and close_write mode with coalescing:
+
+    python tests/dirwatch_perf.py
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from treadmill import dirwatch
+
+
+_WRITES_PER_SEC = 10000
+_DURATION = 2
+_FILES = 1000
+
+
+def _writer(root, stop):
+    """Write files at ``_WRITES_PER_SEC``, in two chunks each."""
+    writes = 0
+    start_time = time.time()
+    while time.time() - start_time < _DURATION:
+        # Batch writes every millisecond to keep up the rate.
+        target = int((time.time() - start_time) * _WRITES_PER_SEC)
+        while writes < target:
+            path = os.path.join(root, 'file-%d' % (writes % _FILES))
+            with open(path, 'w') as f:
+                f.write('hello')
+                f.flush()
+                f.write(' world!')
+            writes += 1
+        time.sleep(0.001)
+
+    stop.append(writes)
+
+
+def run(**kwargs):
+    """Time event processing with the given watcher options."""
+    root = tempfile.mkdtemp()
+    try:
+        watcher = dirwatch.DirWatcher(root, **kwargs)
+        callbacks = []
+        watcher.on_created = callbacks.append
+        watcher.on_modified = callbacks.append
+
+        stop = []
+        writer = threading.Thread(target=_writer, args=(root, stop))
+        writer.start()
+
+        busy = 0
+        while not stop or watcher.wait_for_events(timeout=0):
+            if watcher.wait_for_events(timeout=0.1):
+                start_time = time.time()
+                watcher.process_events()
+                busy += time.time() - start_time
+        # Flush coalesced events.
+        while watcher.wait_for_events(timeout=kwargs.get('debounce', 0)):
+            start_time = time.time()
+            watcher.process_events()
+            busy += time.time() - start_time
+        writer.join()
+
+    finally:
+        shutil.rmtree(root)
+
+    writes = stop[0]
+    print('%-32s writes: %6d, callbacks/write: %5.2f, '
+          'processing: %6.2fus/write' % (
+              ', '.join('%s=%s' % item for item in sorted(kwargs.items())) or
+              'default',
+              writes,
+              len(callbacks) / writes,
+              busy * 1e6 / writes,
+          ))
+
+
+if __name__ == '__main__':
+    run()
+    run(close_write=True)
+    run(close_write=True, debounce=0.5)
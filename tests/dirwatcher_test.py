@@ -6,6 +6,7 @@ import os
 import shutil
 import sys
 import tempfile
+import time
 import unittest
 
 import mock
@@ -61,6 +62,143 @@ class DirWatcherTest(unittest.TestCase):
             res,
         )
 
+    @unittest.skipUnless(sys.platform.startswith('linux'), 'Requires Linux')
+    def test_close_write(self):
+        """Tests close_write mode, files are reported once written."""
+        test_file = os.path.join(self.root, 'a')
+        test_link = os.path.join(self.root, 'b')
+        tmp_file = os.path.join(self.root, '.c')
+
+        watcher = dirwatch.DirWatcher(self.root, close_write=True)
+
+        with open(test_file, 'w') as f:
+            f.write('hello')
+            f.flush()
+            os.chmod(test_file, 0o600)
+            f.write(' world!')
+        os.symlink(test_file, test_link)
+        with open(test_file, 'a') as f:
+            f.write(' again')
+        with open(tmp_file, 'w') as f:
+            f.write('hello')
+        os.rename(tmp_file, os.path.join(self.root, 'c'))
+        os.unlink(test_file)
+
+        self.assertEqual(
+            [
+                (dirwatch.DirWatcherEvent.CREATED, test_file, None),
+                (dirwatch.DirWatcherEvent.CREATED, test_link, None),
+                (dirwatch.DirWatcherEvent.MODIFIED, test_file, None),
+                (dirwatch.DirWatcherEvent.CREATED, tmp_file, None),
+                (dirwatch.DirWatcherEvent.DELETED, tmp_file, None),
+                (dirwatch.DirWatcherEvent.CREATED,
+                 os.path.join(self.root, 'c'), None),
+                (dirwatch.DirWatcherEvent.DELETED, test_file, None),
+            ],
+            watcher.process_events(),
+        )
+
+    @unittest.skipUnless(sys.platform.startswith('linux'), 'Requires Linux')
+    @mock.patch('time.time', mock.Mock(return_value=100))
+    def test_debounce(self):
+        """Tests coalescing of events for the same path."""
+        test_file = os.path.join(self.root, 'a')
+        tmp_file = os.path.join(self.root, 'b')
+
+        watcher = dirwatch.DirWatcher(self.root, debounce=1)
+
+        with open(test_file, 'w') as f:
+            f.write('hello')
+        for _ in range(3):
+            with open(test_file, 'a') as f:
+                f.write(' world!')
+        with open(tmp_file, 'w') as f:
+            f.write('hello')
+        os.unlink(tmp_file)
+
+        self.assertTrue(watcher.wait_for_events(0))
+        self.assertEqual([], watcher.process_events())
+        self.assertFalse(watcher.wait_for_events(0))
+
+        time.time.return_value = 101
+        self.assertTrue(watcher.wait_for_events(0))
+        self.assertEqual(
+            [
+                (dirwatch.DirWatcherEvent.CREATED, test_file, None),
+            ],
+            watcher.process_events(),
+        )
+
+        os.unlink(test_file)
+        with open(test_file, 'w') as f:
+            f.write('hello')
+        watcher.process_events()
+
+        time.time.return_value = 102
+        self.assertEqual(
+            [
+                (dirwatch.DirWatcherEvent.DELETED, test_file, None),
+                (dirwatch.DirWatcherEvent.CREATED, test_file, None),
+            ],
+            watcher.process_events(),
+        )
+
+    @unittest.skipUnless(sys.platform.startswith('linux'), 'Requires Linux')
+    def test_recursive(self):
+        """Tests recursive watches."""
+        subdir = os.path.join(self.root, 'x')
+        os.makedirs(os.path.join(subdir, 'y'))
+
+        watcher = dirwatch.DirWatcher(self.root, close_write=True,
+                                      recursive=True)
+
+        # Existing subdirectories are watched.
+        open(os.path.join(subdir, 'y', 'a'), 'w').close()
+        self.assertEqual(
+            [
+                (dirwatch.DirWatcherEvent.CREATED,
+                 os.path.join(subdir, 'y', 'a'), None),
+            ],
+            watcher.process_events(),
+        )
+
+        # New subdirectories are watched.
+        newdir = os.path.join(self.root, 'z')
+        os.mkdir(newdir)
+        open(os.path.join(newdir, 'b'), 'w').close()
+        res = watcher.process_events()
+        self.assertEqual(
+            (dirwatch.DirWatcherEvent.CREATED, newdir, None),
+            res[0]
+        )
+        self.assertIn(
+            (dirwatch.DirWatcherEvent.CREATED,
+             os.path.join(newdir, 'b'), None),
+            res
+        )
+
+        open(os.path.join(newdir, 'c'), 'w').close()
+        self.assertEqual(
+            [
+                (dirwatch.DirWatcherEvent.CREATED,
+                 os.path.join(newdir, 'c'), None),
+            ],
+            watcher.process_events(),
+        )
+
+        # Removed subdirectories are unwatched.
+        shutil.rmtree(subdir)
+        res = watcher.process_events()
+        self.assertIn((dirwatch.DirWatcherEvent.DELETED, subdir, None), res)
+        self.assertEqual(
+            1,
+            res.count((dirwatch.DirWatcherEvent.DELETED, subdir, None))
+        )
+        self.assertEqual(
+            sorted(watcher._watches.values()),  # pylint: disable=W0212
+            [self.root, newdir]
+        )
+
     @unittest.skipUnless(sys.platform == 'linux2', 'Requires Linux')
     @mock.patch('select.poll', mock.Mock())
     def test_signal(self):
@@ -104,7 +104,7 @@ class EventMgrTest(mockzk.MockZookeeperTestCase):
         """
         # Access to a protected member _cache of a client class
         # pylint: disable=W0212
-        treadmill.zkutils.get.return_value = {}
+        treadmill.zkutils.get.return_value = ({}, None)
 
         zkclient = kazoo.client.KazooClient()
         self.evmgr._cache(zkclient, 'foo#001')
@@ -112,6 +112,36 @@ class EventMgrTest(mockzk.MockZookeeperTestCase):
         appcache = os.path.join(self.cache, 'foo#001')
         self.assertTrue(os.path.exists(appcache))
 
+    @mock.patch('treadmill.zkutils.get', mock.Mock())
+    def test__cache_unchanged(self):
+        """Tests cached manifest is rewritten only if app node changed.
+        """
+        # Access to a protected member _cache of a client class
+        # pylint: disable=W0212
+        manifest_stat = mock.Mock(mzxid=10)
+        placement_stat = mock.Mock(mzxid=20)
+        treadmill.zkutils.get.side_effect = lambda *_args, **_kwargs: (
+            {'memory': '1G'}, manifest_stat
+        ) if _args[1].startswith('/scheduled') else ({}, placement_stat)
+
+        zkclient = kazoo.client.KazooClient()
+        appcache = os.path.join(self.cache, 'foo#001')
+
+        self.assertTrue(self.evmgr._cache(zkclient, 'foo#001'))
+        self.assertFalse(self.evmgr._cache(zkclient, 'foo#001'))
+
+        # Cache file removed, it is written again.
+        os.unlink(appcache)
+        self.assertTrue(self.evmgr._cache(zkclient, 'foo#001'))
+
+        manifest_stat.mzxid = 11
+        self.assertTrue(self.evmgr._cache(zkclient, 'foo#001'))
+        self.assertFalse(self.evmgr._cache(zkclient, 'foo#001'))
+
+        placement_stat.mzxid = 21
+        self.assertTrue(self.evmgr._cache(zkclient, 'foo#001'))
+        self.assertTrue(os.path.exists(appcache))
+
     @mock.patch('treadmill.zkutils.get', mock.Mock())
     def test__cache_notfound(self):
         """Tests application cache event when app is not found.
@@ -165,6 +195,36 @@ class EventMgrTest(mockzk.MockZookeeperTestCase):
         )
         self.assertFalse(treadmill.eventmgr.EventMgr._cache.called)
 
+    @mock.patch('glob.glob', mock.Mock())
+    @mock.patch('treadmill.eventmgr.EventMgr._cache', mock.Mock())
+    def test__synchronize_existing(self):
+        """Checks manifests cached by the process are refreshed on request."""
+        # Access to a protected member _synchronize of a client class
+        # pylint: disable=W0212
+        existing_apps = ['proid.app#0', 'proid.app#1']
+        glob.glob.side_effect = lambda _pattern: [
+            os.path.join(self.cache, app) for app in existing_apps
+        ]
+        self.evmgr._versions['proid.app#1'] = (1, 2)
+
+        zkclient = kazoo.client.KazooClient()
+        self.evmgr._synchronize(zkclient, existing_apps + ['proid.app#2'])
+        treadmill.eventmgr.EventMgr._cache.assert_called_once_with(
+            zkclient, 'proid.app#2'
+        )
+
+        treadmill.eventmgr.EventMgr._cache.reset_mock()
+        self.evmgr._synchronize(zkclient, existing_apps + ['proid.app#2'],
+                                check_existing=True)
+        treadmill.eventmgr.EventMgr._cache.assert_has_calls(
+            [
+                mock.call(zkclient, 'proid.app#1'),
+                mock.call(zkclient, 'proid.app#2'),
+            ],
+            any_order=True
+        )
+        self.assertEqual(2, treadmill.eventmgr.EventMgr._cache.call_count)
+
     @mock.patch('kazoo.client.KazooClient.get', mock.Mock())
     @mock.patch('kazoo.client.KazooClient.exists', mock.Mock())
     @mock.patch('kazoo.client.KazooClient.get_children', mock.Mock())
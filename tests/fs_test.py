@@ -3,6 +3,7 @@
 
 import os
 import shutil
+import struct
 import tarfile
 import tempfile
 import unittest
@@ -330,6 +331,41 @@ Directory Hash Seed:      20c6af65-0208-4e71-99cb-d5532c02e3b8
         self.assertEqual(res['free blocks'], '3')
         self.assertEqual(res['block size'], '1024')
 
+    def test_read_filesystem_superblock(self):
+        """Test fs.read_filesystem_superblock()."""
+        superblock = bytearray(1024)
+        struct.pack_into('<III', superblock, 4, 1, 2, 3)
+        struct.pack_into('<I', superblock, 24, 2)
+        struct.pack_into('<H', superblock, 56, 0xEF53)
+        device = os.path.join(self.root, 'device')
+        with open(device, 'wb') as f:
+            f.write(bytes(1024) + bytes(superblock))
+
+        res = fs.read_filesystem_superblock(device)
+
+        self.assertEqual(res['block count'], '1')
+        self.assertEqual(res['reserved block count'], '2')
+        self.assertEqual(res['free blocks'], '3')
+        self.assertEqual(res['block size'], '4096')
+
+        # 64bit feature
+        struct.pack_into('<I', superblock, 96, 0x80)
+        struct.pack_into('<III', superblock, 336, 1, 0, 1)
+        with open(device, 'wb') as f:
+            f.write(bytes(1024) + bytes(superblock))
+
+        res = fs.read_filesystem_superblock(device)
+
+        self.assertEqual(res['block count'], str((1 << 32) + 1))
+        self.assertEqual(res['free blocks'], str((1 << 32) + 3))
+
+        # Not an ext filesystem
+        with open(device, 'wb') as f:
+            f.write(bytes(2048))
+
+        with self.assertRaises(ValueError):
+            fs.read_filesystem_superblock(device)
+
     @mock.patch('glob.glob',
                 mock.Mock(return_value=('/sys/class/block/sda2/dev',
                                         '/sys/class/block/sda3/dev')))
@@ -812,6 +812,55 @@ class IptablesTest(unittest.TestCase):
             'restore', cmd_input='Initial IPSet state'
         )
 
+    @mock.patch('treadmill.iptables._iptables_restore', mock.Mock())
+    def test_configure_nat_chains(self):
+        """Test atomic replacement of NAT chains"""
+        # Disable W0212: Test access protected members of admin module.
+        # pylint: disable=W0212
+        iptables.configure_nat_chains({
+            'TEST_DNAT': set([
+                firewall.DNATRule(proto='tcp',
+                                  dst_ip='1.1.1.1', dst_port=123,
+                                  new_ip='2.2.2.2', new_port=345),
+            ]),
+            'TEST_PASSTHROUGH': set([
+                firewall.PassThroughRule(src_ip='3.3.3.3',
+                                         dst_ip='4.4.4.4'),
+            ]),
+            'TEST_EMPTY': set(),
+        })
+
+        treadmill.iptables._iptables_restore.assert_called_with(
+            '*nat\n'
+            ':TEST_DNAT - [0:0]\n'
+            '-F TEST_DNAT\n'
+            '-A TEST_DNAT -s 0.0.0.0/0 -d 1.1.1.1 -p tcp -m tcp --dport 123'
+            ' -j DNAT --to-destination 2.2.2.2:345\n'
+            ':TEST_EMPTY - [0:0]\n'
+            '-F TEST_EMPTY\n'
+            ':TEST_PASSTHROUGH - [0:0]\n'
+            '-F TEST_PASSTHROUGH\n'
+            '-A TEST_PASSTHROUGH -s 3.3.3.3 -j DNAT'
+            ' --to-destination 4.4.4.4\n'
+            'COMMIT',
+            noflush=True
+        )
+
+    @mock.patch('treadmill.iptables.ipset_restore', mock.Mock())
+    def test_ipset_update(self):
+        """Test batched IPSet changes"""
+        iptables.ipset_update([])
+        self.assertFalse(treadmill.iptables.ipset_restore.called)
+
+        iptables.ipset_update([
+            ('add', 'foo', '1.2.3.4'),
+            ('del', 'foo', '5.6.7.8'),
+        ])
+        treadmill.iptables.ipset_restore.assert_called_with(
+            'add foo 1.2.3.4\n'
+            'del foo 5.6.7.8\n'
+        )
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,294 @@
+"""Performance test for treadmill.master startup.
+"""
+
+import collections
+import fnmatch
+import os
+import time
+import timeit
+
+import kazoo
+import kazoo.client
+import yaml
+
+from treadmill import master
+from treadmill import scheduler
+from treadmill import zkutils
+from treadmill import zknamespace as z
+
+
+class _FakeTransaction(object):
+    """In-memory Zookeeper transaction."""
+
+    def __init__(self, zkclient):
+        self.zkclient = zkclient
+        self.ops = []
+
+    def create(self, path, value=b'', **_kwargs):
+        """Add create operation."""
+        self.ops.append(lambda: self.zkclient.create(path, value))
+
+    def delete(self, path):
+        """Add delete operation."""
+        self.ops.append(lambda: self.zkclient.delete(path))
+
+    def set_data(self, path, value):
+        """Add set operation."""
+        self.ops.append(lambda: self.zkclient.set(path, value))
+
+    def commit(self):
+        """Apply all operations."""
+        return [op() or True for op in self.ops]
+
+
+class _FakeZk(object):
+    """In-memory Zookeeper, enough to run master startup."""
+
+    def __init__(self, latency=0.0):
+        self.nodes = {'/': b''}
+        self.children = collections.defaultdict(set)
+        self.latency = latency
+
+    def _round_trip(self):
+        """Simulate network round trip."""
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _add(self, path, value):
+        """Add node, create parents if needed."""
+        if path not in self.nodes:
+            parent, name = os.path.split(path)
+            if parent not in self.nodes:
+                self._add(parent, b'')
+            self.children[parent].add(name)
+        self.nodes[path] = value
+
+    def create(self, path, value=b'', **_kwargs):
+        """Create node."""
+        self._round_trip()
+        if path in self.nodes:
+            raise kazoo.client.NodeExistsError()
+        self._add(path, value)
+        return path
+
+    def set(self, path, value, **_kwargs):
+        """Set node data."""
+        self._round_trip()
+        if path not in self.nodes:
+            raise kazoo.client.NoNodeError()
+        self.nodes[path] = value
+
+    def set_acls(self, path, _acls, **_kwargs):
+        """Set node acls."""
+        if path not in self.nodes:
+            raise kazoo.client.NoNodeError()
+
+    def get(self, path, watch=None):  # pylint: disable=W0613
+        """Get node data."""
+        self._round_trip()
+        if path not in self.nodes:
+            raise kazoo.client.NoNodeError()
+        return self.nodes[path], None
+
+    def get_children(self, path, watch=None):  # pylint: disable=W0613
+        """Get node children."""
+        self._round_trip()
+        if path not in self.nodes:
+            raise kazoo.client.NoNodeError()
+        return list(self.children[path])
+
+    def exists(self, path, watch=None):  # pylint: disable=W0613
+        """Check if node exists."""
+        self._round_trip()
+        return path in self.nodes or None
+
+    def delete(self, path, **_kwargs):
+        """Delete node."""
+        if path not in self.nodes:
+            raise kazoo.client.NoNodeError()
+        del self.nodes[path]
+        parent, name = os.path.split(path)
+        self.children[parent].discard(name)
+
+    def transaction(self):
+        """Start transaction."""
+        return _FakeTransaction(self)
+
+    def ChildrenWatch(self, path):  # pylint: disable=C0103
+        """Invoke the watch once with current children."""
+        def _decorator(func):
+            """Watch decorator."""
+            func(self.get_children(path))
+            return func
+        return _decorator
+
+
+def _make_zk(servers_count, apps_count, servers_per_rack=40):
+    """Create cell with given number of servers and scheduled apps.
+
+    All apps are placed, as after master restart.
+    """
+    zkclient = _FakeZk()
+    now = int(time.time())
+
+    servers = []
+    for idx in range(0, servers_count):
+        rack = 'rack:%s' % (idx // servers_per_rack)
+        if idx % servers_per_rack == 0:
+            zkutils.put(zkclient, z.path.bucket(rack),
+                        {'traits': 0, 'level': 'rack'})
+            zkutils.put(zkclient, z.path.cell(rack))
+
+        servername = 'server%05d.xx.com' % idx
+        zkutils.put(zkclient, z.path.server(servername), {
+            'memory': '256G', 'disk': '1T', 'cpu': '4800%',
+            'parent': rack, 'up_since': now,
+        })
+        zkutils.put(zkclient, z.path.server_presence(servername))
+        zkutils.put(zkclient, z.path.placement(servername),
+                    {'state': 'up', 'since': now})
+        servers.append(servername)
+
+    for idx in range(0, apps_count):
+        appname = 'proid%s.app%s#%010d' % (idx % 50, idx % 1000, idx)
+        zkutils.put(zkclient, z.path.scheduled(appname), {
+            'memory': '%sM' % (100 + idx % 10 * 100),
+            'disk': '1G',
+            'cpu': '%s%%' % (10 + idx % 5 * 10),
+            'affinity': appname.split('#')[0],
+            'environment': 'dev',
+            'services': [
+                {'name': 'web', 'command': '/bin/sleep 1000',
+                 'restart': {'limit': 5, 'interval': 60}},
+            ],
+            'endpoints': [{'name': 'http', 'port': 8000}],
+        })
+        zkutils.put(zkclient,
+                    z.path.placement(servers[idx % servers_count], appname),
+                    {'identity': None, 'expires': now + 3600})
+
+    return zkclient
+
+
+def test_startup(servers_count, apps_count, codec, loader):
+    """Store cell with given codec, then run master startup."""
+    zkutils.set_codec(codec)
+    zkclient = _make_zk(servers_count, apps_count)
+    zkutils.set_codec('yaml')
+
+    # pylint: disable=W0212
+    saved_loader = zkutils._YAML_LOADER
+    zkutils._YAML_LOADER = loader
+    try:
+        cell_master = _run_master(zkclient)
+    finally:
+        zkutils._YAML_LOADER = saved_loader
+
+    print('codec: %s, loader: %s' % (codec, loader.__name__))
+    return cell_master
+
+
+def test_startup_latency(servers_count, apps_count, latency, max_inflight):
+    """Run master startup with given round trip latency and concurrency."""
+    zkclient = _make_zk(servers_count, apps_count)
+    zkclient.latency = latency
+
+    saved_max_inflight = zkutils.ZK_MAX_INFLIGHT
+    zkutils.ZK_MAX_INFLIGHT = max_inflight
+    try:
+        cell_master = _run_master(zkclient)
+    finally:
+        zkutils.ZK_MAX_INFLIGHT = saved_max_inflight
+
+    print('latency: %.4fs, max inflight: %s' % (latency, max_inflight))
+    return cell_master
+
+
+def _run_master(zkclient):
+    """Load cell state, print per phase timings."""
+    cell_master = master.Master(zkclient, 'perf')
+    cell_master.exit = True
+    interval = timeit.timeit(stmt=cell_master.run_real, number=1)
+
+    print('servers: %s, apps: %s, time: %.2fs' % (
+        len(cell_master.servers), len(cell_master.cell.apps), interval))
+    for phase, duration in cell_master.load_timings.items():
+        print('    %-16s: %.2fs' % (phase, duration))
+    return cell_master
+
+
+def _make_assignments(proids_count, apps_per_proid):
+    """Create assignment table: proid wide, app prefix and few patterns with
+    wildcard proid.
+    """
+    suffix = '[#]' + '[0-9]' * 10
+    assignments = {}
+    for proid_idx in range(0, proids_count):
+        proid = 'proid%s' % proid_idx
+        assignments[proid + '.*' + suffix] = (1, proid)
+        for app_idx in range(0, apps_per_proid):
+            pattern = '%s.app%s.*' % (proid, app_idx)
+            assignments[pattern + suffix] = (app_idx, proid)
+
+    for idx in range(0, proids_count // 50):
+        pattern = 'proid%s*.canary%s*' % (idx, idx)
+        assignments[pattern + suffix] = (100, 'canary')
+
+    return assignments
+
+
+def test_find_assignment(proids_count, apps_per_proid, apps_count):
+    """Match app names with fnmatch over sorted patterns and with compiled
+    matcher.
+    """
+    assignments = _make_assignments(proids_count, apps_per_proid)
+    names = [
+        'proid%s.app%s.%s#%010d' % (
+            idx % (proids_count + 10), idx % (apps_per_proid + 2),
+            'canary1' if idx % 100 == 0 else 'prod', idx
+        )
+        for idx in range(0, apps_count)
+    ]
+
+    def _fnmatch():
+        """Match each name against reverse sorted patterns."""
+        found = []
+        for name in names:
+            match = None
+            for pattern, assignment in reversed(sorted(assignments.items())):
+                if fnmatch.fnmatch(name, pattern):
+                    match = (pattern, assignment)
+                    break
+            found.append(match)
+        return found
+
+    def _compiled():
+        """Match each name with compiled matcher."""
+        matcher = master.AssignmentMatcher(assignments)
+        return [matcher.match(name) for name in names]
+
+    linear = timeit.timeit(stmt=_fnmatch, number=1)
+    compiled = timeit.timeit(stmt=_compiled, number=1)
+    assert _fnmatch() == _compiled()
+
+    print('assignments: %s, apps: %s, fnmatch: %.2fs, compiled: %.2fs' % (
+        len(assignments), apps_count, linear, compiled))
+    return linear, compiled
+
+
+if __name__ == '__main__':
+    scheduler.DIMENSION_COUNT = 3
+
+    _SERVERS = 4000
+    _APPS = 100000
+    test_startup(_SERVERS, _APPS, 'yaml', yaml.SafeLoader)
+    test_startup(_SERVERS, _APPS, 'yaml',
+                 getattr(yaml, 'CSafeLoader', yaml.SafeLoader))
+    test_startup(_SERVERS, _APPS, 'json', yaml.SafeLoader)
+
+    # Round trip latency of 0.5ms, sequential and concurrent reads.
+    test_startup_latency(1000, 10000, 0.0005, 1)
+    test_startup_latency(1000, 10000, 0.0005, zkutils.ZK_MAX_INFLIGHT)
+
+    test_find_assignment(500, 4, 10000)
+    test_find_assignment(1000, 4, 20000)
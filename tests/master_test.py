@@ -4,6 +4,7 @@
 # Disable C0302: Too many lines in the module
 # pylint: disable=C0302
 
+import fnmatch
 import os
 import shutil
 import tempfile
@@ -229,6 +230,48 @@ class MasterTest(mockzk.MockZookeeperTestCase):
             (10, leaf_alloc),
             assignments['treadmlx.*[#]' + '[0-9]' * 10]
         )
+        self.assertEqual(
+            (42, leaf_alloc),
+            self.master.find_assignment('treadmlp.test#0000000001')
+        )
+        self.assertEqual(
+            (10, leaf_alloc),
+            self.master.find_assignment('treadmlx.foo#0000000001')
+        )
+
+    def test_assignment_matcher(self):
+        """Tests compiled assignments match same pattern as fnmatch."""
+        suffix = '[#]' + '[0-9]' * 10
+        assignments = {
+            pattern + suffix: (idx, None)
+            for idx, pattern in enumerate([
+                'proid1.*',
+                'proid1.foo*',
+                'proid1.foo.bar',
+                'proid2.?oo',
+                'proid2.[fb]ar',
+                'proid*',
+                'pro*.foo*',
+                '*.baz',
+                'proid3',
+            ])
+        }
+        matcher = master.AssignmentMatcher(assignments)
+
+        for name in ['proid1.foo', 'proid1.foo.bar', 'proid1.bar',
+                     'proid2.foo', 'proid2.bar', 'proid2.baz', 'proid3.baz',
+                     'proid3', 'proid3.foo', 'xxx.baz', 'xxx.foo']:
+            name += '#0000000001'
+            expected = None
+            for pattern, assignment in reversed(sorted(assignments.items())):
+                if fnmatch.fnmatch(name, pattern):
+                    expected = (pattern, assignment)
+                    break
+
+            self.assertEqual(expected, matcher.match(name), name)
+
+        self.assertIsNone(matcher.match('xxx.foo#0000000001'))
+        self.assertIsNone(master.AssignmentMatcher({}).match('xxx.foo#1'))
 
     @mock.patch('kazoo.client.KazooClient.get', mock.Mock())
     @mock.patch('kazoo.client.KazooClient.get_children', mock.Mock())
@@ -261,9 +304,12 @@ class MasterTest(mockzk.MockZookeeperTestCase):
     @mock.patch('treadmill.zkutils.ensure_deleted', mock.Mock())
     @mock.patch('treadmill.zkutils.put', mock.Mock())
     @mock.patch('treadmill.zkutils.update', mock.Mock())
+    @mock.patch('treadmill.zkutils.apply_transactions',
+                mock.Mock(return_value=1))
     @mock.patch('time.time', mock.Mock(return_value=500))
     def test_reschedule(self):
         """Tests application placement."""
+        kazoo.client.KazooClient.get_children.return_value = []
         srv_1 = scheduler.Server('1', [10, 10, 10],
                                  valid_until=1000, traits=0)
         srv_2 = scheduler.Server('2', [10, 10, 10],
@@ -286,33 +332,100 @@ class MasterTest(mockzk.MockZookeeperTestCase):
 
         # At this point app1 is on server 1, app2 on server 2.
         self.master.reschedule()
-        treadmill.zkutils.put.assert_has_calls([
-            mock.call(mock.ANY, '/placement/1/app1',
-                      {'expires': 500, 'identity': None}, acl=mock.ANY),
-            mock.call(mock.ANY, '/placement/2/app2',
-                      {'expires': 500, 'identity': None}, acl=mock.ANY),
-        ])
+        treadmill.zkutils.apply_transactions.assert_called_with(
+            mock.ANY,
+            [
+                ('create', '/placement/1/app1',
+                 {'expires': 500, 'identity': None}, mock.ANY),
+                ('create', '/placement/2/app2',
+                 {'expires': 500, 'identity': None}, mock.ANY),
+            ]
+        )
 
         srv_1.state = scheduler.State.down
         self.master.reschedule()
 
-        treadmill.zkutils.ensure_deleted.assert_has_calls([
-            mock.call(mock.ANY, '/placement/1/app1'),
-        ])
+        # Old placement is deleted before new one is created.
+        treadmill.zkutils.apply_transactions.assert_called_with(
+            mock.ANY,
+            [
+                ('delete', '/placement/1/app1'),
+                ('create', '/placement/3/app1',
+                 {'expires': 500, 'identity': None}, mock.ANY),
+            ]
+        )
         treadmill.zkutils.put.assert_has_calls([
-            mock.call(mock.ANY, '/placement/3/app1',
-                      {'expires': 500, 'identity': None}, acl=mock.ANY),
             mock.call(mock.ANY, '/placement', mock.ANY),
+            mock.call(mock.ANY, '/placement.deltas/0000000001', mock.ANY),
         ])
 
+        # First placement is stored as snapshot, then only changes.
+        snapshot = master.decode_placement(
+            treadmill.zkutils.put.call_args_list[0][0][2]
+        )
+        self.assertEqual(0, snapshot['delta'])
+        self.assertEqual(
+            ['app1', 'app2'],
+            [row[0] for row in snapshot['placement']]
+        )
+        delta = master.decode_placement(
+            treadmill.zkutils.put.call_args_list[-1][0][2]
+        )
+        self.assertEqual(
+            {'placement': [['app1', '3', mock.ANY]], 'removed': []},
+            delta
+        )
+
+    @mock.patch('kazoo.client.KazooClient.get_children', mock.Mock())
+    @mock.patch('treadmill.zkutils.put', mock.Mock())
+    @mock.patch('treadmill.zkutils.apply_transactions', mock.Mock())
+    def test_store_placement_previous_deltas(self):
+        """Tests deltas of previous master are removed before snapshot."""
+        # Access to a protected member
+        # pylint: disable=W0212
+        calls = mock.Mock()
+        calls.attach_mock(treadmill.zkutils.put, 'put')
+        calls.attach_mock(treadmill.zkutils.apply_transactions,
+                          'apply_transactions')
+        deltas = ['0000000001', '0000000002']
+
+        def _get_children(_path):
+            """Mock deltas, removed by apply_transactions."""
+            children = list(deltas)
+            del deltas[:]
+            return children
+
+        kazoo.client.KazooClient.get_children.side_effect = _get_children
+
+        self.master._store_placement([('app1', None, None, '1', 500)])
+
+        self.assertEqual(
+            calls.mock_calls,
+            [
+                mock.call.apply_transactions(
+                    mock.ANY,
+                    [('delete', '/placement.deltas/0000000001'),
+                     ('delete', '/placement.deltas/0000000002')]
+                ),
+                mock.call.put(mock.ANY, '/placement', mock.ANY),
+            ]
+        )
+        snapshot = master.decode_placement(
+            treadmill.zkutils.put.call_args[0][2]
+        )
+        self.assertEqual(0, snapshot['delta'])
+
     @mock.patch('kazoo.client.KazooClient.get', mock.Mock())
     @mock.patch('kazoo.client.KazooClient.get_children', mock.Mock())
     @mock.patch('treadmill.zkutils.ensure_deleted', mock.Mock())
     @mock.patch('treadmill.zkutils.put', mock.Mock())
     @mock.patch('treadmill.zkutils.update', mock.Mock())
+    @mock.patch('treadmill.zkutils.apply_transactions',
+                mock.Mock(return_value=1))
     @mock.patch('time.time', mock.Mock(return_value=500))
     def test_reschedule_maxutil(self):
         """Tests application placement."""
+        kazoo.client.KazooClient.get_children.return_value = []
         srv_1 = scheduler.Server('1', [10, 10, 10],
                                  valid_until=1000, traits=0)
         srv_2 = scheduler.Server('2', [10, 10, 10],
@@ -336,30 +449,37 @@ class MasterTest(mockzk.MockZookeeperTestCase):
         cell.add_app(cell.partitions[None].allocation, app2)
 
         self.master.reschedule()
-        treadmill.zkutils.put.assert_has_calls([
-            mock.call(mock.ANY, '/placement/1/app1',
-                      {'expires': 500, 'identity': None}, acl=mock.ANY),
-        ])
+        treadmill.zkutils.apply_transactions.assert_called_with(
+            mock.ANY,
+            [
+                ('create', '/placement/1/app1',
+                 {'expires': 500, 'identity': None}, mock.ANY),
+            ]
+        )
 
         app2.priority = 5
         self.master.reschedule()
 
-        treadmill.zkutils.ensure_deleted.assert_has_calls([
-            mock.call(mock.ANY, '/placement/1/app1'),
-        ])
-        treadmill.zkutils.put.assert_has_calls([
-            mock.call(mock.ANY, '/placement/2/app2',
-                      {'expires': 500, 'identity': None}, acl=mock.ANY),
-        ])
+        treadmill.zkutils.apply_transactions.assert_called_with(
+            mock.ANY,
+            [
+                ('delete', '/placement/1/app1'),
+                ('create', '/placement/2/app2',
+                 {'expires': 500, 'identity': None}, mock.ANY),
+            ]
+        )
 
     @mock.patch('kazoo.client.KazooClient.get', mock.Mock())
     @mock.patch('kazoo.client.KazooClient.get_children', mock.Mock())
     @mock.patch('treadmill.zkutils.ensure_deleted', mock.Mock())
     @mock.patch('treadmill.zkutils.put', mock.Mock())
     @mock.patch('treadmill.zkutils.update', mock.Mock())
+    @mock.patch('treadmill.zkutils.apply_transactions',
+                mock.Mock(return_value=1))
     @mock.patch('time.time', mock.Mock(return_value=500))
     def test_reschedule_once(self):
         """Tests application placement."""
+        kazoo.client.KazooClient.get_children.return_value = []
         srv_1 = scheduler.Server('1', [10, 10, 10],
                                  valid_until=1000, traits=0)
         srv_2 = scheduler.Server('2', [10, 10, 10],
@@ -383,18 +503,26 @@ class MasterTest(mockzk.MockZookeeperTestCase):
 
         # At this point app1 is on server 1, app2 on server 2.
         self.master.reschedule()
-        treadmill.zkutils.put.assert_has_calls([
-            mock.call(mock.ANY, '/placement/1/app1',
-                      {'expires': 500, 'identity': None}, acl=mock.ANY),
-            mock.call(mock.ANY, '/placement/2/app2',
-                      {'expires': 500, 'identity': None}, acl=mock.ANY),
-        ])
+        treadmill.zkutils.apply_transactions.assert_called_with(
+            mock.ANY,
+            [
+                ('create', '/placement/1/app1',
+                 {'expires': 500, 'identity': None}, mock.ANY),
+                ('create', '/placement/2/app2',
+                 {'expires': 500, 'identity': None}, mock.ANY),
+            ]
+        )
 
         srv_1.state = scheduler.State.down
         self.master.reschedule()
 
+        treadmill.zkutils.apply_transactions.assert_called_with(
+            mock.ANY,
+            [
+                ('delete', '/placement/1/app1'),
+            ]
+        )
         treadmill.zkutils.ensure_deleted.assert_has_calls([
-            mock.call(mock.ANY, '/placement/1/app1'),
             mock.call(mock.ANY, '/scheduled/app1'),
         ])
 
@@ -419,6 +547,7 @@ class MasterTest(mockzk.MockZookeeperTestCase):
                     'xxx.app2#2345': '',
                 }
             },
+            'placement.deltas': {},
             'server.presence': {
                 'test.xx.com': {},
             },
@@ -620,41 +749,125 @@ class MasterTest(mockzk.MockZookeeperTestCase):
         ])
 
     @mock.patch('kazoo.client.KazooClient.get', mock.Mock())
-    @mock.patch('kazoo.client.KazooClient.create', mock.Mock())
+    @mock.patch('kazoo.client.KazooClient.get_children', mock.Mock())
+    @mock.patch('treadmill.zkutils.ensure_deleted', mock.Mock())
+    @mock.patch('treadmill.master.Master.load_allocations', mock.Mock())
+    @mock.patch('treadmill.master.Master.load_apps', mock.Mock())
+    @mock.patch('treadmill.master.Master.load_app', mock.Mock())
+    @mock.patch('treadmill.master.Master.reload_servers', mock.Mock())
+    def test_process_events_coalesced(self):
+        """Tests events of the same resource are processed once."""
+        zk_content = {
+            'events': {
+                '001-allocations-12345': {},
+                '001-allocations-12347': {},
+                '000-apps-12346': {
+                    '.data': """
+                        - xxx.app1#1234
+                        - xxx.app2#2345
+                    """
+                },
+                '000-apps-12348': {
+                    '.data': """
+                        - xxx.app2#2345
+                        - xxx.app3#3456
+                    """
+                },
+                '000-servers-12349': {
+                    '.data': """
+                        - test1.xx.com
+                    """
+                },
+                '000-servers-12350': {
+                    '.data': """
+                        - test2.xx.com
+                    """
+                },
+            },
+        }
+
+        self.make_mock_zk(zk_content)
+        self.master.watch('/events')
+        self.master.process_queue()
+
+        self.assertEqual(
+            1, treadmill.master.Master.load_allocations.call_count
+        )
+        self.assertEqual(1, treadmill.master.Master.load_apps.call_count)
+        self.assertEqual(
+            [
+                mock.call('xxx.app1#1234'),
+                mock.call('xxx.app2#2345'),
+                mock.call('xxx.app3#3456'),
+            ],
+            treadmill.master.Master.load_app.call_args_list
+        )
+        treadmill.master.Master.reload_servers.assert_called_once_with(
+            ['test1.xx.com', 'test2.xx.com']
+        )
+        self.assertEqual(6, treadmill.zkutils.ensure_deleted.call_count)
+
+    @mock.patch('treadmill.master.Master.process', mock.Mock())
+    def test_process_queue(self):
+        """Tests only latest event of each path is processed."""
+        self.master.queue.extend([
+            ('/scheduled', ['a']),
+            ('/events', ['b']),
+            ('/scheduled', ['a', 'c']),
+        ])
+        self.master.process_queue()
+
+        self.assertEqual(
+            [
+                mock.call(('/scheduled', ['a', 'c'])),
+                mock.call(('/events', ['b'])),
+            ],
+            treadmill.master.Master.process.call_args_list
+        )
+        self.assertEqual(0, len(self.master.queue))
+
+        # Waiting returns immediately if there are queued events.
+        self.master.queue.append(('/events', []))
+        self.master.wait_for_events(60)
+
+    @mock.patch('treadmill.zkutils.create_sequential', mock.Mock(
+        return_value=['/scheduled/foo.bar#12', '/scheduled/foo.bar#13']))
+    @mock.patch('treadmill.zkutils.apply_transactions', mock.Mock())
     @mock.patch('time.time', mock.Mock(return_value=123.34))
     @mock.patch('treadmill.sysinfo.hostname', mock.Mock(return_value='xxx'))
     def test_create_apps(self):
         """Tests app api."""
         zkclient = kazoo.client.KazooClient()
-        kazoo.client.KazooClient.create.return_value = '/scheduled/foo.bar#12'
 
-        master.create_apps(zkclient, 'foo.bar', {}, 2)
-        kazoo.client.KazooClient.create.assert_has_calls(
+        self.assertEqual(
+            ['foo.bar#12', 'foo.bar#13'],
+            master.create_apps(zkclient, 'foo.bar', {}, 2)
+        )
+        treadmill.zkutils.create_sequential.assert_called_with(
+            zkclient, '/scheduled/foo.bar#', {}, 2, acl=mock.ANY
+        )
+        treadmill.zkutils.apply_transactions.assert_called_with(
+            zkclient,
             [
-                mock.call('/scheduled/foo.bar#',
-                          b'{}\n',
-                          makepath=True,
-                          sequence=True,
-                          ephemeral=False,
-                          acl=mock.ANY),
-                mock.call('/trace/000C/foo.bar#12,123.34,xxx,pending,created',
-                          b'',
-                          makepath=True,
-                          acl=mock.ANY),
-                # Mock call returns same instance (#12), so same task is
-                # created twice.
-                mock.call('/scheduled/foo.bar#',
-                          b'{}\n',
-                          makepath=True,
-                          sequence=True,
-                          ephemeral=False,
-                          acl=mock.ANY),
-                mock.call('/trace/000C/foo.bar#12,123.34,xxx,pending,created',
-                          b'',
-                          makepath=True,
-                          acl=mock.ANY)
-            ],
-            any_order=True
+                ('create',
+                 '/trace/000C/foo.bar#12,123.34,xxx,pending,created',
+                 None, mock.ANY),
+                ('create',
+                 '/trace/000D/foo.bar#13,123.34,xxx,pending,created',
+                 None, mock.ANY),
+            ]
+        )
+
+    @mock.patch('treadmill.zkutils.apply_transactions', mock.Mock())
+    def test_delete_apps(self):
+        """Tests deleting apps in transactions."""
+        zkclient = kazoo.client.KazooClient()
+
+        master.delete_apps(zkclient, ['foo.bar#12', 'foo.bar#13'])
+        treadmill.zkutils.apply_transactions.assert_called_with(
+            zkclient,
+            [('delete', '/scheduled/foo.bar#12'),
+             ('delete', '/scheduled/foo.bar#13')]
         )
 
     @mock.patch('kazoo.client.KazooClient.get', mock.Mock(
@@ -757,6 +970,7 @@ class MasterTest(mockzk.MockZookeeperTestCase):
                     'xxx.app1#1234': '',
                 }
             },
+            'placement.deltas': {},
             'server.presence': {
                 'test1.xx.com': {},
                 'test2.xx.com': {},
@@ -5,6 +5,7 @@ import unittest
 
 import mock
 
+import treadmill
 from treadmill import metrics
 
 _CPUACCT_STATINFO = """user 18335260
@@ -142,8 +143,19 @@ class MetricsTest(unittest.TestCase):
                 mock.Mock(return_value={'block count': '2000',
                                         'free blocks': '1000',
                                         'block size': '1024'}))
+    @mock.patch('treadmill.fs.read_filesystem_superblock',
+                mock.Mock(return_value={'block count': '4000',
+                                        'free blocks': '1000',
+                                        'block size': '4096'}))
     def test_get_fs_usage(self):
         """Test the fs usage compute logic."""
+        self.assertEqual(
+            metrics.get_fs_usage('/dev/treadmill/<uniq>'),
+            {'fs.used_bytes': 12288000})
+        self.assertFalse(treadmill.fs.read_filesystem_info.called)
+
+        # Not an ext filesystem, fallback to dumpe2fs
+        treadmill.fs.read_filesystem_superblock.side_effect = ValueError()
         self.assertEqual(
             metrics.get_fs_usage('/dev/treadmill/<uniq>'),
             {'fs.used_bytes': 1024000})
@@ -0,0 +1,70 @@
+"""Performance test for container network setup.
+
+Compares rtnetlink and `ip`/`brctl` (subprocess) backends on the sequence of
+device changes done by the network service for every container. Must be run
+as root (with TREADMILL_ALIASES_PATH set for the subprocess backend), in a
+scratch network namespace:
+
+    unshare -nm sh -c 'mount -t sysfs sysfs /sys && \
+        python tests/netdev_perf.py'
+"""
+
+import time
+
+from treadmill import netdev
+
+
+_BRIDGE = 'tmperfbr0'
+_CONTAINERS = 100
+_MTU = 1500
+
+
+def _setup(veth0, veth1, alias):
+    """Same sequence as NetworkResourceService.on_create_request."""
+    with netdev.batch():
+        netdev.link_add_veth(veth0, veth1)
+        netdev.link_set_mtu(veth0, _MTU)
+        netdev.link_set_mtu(veth1, _MTU)
+        netdev.link_set_alias(veth0, alias)
+        netdev.link_set_alias(veth1, alias)
+        netdev.bridge_addif(_BRIDGE, veth0)
+        netdev.link_set_up(veth0)
+
+
+def run(use_netlink):
+    """Time container network setup/teardown with the given backend."""
+    netdev.USE_NETLINK = use_netlink
+
+    netdev.bridge_create(_BRIDGE)
+    try:
+        devices = [
+            ('tmperf%d.0' % idx, 'tmperf%d.1' % idx, 'perf-%d' % idx)
+            for idx in range(_CONTAINERS)
+        ]
+
+        start_time = time.time()
+        for veth0, veth1, alias in devices:
+            _setup(veth0, veth1, alias)
+        setup_time = time.time() - start_time
+
+        assert netdev.dev_alias(devices[-1][1]) == devices[-1][2]
+        assert len(netdev.bridge_brif(_BRIDGE)) == _CONTAINERS
+
+        start_time = time.time()
+        for veth0, _veth1, _alias in devices:
+            netdev.link_del_veth(veth0)
+        teardown_time = time.time() - start_time
+
+    finally:
+        netdev.bridge_delete(_BRIDGE)
+
+    print('%-10s setup: %7.3fms/container, teardown: %7.3fms/container' % (
+        'netlink' if use_netlink else 'subprocess',
+        setup_time * 1000 / _CONTAINERS,
+        teardown_time * 1000 / _CONTAINERS,
+    ))
+
+
+if __name__ == '__main__':
+    run(use_netlink=False)
+    run(use_netlink=True)
@@ -19,8 +19,12 @@ class NetDevTest(unittest.TestCase):
 
     def setUp(self):
         self.root = tempfile.mkdtemp()
+        # Test the subprocess fallback unless stated otherwise.
+        self.use_netlink = netdev.USE_NETLINK
+        netdev.USE_NETLINK = False
 
     def tearDown(self):
+        netdev.USE_NETLINK = self.use_netlink
         if self.root and os.path.isdir(self.root):
             shutil.rmtree(self.root)
 
@@ -348,6 +352,56 @@ class NetDevTest(unittest.TestCase):
             ],
         )
 
+    @mock.patch('treadmill.netdev._rtnetlink', mock.Mock())
+    @mock.patch('treadmill.syscall.rtnetlink.link_index',
+                mock.Mock(side_effect=lambda name: {'br0': 3, 'foo': 7}[name]))
+    @mock.patch('treadmill.subproc.check_call', mock.Mock())
+    def test_netlink(self):
+        """Test device configuration over rtnetlink."""
+        rtnl = netdev._rtnetlink.return_value
+
+        netdev.link_add_veth('veth0', 'veth1')
+        netdev.link_set_mtu('veth0', '9000')
+        netdev.link_set_alias('veth0', 'foo')
+        netdev.bridge_addif('br0', 'veth0')
+        netdev.link_set_up('veth0')
+        netdev.link_set_netns('veth1', 1234)
+        netdev.addr_add('1.2.3.4/32', 'foo', addr_scope='host')
+        netdev.route_add('default', via='1.2.3.1', src='1.2.3.4')
+        netdev.route_add('1.2.3.1', devname='foo', route_scope='link')
+
+        rtnl.link_add_veth.assert_called_with('veth0', 'veth1')
+        rtnl.link_set.assert_has_calls(
+            [
+                mock.call('veth0', mtu=9000),
+                mock.call('veth0', alias='foo'),
+                mock.call('veth0', master=3),
+                mock.call('veth0', up=True),
+                mock.call('veth1', netns_pid=1234),
+            ]
+        )
+        rtnl.addr_add.assert_called_with(7, '1.2.3.4/32', scope='host')
+        rtnl.route_add.assert_has_calls(
+            [
+                mock.call('default', via='1.2.3.1', index=None,
+                          src='1.2.3.4', scope=None),
+                mock.call('1.2.3.1', via=None, index=7,
+                          src=None, scope='link'),
+            ]
+        )
+        self.assertFalse(treadmill.subproc.check_call.called)
+
+        # Named namespaces are left to `ip`
+        netdev.link_set_netns('veth1', 'foo')
+        treadmill.subproc.check_call.assert_called_with(
+            [
+                'ip', 'link',
+                'set',
+                'dev', 'veth1',
+                'netns', 'foo',
+            ],
+        )
+
     @mock.patch('builtins.open', autospec=True)
     def test_bridge_forward_delay(self, mock_open):
         """Test reading of bridge forward-delay setting.
@@ -307,6 +307,7 @@ class NetworkServiceTest(unittest.TestCase):
 
     @mock.patch('treadmill.iptables.add_mark_rule', mock.Mock())
     @mock.patch('treadmill.netdev.addr_add', mock.Mock())
+    @mock.patch('treadmill.netdev.batch', mock.MagicMock())
     @mock.patch('treadmill.netdev.bridge_addif', mock.Mock())
     @mock.patch('treadmill.netdev.link_add_veth', mock.Mock())
     @mock.patch('treadmill.netdev.link_set_alias', mock.Mock())
@@ -359,6 +360,8 @@ class NetworkServiceTest(unittest.TestCase):
         treadmill.netdev.link_set_up.assert_called_with(
             '0000000ID1234.0',
         )
+        # All of the above sent in one batch
+        treadmill.netdev.batch.assert_called_with()
         mock_devinfo.assert_called_with('0000000ID1234.0')
         self.assertEqual(
             network,
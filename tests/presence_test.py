@@ -243,7 +243,9 @@ class PresenceTest(mockzk.MockZookeeperTestCase):
         self.assertNotIn('xxx.xx.com', zk_content['server.presence'])
 
     @mock.patch('kazoo.client.KazooClient.create', mock.Mock())
-    @mock.patch('treadmill.subproc.check_call', mock.Mock())
+    @mock.patch('treadmill.s6.supervise.control', mock.Mock())
+    @mock.patch('treadmill.s6.supervise.wait_for',
+                mock.Mock(return_value=True))
     @mock.patch('treadmill.presence.ServicePresence.report_running',
                 mock.Mock())
     @mock.patch('time.time', mock.Mock(return_value=0))
@@ -476,6 +478,95 @@ class PresenceTest(mockzk.MockZookeeperTestCase):
              'oom': False}
         )
 
+    @mock.patch('kazoo.client.KazooClient.create', mock.Mock())
+    @mock.patch('treadmill.sysinfo.hostname', mock.Mock())
+    @mock.patch('treadmill.s6.supervise.ServiceWatcher', mock.MagicMock())
+    @mock.patch('treadmill.s6.supervise.read_status', mock.Mock())
+    @mock.patch('treadmill.presence.ServicePresence.update_exit_status',
+                mock.Mock())
+    def test_wait_for_exit(self):
+        """Verifies exit status is reported when a service is down."""
+        # Access to a protected member
+        # pylint: disable=W0212
+        manifest = {
+            'task': 't-0001',
+            'name': 'foo.test1#0001',
+            'uniqueid': 'AAAAAA',
+            'proid': 'andreik',
+            'services': [
+                {
+                    'command': '/usr/bin/python -m SimpleHTTPServer',
+                    'name': 'web_server',
+                },
+                {
+                    'command': 'sshd -D -f /etc/ssh/sshd_config',
+                    'name': 'sshd',
+                },
+            ],
+        }
+        app_presence = presence.ServicePresence(
+            manifest,
+            container_dir=self.root,
+            appevents_dir=self.events_dir
+        )
+        services_dir = os.path.join(self.root, 'services')
+        web_server_dir = os.path.join(services_dir, 'web_server')
+        sys_dir = os.path.join(self.root, 'sys', 'start_container')
+
+        down = set()
+
+        def _read_status(svc_dir):
+            """Mock status."""
+            return mock.Mock(is_really_down=svc_dir in down)
+
+        def _wait(_timeout):
+            """Mock web_server exit."""
+            down.add(web_server_dir)
+            return {web_server_dir: 'dD'}
+
+        treadmill.s6.supervise.read_status.side_effect = _read_status
+        watcher = treadmill.s6.supervise.ServiceWatcher.return_value
+        watcher.__enter__.return_value = watcher
+        watcher.wait.side_effect = _wait
+
+        app_presence.wait_for_exit(sys_dir)
+
+        watcher.add.assert_has_calls(
+            [
+                mock.call(web_server_dir),
+                mock.call(os.path.join(services_dir, 'sshd')),
+                mock.call(sys_dir),
+            ],
+            any_order=True
+        )
+        self.assertEqual(watcher.wait.call_count, 1)
+        presence.ServicePresence.update_exit_status.assert_called_once_with(
+            'web_server'
+        )
+
+        # Container supervisor is down, nothing to report.
+        presence.ServicePresence.update_exit_status.reset_mock()
+        down = {sys_dir}
+        app_presence.wait_for_exit(sys_dir)
+        self.assertEqual(watcher.wait.call_count, 1)
+        self.assertFalse(presence.ServicePresence.update_exit_status.called)
+
+        # Notification missed, exit found when re-checking on timeout.
+        down = set()
+
+        def _wait_missed(_timeout):
+            """Mock sshd exit, without notification."""
+            down.add(os.path.join(services_dir, 'sshd'))
+            return {}
+
+        watcher.wait.side_effect = _wait_missed
+        watcher.wait.reset_mock()
+        app_presence.wait_for_exit(sys_dir)
+        watcher.wait.assert_called_once_with(presence._EXIT_RECHECK_INTERVAL)
+        presence.ServicePresence.update_exit_status.assert_called_once_with(
+            'sshd'
+        )
+
     @mock.patch('kazoo.client.KazooClient.create', mock.Mock())
     @mock.patch('treadmill.sysinfo.hostname', mock.Mock())
     @mock.patch('treadmill.appevents.post', mock.Mock())
@@ -569,7 +660,9 @@ class PresenceTest(mockzk.MockZookeeperTestCase):
 
     @mock.patch('kazoo.client.KazooClient.create', mock.Mock())
     @mock.patch('treadmill.sysinfo.hostname', mock.Mock())
-    @mock.patch('treadmill.subproc.check_call', mock.Mock())
+    @mock.patch('treadmill.s6.supervise.control', mock.Mock())
+    @mock.patch('treadmill.s6.supervise.wait_for',
+                mock.Mock(return_value=True))
     @mock.patch('treadmill.presence.ServicePresence.report_running',
                 mock.Mock())
     @mock.patch('time.time', mock.Mock(return_value=None))
@@ -0,0 +1,107 @@
+"""Performance test for the resource services request round-trip.
+
+Runs a resource service replying right away to every request, and measures
+the time to put a request and wait for its reply with 1, 10 and 100
+concurrent containers (client processes), through the request files only and
+through the request channel:
+
+    python tests/resource_service_perf.py
+"""
+
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+from treadmill.services import _base_service
+
+
+_CONTAINERS = (1, 10, 100)
+_REQUESTS = 20
+
+
+class EchoService(_base_service.BaseResourceServiceImpl):
+    """Service replying right away to every request."""
+
+    __slots__ = ()
+
+    def initialize(self, service_dir):
+        super(EchoService, self).initialize(service_dir)
+
+    def synchronize(self):
+        pass
+
+    def report_status(self):
+        return {}
+
+    def on_create_request(self, rsrc_id, rsrc_data):
+        return {'id': rsrc_id}
+
+    def on_delete_request(self, rsrc_id):
+        return True
+
+
+def _container(svc, root, idx, use_channel, timings):
+    """Put, wait for and delete requests, as a container would."""
+    client = svc.make_client(os.path.join(root, 'apps', 'c%d' % idx),
+                             use_channel=use_channel)
+    for req in range(_REQUESTS):
+        rsrc_id = 'c%d-%d' % (idx, req)
+        start_time = time.time()
+        client.put(rsrc_id, {'req': req})
+        client.wait(rsrc_id, timeout=60)
+        timings.put(time.time() - start_time)
+        client.delete(rsrc_id)
+
+
+def run(containers, use_channel):
+    """Time requests round-trip of concurrent containers."""
+    root = tempfile.mkdtemp()
+    svc = _base_service.ResourceService(os.path.join(root, 'svc'),
+                                        EchoService)
+    os.mkdir(os.path.join(root, 'watchdogs'))
+    service = multiprocessing.Process(
+        target=svc.run, args=(os.path.join(root, 'watchdogs'),)
+    )
+    service.start()
+    try:
+        svc.status(timeout=30)
+
+        queue = multiprocessing.Queue()
+        clients = [
+            multiprocessing.Process(
+                target=_container,
+                args=(svc, root, idx, use_channel, queue)
+            )
+            for idx in range(containers)
+        ]
+        start_time = time.time()
+        for client in clients:
+            client.start()
+        timings = [queue.get() for _ in range(containers * _REQUESTS)]
+        for client in clients:
+            client.join()
+        duration = time.time() - start_time
+
+    finally:
+        service.terminate()
+        service.join()
+        shutil.rmtree(root)
+
+    timings.sort()
+    print('%-8s containers: %3d, rtt avg: %7.3fms, p50: %7.3fms, '
+          'p99: %7.3fms, %6.1f requests/s' % (
+              'channel' if use_channel else 'files',
+              containers,
+              sum(timings) * 1000 / len(timings),
+              timings[len(timings) // 2] * 1000,
+              timings[int(len(timings) * 0.99)] * 1000,
+              len(timings) / duration,
+          ))
+
+
+if __name__ == '__main__':
+    for count in _CONTAINERS:
+        run(count, use_channel=False)
+        run(count, use_channel=True)
@@ -5,6 +5,7 @@ import unittest
 
 import mock
 
+import treadmill
 from treadmill import rrdutils
 
 
@@ -27,6 +28,45 @@ class RrdUtilsTest(unittest.TestCase):
             [rrdutils.RRDTOOL, 'first', 'foo.rrd', '--rraindex',
              rrdutils.TIMEFRAME_TO_RRA_IDX['long']])
 
+    @mock.patch('socket.socket', mock.Mock())
+    @mock.patch('treadmill.fs.rm_safe', mock.Mock())
+    def test_batch_update(self):
+        """Test updating rrd files in a single batch."""
+        client = rrdutils.RRDClient('/tmp/treadmill.rrd')
+        client.rrd = mock.Mock()
+        client.rrd.readline.side_effect = [
+            '0 Go ahead.  End with dot \'.\' on its own line.\n',
+            '1 errors\n',
+            '2 No such file: b.rrd\n',
+        ]
+        data = {
+            'memusage': 1,
+            'softmem': 2,
+            'hardmem': 3,
+            'cputotal': 4,
+            'cpuusage': 5,
+            'cpuusage_ratio': 6,
+            'blk_read_iops': 7,
+            'blk_write_iops': 8,
+            'blk_read_bps': 9,
+            'blk_write_bps': 10,
+            'fs_used_bytes': 11,
+        }
+
+        client.batch_update([
+            ('a.rrd', data, 100.5),
+            ('b.rrd', data, 101),
+        ])
+
+        client.rrd.write.assert_has_calls([
+            mock.call('BATCH\n'),
+            mock.call('UPDATE a.rrd 100:1:2:3:4:5:6:7:8:9:10:11\n'),
+            mock.call('UPDATE b.rrd 101:1:2:3:4:5:6:7:8:9:10:11\n'),
+            mock.call('.\n'),
+        ])
+        # Failed update file is removed.
+        treadmill.fs.rm_safe.assert_called_once_with('b.rrd')
+
 
 if __name__ == '__main__':
     unittest.main()
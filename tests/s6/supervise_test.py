@@ -0,0 +1,218 @@
+"""Unit test for s6-supervise native client
+"""
+
+import errno
+import os
+import shutil
+import struct
+import tempfile
+import threading
+import time
+import unittest
+
+import mock
+
+from treadmill.s6 import supervise
+
+
+def _status(pid=0, flags=0, stamp=1000, pgid=None):
+    """Build a `supervise/status` record."""
+    tai = (1 << 62) + 10 + stamp
+    if pgid is None:
+        return struct.pack('>QIQIQHB', tai, 0, tai, 0, pid, 0, flags)
+    else:
+        return struct.pack('>QIQIQQHB', tai, 0, tai, 0, pid, pgid, 0, flags)
+
+
+class SuperviseTest(unittest.TestCase):
+    """Tests for teadmill.s6.supervise."""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        if self.root and os.path.isdir(self.root):
+            shutil.rmtree(self.root)
+
+    def _service(self, name, pid=0, flags=0):
+        """Create a fake supervised service directory."""
+        svc_dir = os.path.join(self.root, name)
+        os.makedirs(os.path.join(svc_dir, 'supervise'))
+        os.makedirs(os.path.join(svc_dir, 'event'))
+        os.mkfifo(os.path.join(svc_dir, 'supervise', 'control'))
+        self._set_status(svc_dir, pid, flags)
+        return svc_dir
+
+    @staticmethod
+    def _set_status(svc_dir, pid=0, flags=0):
+        """Update the service status."""
+        with open(os.path.join(svc_dir, 'supervise', 'status'), 'wb') as f:
+            f.write(_status(pid, flags))
+
+    @staticmethod
+    def _notify(svc_dir, event):
+        """Notify event subscribers, as s6-supervise does (ftrigw_notify)."""
+        event_dir = os.path.join(svc_dir, 'event')
+        for name in os.listdir(event_dir):
+            if not name.startswith('ftrig1') or len(name) != 6 + 43:
+                continue
+            fd = os.open(os.path.join(event_dir, name),
+                         os.O_WRONLY | os.O_NONBLOCK)
+            os.write(fd, event.encode())
+            os.close(fd)
+
+    def test_read_status(self):
+        """Test decoding the supervise status."""
+        svc_dir = self._service('a', pid=123, flags=0x4 | 0x8)
+
+        status = supervise.read_status(svc_dir)
+        self.assertEqual(status.pid, 123)
+        self.assertEqual(status.stamp, 1000)
+        self.assertTrue(status.wantup)
+        self.assertTrue(status.ready)
+        self.assertFalse(status.paused)
+        self.assertTrue(status.is_up)
+        self.assertFalse(status.is_really_down)
+
+        # Newer format, with process group.
+        with open(os.path.join(svc_dir, 'supervise', 'status'), 'wb') as f:
+            f.write(_status(flags=0x2, pgid=123))
+
+        status = supervise.read_status(svc_dir)
+        self.assertEqual(status.pid, 0)
+        self.assertTrue(status.finishing)
+        self.assertFalse(status.is_up)
+        self.assertFalse(status.is_really_down)
+
+        with open(os.path.join(svc_dir, 'supervise', 'status'), 'wb') as f:
+            f.write(b'xxx')
+
+        with self.assertRaises(ValueError):
+            supervise.read_status(svc_dir)
+
+        with self.assertRaises(OSError):
+            supervise.read_status(os.path.join(self.root, 'nosuchservice'))
+
+    def test_control(self):
+        """Test sending commands to the supervisor."""
+        svc_dir = self._service('a')
+        control = os.path.join(svc_dir, 'supervise', 'control')
+
+        self.assertFalse(supervise.is_supervised(svc_dir))
+        self.assertFalse(
+            supervise.is_supervised(os.path.join(self.root, 'nosuchservice'))
+        )
+        with self.assertRaises(OSError) as ctx:
+            supervise.control(svc_dir, 'u')
+        self.assertEqual(ctx.exception.errno, errno.ENXIO)
+
+        reader = os.open(control, os.O_RDONLY | os.O_NONBLOCK)
+        try:
+            self.assertTrue(supervise.is_supervised(svc_dir))
+            supervise.control(svc_dir, 'uO')
+            self.assertEqual(os.read(reader, 10), b'uO')
+        finally:
+            os.close(reader)
+
+    def test_subscription_name(self):
+        """Test subscription FIFOs are named as skalibs ftrig1_make does."""
+        svc_dir = self._service('a')
+
+        with supervise.ServiceWatcher() as watcher:
+            watcher.add(svc_dir)
+            names = os.listdir(os.path.join(svc_dir, 'event'))
+
+        self.assertEqual(len(names), 1)
+        self.assertRegexpMatches(
+            names[0], r'^ftrig1:@4[0-9a-f]{23}:[A-Za-z0-9_-]{16}$'
+        )
+
+    @mock.patch('treadmill.s6.supervise._WAIT_RECHECK_INTERVAL', 0.1)
+    def test_wait_for_missed_event(self):
+        """Test waiting when the supervisor notification is missed."""
+        svc_dir = self._service('a', pid=123)
+
+        def _stop():
+            """Stop the service, without notifying."""
+            time.sleep(0.2)
+            self._set_status(svc_dir)
+
+        notifier = threading.Thread(target=_stop)
+        notifier.start()
+        self.assertTrue(
+            supervise.wait_for([svc_dir], supervise.WaitFor.down,
+                               timeout=5000)
+        )
+        notifier.join()
+
+    def test_wait_for(self):
+        """Test waiting for services state changes."""
+        svc_a = self._service('a', pid=123)
+        svc_b = self._service('b', pid=124)
+
+        # Already in the requested state.
+        self.assertTrue(
+            supervise.wait_for([svc_a, svc_b], supervise.WaitFor.up)
+        )
+        self.assertTrue(supervise.wait_for([], supervise.WaitFor.down))
+
+        # Timeout, subscriptions are removed.
+        self.assertFalse(
+            supervise.wait_for([svc_a], supervise.WaitFor.down, timeout=10)
+        )
+        self.assertEqual(os.listdir(os.path.join(svc_a, 'event')), [])
+
+        def _stop(svc_dir):
+            """Stop the service, after the waiter subscribed."""
+            while not os.listdir(os.path.join(svc_dir, 'event')):
+                time.sleep(0.01)
+            self._set_status(svc_dir)
+            self._notify(svc_dir, 'd')
+
+        # Wait for any.
+        notifier = threading.Thread(target=_stop, args=(svc_b,))
+        notifier.start()
+        self.assertTrue(
+            supervise.wait_for([svc_a, svc_b], supervise.WaitFor.really_down,
+                               wait_all=False, timeout=5000)
+        )
+        notifier.join()
+        self.assertTrue(supervise.read_status(svc_a).is_up)
+
+        # Wait for all.
+        notifier = threading.Thread(target=_stop, args=(svc_a,))
+        notifier.start()
+        self.assertTrue(
+            supervise.wait_for([svc_a, svc_b], supervise.WaitFor.down,
+                               timeout=5000)
+        )
+        notifier.join()
+
+    def test_service_watcher(self):
+        """Test multiplexing events of many services."""
+        svc_a = self._service('a', pid=123)
+        svc_b = self._service('b', pid=124)
+
+        with supervise.ServiceWatcher() as watcher:
+            watcher.add(svc_a)
+            watcher.add(svc_b)
+            watcher.add(svc_b)
+            self.assertEqual(sorted(watcher.services), [svc_a, svc_b])
+            self.assertEqual(watcher.wait(0), {})
+
+            self._notify(svc_a, 'd')
+            self._notify(svc_b, 'd')
+            self._notify(svc_b, 'D')
+            self.assertEqual(watcher.wait(0), {svc_a: 'd', svc_b: 'dD'})
+            self.assertEqual(watcher.wait(0), {})
+
+            watcher.remove(svc_a)
+            self.assertEqual(os.listdir(os.path.join(svc_a, 'event')), [])
+            self._notify(svc_b, 'u')
+            self.assertEqual(watcher.wait(1), {svc_b: 'u'})
+
+        self.assertEqual(os.listdir(os.path.join(svc_b, 'event')), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
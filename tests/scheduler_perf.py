@@ -1,21 +1,40 @@
 """Performance test for treadmill.scheduler
 """
 
+import sys
 import timeit
 
-# XXX(boysson): Test needs update to new Scheduler API
-# XXX: from treadmill import scheduler
+from treadmill import scheduler
 
 
-def schedule(sched):
+def _make_cell(servers_count, capacity_store, servers_per_rack=40):
+    """Create cell with given number of servers, grouped in racks."""
+    cell = scheduler.Cell('top', capacity_store=capacity_store)
+    rack = None
+    for idx in range(0, servers_count):
+        if idx % servers_per_rack == 0:
+            rack = scheduler.Bucket('rack:%s' % (idx // servers_per_rack),
+                                    traits=0)
+            cell.add_node(rack)
+
+        server = scheduler.Server('node%s' % idx, [48, 48, 48],
+                                  valid_until=sys.maxsize, traits=0)
+        rack.add_node(server)
+
+    return cell
+
+
+def schedule(cell):
     """Helper function to run the scheduler."""
 
     def _schedule():
         """Run the scheduler, output some stats."""
         new_placement = 0
         evicted = 0
-        for event in sched.schedule():
-            if event.node:
+        for _app, before, _exp_before, after, _exp_after in cell.schedule():
+            if before == after:
+                continue
+            if after:
                 new_placement = new_placement + 1
             else:
                 evicted = evicted + 1
@@ -24,75 +43,64 @@ def schedule(sched):
 
     interval = timeit.timeit(stmt=_schedule, number=1)
     print('time  :', interval)
+    return interval
+
+
+def test_reschedule(servers_count, capacity_store, apps_per_server=4):
+    """Fill the cell, then add high priority apps on top of full capacity.
+    """
+    print('servers: %s, apps: %s, capacity store: %s' % (
+        servers_count, servers_count * apps_per_server, capacity_store))
+    cell = _make_cell(servers_count, capacity_store)
+
+    alloc = scheduler.Allocation([10, 10, 10])
+    cell.partitions[None].allocation.add_sub_alloc('a1', alloc)
+
+    for idx in range(0, servers_count * apps_per_server):
+        demand = [idx % 10 + 1, (idx * 7) % 10 + 1, (idx * 3) % 10 + 1]
+        cell.add_app(alloc, scheduler.Application(
+            'app_0.%s' % idx, idx % 5, demand, affinity=str(idx % 100)))
 
+    initial = schedule(cell)
 
-# XXX(boysson): Test needs update to new Scheduler API
-# XXX:
-# XXX: def test_reschedule(nodes_count, app_count, attempts, affinity):
-# XXX:     """Add high priority apps on top of low priority with full capacity.
-# XXX:     """
-# XXX:     print('nodes: %s, apps: %s, attempts: %s' % (nodes_count,
-# XXX:                                                  app_count,
-# XXX:                                                  attempts))
-# XXX:     cell = scheduler.Cell(3)
-# XXX:     for idx in range(0, nodes_count):
-# XXX:         node = scheduler.Node('node' + str(idx), [48, 48, 48])
-# XXX:         cell.add_node(node)
-# XXX:
-# XXX:     alloc = scheduler.Allocation([10, 10, 10])
-# XXX:     cell.add_allocation('a1', alloc)
-# XXX:
-# XXX:     sched = scheduler.Scheduler(cell)
-# XXX:
-# XXX:     for attempt in range(0, attempts):
-# XXX:         for app_idx in range(0, app_count):
-# XXX:             prio = attempt * 5 + random.randint(0, 5)
-# XXX:             demand = [random.randint(1, 48),
-# XXX:                       random.randint(1, 48),
-# XXX:                       random.randint(1, 48)]
-# XXX:             name = 'app_%s.%s' % (attempt, app_idx)
-# XXX:             alloc.add(scheduler.Application(name, prio, demand,
-# XXX:                                             affinity=affinity(app_idx)))
-# XXX:
-# XXX:         schedule(sched)
-
-
-# XXX(boysson): Test needs update to new Scheduler API
-# XXX:
-# XXX: def test_affinity(nodes_count, app_count, affinity_limit):
-# XXX:     """Add more apps than nodes count to test affinity limit algo."""
-# XXX:     print('node: %s, apps: %s, affinity_limit %s' % (nodes_count,
-# XXX:                                                      app_count,
-# XXX:                                                      affinity_limit))
-# XXX:
-# XXX:     cell = scheduler.Cell(3)
-# XXX:     for idx in range(0, nodes_count):
-# XXX:         node = scheduler.Node('node' + str(idx), [48, 48, 48])
-# XXX:         cell.add_node(node)
-# XXX:
-# XXX:     alloc = scheduler.Allocation([10, 10, 10])
-# XXX:     cell.add_allocation('a1', alloc)
-# XXX:     for app_idx in range(0, app_count):
-# XXX:         name = '1.%s' % (app_idx)
-# XXX:         alloc.add(scheduler.Application(name, 0, [1, 1, 1],
-# XXX:                                         affinity_limit=affinity_limit,
-# XXX:                                         affinity='1'))
-# XXX:         name = '2.%s' % (app_idx)
-# XXX:         alloc.add(scheduler.Application(name, 0, [1, 1, 1],
-# XXX:                                         affinity_limit=affinity_limit,
-# XXX:                                         affinity='2'))
-# XXX:         name = '3.%s' % (app_idx)
-# XXX:         alloc.add(scheduler.Application(name, 0, [1, 1, 1],
-# XXX:                                         affinity_limit=affinity_limit,
-# XXX:                                         affinity='3'))
-# XXX:
-# XXX:     sched = scheduler.Scheduler(cell)
-# XXX:     schedule(sched)
+    # Big apps that do not fit anywhere without eviction.
+    for idx in range(0, servers_count // 10):
+        cell.add_app(alloc, scheduler.Application(
+            'app_1.%s' % idx, 50, [40, 40, 40], affinity=str(idx % 100)))
+
+    reschedule = schedule(cell)
+    return initial, reschedule
+
+
+def test_remove_apps(servers_count, apps_count):
+    """Remove all apps from scheduled cell one by one, then reschedule."""
+    print('servers: %s, removing apps: %s' % (servers_count, apps_count))
+    cell = _make_cell(servers_count, capacity_store=False)
+
+    alloc = scheduler.Allocation([10, 10, 10])
+    cell.partitions[None].allocation.add_sub_alloc('a1', alloc)
+    for idx in range(0, apps_count):
+        cell.add_app(alloc, scheduler.Application(
+            'app_0.%s' % idx, 1, [1, 1, 1], affinity=str(idx % 100)))
+    schedule(cell)
+
+    def _remove():
+        """Remove apps."""
+        for idx in range(0, apps_count):
+            cell.remove_app('app_0.%s' % idx)
+
+    interval = timeit.timeit(stmt=_remove, number=1)
+    print('remove time  :', interval)
+    schedule(cell)
+    return interval
 
 
 if __name__ == '__main__':
-    pass
-# XXX:     test_reschedule(500, 1000, 5, affinity=lambda idx: None)
-# XXX:     test_reschedule(1000, 1000, 3, affinity=str)
-# XXX:     test_reschedule(1000, 3000, 3, affinity=lambda idx: str(idx % 5))
-# XXX:     test_affinity(500, 1000, 1)
+    scheduler.DIMENSION_COUNT = 3
+    for count in [1000, 10000, 50000]:
+        before = test_reschedule(count, capacity_store=False)
+        after = test_reschedule(count, capacity_store=True)
+        print('%s servers - without store: %.2fs/%.2fs, with: %.2fs/%.2fs' % (
+            count, before[0], before[1], after[0], after[1]))
+
+    test_remove_apps(10000, 5000)
@@ -250,6 +250,46 @@ class AllocationTest(unittest.TestCase):
         self.assertEqual('p1', queue[1][-1].name)
         self.assertEqual('r2', queue[2][-1].name)
 
+    def test_sub_alloc_priority_order(self):
+        """Test sub-alloc priority order is kept for same utilization."""
+        alloc = scheduler.Allocation()
+        sub_alloc = scheduler.Allocation([10, 10])
+        alloc.add_sub_alloc('a', sub_alloc)
+
+        sub_alloc.add(scheduler.Application('app1', 10, [2, 0], 'app1'))
+        sub_alloc.add(scheduler.Application('app2', 5, [0, 1], 'app1'))
+        sub_alloc.apps['app2'].server = 'abc'
+
+        # Running app2 has same utilization as pending app1 of higher
+        # priority, it should not be moved ahead of it.
+        queue = list(alloc.utilization_queue([20., 20.]))
+        self.assertEqual(['app1', 'app2'], [item[-1].name for item in queue])
+
+    def test_queue_cache(self):
+        """Test sorted app queue is cached until allocation changes."""
+        alloc = scheduler.Allocation([10, 10])
+        alloc.add(scheduler.Application('app1', 5, [1, 1], 'app1'))
+        alloc.add(scheduler.Application('app2', 10, [2, 2], 'app1'))
+
+        queue = list(alloc.utilization_queue([20., 20.]))
+        self.assertEqual(['app2', 'app1'], [item[-1].name for item in queue])
+        cache = alloc.queue_cache
+
+        list(alloc.utilization_queue([20., 20.]))
+        self.assertIs(cache, alloc.queue_cache)
+
+        alloc.add(scheduler.Application('app3', 20, [3, 3], 'app1'))
+        self.assertIsNone(alloc.queue_cache)
+        queue = list(alloc.utilization_queue([20., 20.]))
+        self.assertEqual(['app3', 'app2', 'app1'],
+                         [item[-1].name for item in queue])
+
+        # Priority can be updated in place.
+        alloc.apps['app1'].priority = 30
+        queue = list(alloc.utilization_queue([20., 20.]))
+        self.assertEqual(['app1', 'app3', 'app2'],
+                         [item[-1].name for item in queue])
+
 
 class TraitSetTest(unittest.TestCase):
     """treadmill.scheduler.TraitSet tests."""
@@ -647,6 +687,82 @@ class NodeTest(unittest.TestCase):
             top.members()
         )
 
+    def test_cell_members_index(self):
+        """Tests cell server index is maintained on add/remove."""
+        cell = scheduler.Cell('top')
+        left = scheduler.Bucket('left', traits=0)
+        right = scheduler.Bucket('right', traits=0)
+        srv_a = scheduler.Server('a', [1, 1], traits=0, valid_until=500)
+        srv_b = scheduler.Server('b', [1, 1], traits=0, valid_until=500)
+        srv_y = scheduler.Server('y', [1, 1], traits=0, valid_until=500)
+
+        left.add_node(srv_a)
+        cell.add_node(left)
+        cell.add_node(right)
+        left.add_node(srv_b)
+        right.add_node(srv_y)
+        self.assertEqual({'a': srv_a, 'b': srv_b, 'y': srv_y},
+                         cell.members())
+
+        left.remove_node_by_name('a')
+        self.assertEqual({'b': srv_b, 'y': srv_y}, cell.members())
+
+        cell.remove_node_by_name('right')
+        self.assertEqual({'b': srv_b}, cell.members())
+        self.assertEqual({'y': srv_y}, right.members())
+
+        cell.reset_children()
+        self.assertEqual({}, cell.members())
+
+    def test_bucket_capacity_index(self):
+        """Tests bucket skips children that can't fit the app."""
+        top = scheduler.Bucket('top', traits=0)
+        servers = [
+            scheduler.Server('s%s' % idx, capacity, traits=0, valid_until=500)
+            for idx, capacity in enumerate([[10, 10], [2, 2], [2, 2],
+                                            [10, 10]])
+        ]
+        for server in servers:
+            top.add_node(server)
+
+        top.set_affinity_strategy('app2', scheduler.PackStrategy)
+
+        apps1 = app_list(10, 'app1', 50, [5, 5])
+        apps2 = app_list(10, 'app2', 50, [5, 5])
+
+        self.assertTrue(top.put(apps1[0]))
+        self.assertEqual('s0', apps1[0].server)
+
+        # Servers s1 and s2 are not tried and spread cycle continues past
+        # the server that got the app.
+        with mock.patch('treadmill.scheduler.Server.put',
+                        autospec=True,
+                        side_effect=scheduler.Server.put) as put_mock:
+            self.assertTrue(top.put(apps1[1]))
+            self.assertEqual(
+                ['s1', 's3'],
+                [call[0][0].name for call in put_mock.call_args_list]
+            )
+        self.assertEqual('s3', apps1[1].server)
+        self.assertTrue(top.put(apps1[2]))
+        self.assertEqual('s0', apps1[2].server)
+
+        # Pack strategy sticks to the server which got the app.
+        self.assertTrue(top.put(apps2[0]))
+        self.assertEqual('s3', apps2[0].server)
+        self.assertFalse(top.put(apps2[1]))
+        self.assertEqual(3, top.get_affinity_strategy('app2').current_idx)
+
+        # Capacity index follows the server capacity.
+        servers[3].remove(apps2[0].name)
+        self.assertTrue(top.put(apps2[1]))
+        self.assertEqual('s3', apps2[1].server)
+
+        # Index is invalidated on topology and state change.
+        top.remove_node_by_name('s3')
+        servers[0].state = scheduler.State.down
+        self.assertFalse(top.put(apps1[3]))
+
     def test_affinity_counters(self):
         """Tests affinity counters."""
         top = scheduler.Bucket('top', traits=_traits2int(['top']))
@@ -1292,6 +1408,225 @@ class CellTest(unittest.TestCase):
         self.assertTrue(apps[0].renew)
 
 
+class CapacityStoreTest(unittest.TestCase):
+    """treadmill.scheduler.CapacityStore tests."""
+
+    def setUp(self):
+        scheduler.DIMENSION_COUNT = 2
+        super(CapacityStoreTest, self).setUp()
+
+    def _make_cell(self, capacity_store):
+        """Create cell with two racks, and five servers in each."""
+        cell = scheduler.Cell('top', capacity_store=capacity_store)
+        for rack_idx in range(0, 2):
+            rack = scheduler.Bucket('rack:%s' % rack_idx, traits=0)
+            cell.add_node(rack)
+            for srv_idx in range(0, 5):
+                srv = scheduler.Server('srv-%s-%s' % (rack_idx, srv_idx),
+                                       [10, 10], traits=0, valid_until=500)
+                rack.add_node(srv)
+        return cell
+
+    def test_attach_detach(self):
+        """Test servers free capacity is backed by the store rows."""
+        cell = scheduler.Cell('top', capacity_store=True)
+        store = cell.capacity_store
+        rack = scheduler.Bucket('rack', traits=0)
+        srv_a = scheduler.Server('a', [10, 5], traits=0, valid_until=500)
+        rack.add_node(srv_a)
+
+        # Rack is not part of the cell yet.
+        self.assertIsNone(srv_a.capacity_row)
+
+        cell.add_node(rack)
+        self.assertIsNotNone(srv_a.capacity_row)
+        self.assertTrue(np.array_equal(store.matrix[srv_a.capacity_row],
+                                       np.array([10., 5.])))
+
+        srv_a.put(scheduler.Application('app1', 1, [1, 1], 'app'))
+        self.assertTrue(np.array_equal(store.matrix[srv_a.capacity_row],
+                                       np.array([9., 4.])))
+
+        srv_b = scheduler.Server('b', [5, 10], traits=0, valid_until=500)
+        rack.add_node(srv_b)
+        self.assertTrue(np.array_equal(rack.free_capacity,
+                                       np.array([9., 10.])))
+
+        rack.remove_node_by_name('b')
+        self.assertIsNone(srv_b.capacity_row)
+        self.assertTrue(np.array_equal(srv_b.free_capacity,
+                                       np.array([5., 10.])))
+        self.assertTrue(np.array_equal(rack.free_capacity,
+                                       np.array([9., 4.])))
+
+    def test_grow(self):
+        """Test server row views survive the store resize."""
+        cell = scheduler.Cell('top', capacity_store=True)
+        cell.capacity_store = scheduler.CapacityStore(size=2)
+        rack = scheduler.Bucket('rack', traits=0)
+        cell.add_node(rack)
+
+        servers = [scheduler.Server('s%s' % idx, [idx, idx], traits=0,
+                                    valid_until=500)
+                   for idx in range(0, 5)]
+        for srv in servers:
+            rack.add_node(srv)
+
+        self.assertEqual(8, len(cell.capacity_store.servers))
+        for idx, srv in enumerate(servers):
+            srv.free_capacity -= 1
+            self.assertTrue(np.array_equal(
+                cell.capacity_store.matrix[srv.capacity_row],
+                np.array([idx - 1., idx - 1.])))
+
+    def test_same_placement(self):
+        """Test schedule is same with and without capacity store."""
+        placements = []
+        for capacity_store in [False, True]:
+            cell = self._make_cell(capacity_store)
+            alloc = cell.partitions[None].allocation
+            for idx in range(0, 30):
+                cell.add_app(alloc, scheduler.Application(
+                    'app-%s' % idx, idx % 7 + 1, [idx % 4 + 1, idx % 3 + 1],
+                    'app-%s' % (idx % 3)))
+            cell.schedule()
+
+            for idx in range(0, 30, 4):
+                cell.remove_app('app-%s' % idx)
+            cell.add_app(alloc, scheduler.Application('big', 99, [10, 10],
+                                                      'big'))
+            cell.schedule()
+
+            placements.append(
+                sorted((name, app.server) for name, app in cell.apps.items())
+            )
+
+        self.assertEqual(placements[0], placements[1])
+        self.assertIsNotNone(cell.apps['big'].server)
+
+
+class IncrementalScheduleTest(unittest.TestCase):
+    """treadmill.scheduler.Cell incremental mode tests."""
+
+    def setUp(self):
+        scheduler.DIMENSION_COUNT = 2
+        super(IncrementalScheduleTest, self).setUp()
+
+    def _make_cell(self, incremental):
+        """Create cell with two partitions, with two racks each."""
+        cell = scheduler.Cell('top', incremental=incremental)
+        for label in [None, 'xx']:
+            for rack_idx in range(0, 2):
+                rack = scheduler.Bucket('rack:%s-%s' % (label, rack_idx),
+                                        traits=0)
+                cell.add_node(rack)
+                for srv_idx in range(0, 3):
+                    srv = scheduler.Server(
+                        'srv-%s-%s-%s' % (label, rack_idx, srv_idx),
+                        [10, 10], traits=0, valid_until=time.time() + 1000,
+                        label=label)
+                    rack.add_node(srv)
+        return cell
+
+    def _placement(self, cell):
+        """Current placement of all apps in the cell."""
+        return sorted((name, app.server) for name, app in cell.apps.items())
+
+    @mock.patch('treadmill.scheduler.Cell.schedule_alloc', autospec=True,
+                side_effect=scheduler.Cell.schedule_alloc)
+    def test_skip_unchanged(self, schedule_alloc_mock):
+        """Test unchanged partitions are not rescheduled."""
+        cell = self._make_cell(incremental=True)
+        for label in [None, 'xx']:
+            alloc = cell.partitions[label].allocation
+            for idx in range(0, 5):
+                cell.add_app(alloc, scheduler.Application(
+                    '%s-app-%s' % (label, idx), 1, [3, 3], 'app'))
+
+        # Initial run is full, and second run confirms nothing changes.
+        cell.schedule()
+        cell.schedule()
+        self.assertEqual(4, schedule_alloc_mock.call_count)
+
+        schedule_alloc_mock.reset_mock()
+        placement = cell.schedule()
+        self.assertEqual(0, schedule_alloc_mock.call_count)
+        self.assertEqual(10, len(placement))
+
+        # New app - only affected partition is scheduled.
+        alloc = cell.partitions['xx'].allocation
+        cell.add_app(alloc, scheduler.Application('xx-new', 1, [3, 3], 'app'))
+        cell.schedule()
+        self.assertEqual(1, schedule_alloc_mock.call_count)
+        self.assertIsNotNone(cell.apps['xx-new'].server)
+
+        # Server state change affects all partitions.
+        schedule_alloc_mock.reset_mock()
+        cell.schedule()
+        cell.children_by_name['rack:None-0'].children[0].state = (
+            scheduler.State.frozen
+        )
+        cell.schedule()
+        self.assertEqual(3, schedule_alloc_mock.call_count)
+
+    def test_same_as_full(self):
+        """Test incremental placement matches full schedule."""
+        cells = [self._make_cell(incremental=False),
+                 self._make_cell(incremental=True)]
+
+        def _step(func):
+            """Apply the change to both cells, compare placement."""
+            for cell in cells:
+                func(cell)
+                cell.schedule()
+                cell.schedule()
+            self.assertEqual(self._placement(cells[0]),
+                             self._placement(cells[1]))
+
+        def _add_apps(prefix, label, count, prio, demand):
+            """Add apps to the partition."""
+            def _add(cell):
+                """Add apps."""
+                alloc = cell.partitions[label].allocation
+                for idx in range(0, count):
+                    app = scheduler.Application(
+                        '%s-%s' % (prefix, idx), prio, demand, prefix,
+                        data_retention_timeout=0)
+                    app.global_order = idx
+                    cell.add_app(alloc, app)
+            return _add
+
+        def _server_down(cell):
+            """Bring server down."""
+            server = cell.children_by_name['rack:xx-1'].children[2]
+            server.state = scheduler.State.down
+
+        def _remove_apps(cell):
+            """Remove some apps."""
+            for idx in range(0, 12, 3):
+                cell.remove_app('small-%s' % idx)
+
+        _step(_add_apps('small', None, 12, 1, [2, 3]))
+        _step(_add_apps('other', 'xx', 12, 1, [4, 4]))
+        _step(_add_apps('big', None, 4, 50, [9, 9]))
+        _step(_server_down)
+        _step(_remove_apps)
+        _step(_add_apps('large', 'xx', 3, 90, [10, 10]))
+
+    @mock.patch('time.time', mock.Mock(return_value=1000))
+    def test_full_schedule_interval(self):
+        """Test full schedule is run periodically."""
+        cell = self._make_cell(incremental=True)
+        cell.schedule()
+        cell.schedule()
+        self.assertEqual(1000, cell.last_full_schedule)
+
+        time.time.return_value = 1000 + scheduler.FULL_SCHEDULE_INTERVAL + 1
+        cell.schedule()
+        self.assertEqual(1000 + scheduler.FULL_SCHEDULE_INTERVAL + 1,
+                         cell.last_full_schedule)
+
+
 class IdentityGroupTest(unittest.TestCase):
     """scheduler IdentityGroup test."""
 
@@ -9,6 +9,7 @@ import select
 import socket
 
 import mock
+import yaml
 
 from treadmill.services import _base_service
 
@@ -108,10 +109,14 @@ class BaseServiceTest(unittest.TestCase):
         )
 
     @mock.patch('select.poll', autospec=True)
+    @mock.patch('select.epoll', mock.Mock())
     @mock.patch('treadmill.dirwatch.DirWatcher', autospec=True)
     @mock.patch('treadmill.services._base_service.ResourceService'
                 '._create_status_socket',
                 mock.Mock(return_value='status_socket'))
+    @mock.patch('treadmill.services._base_service.ResourceService'
+                '._create_request_socket',
+                mock.Mock(return_value='request_socket'))
     @mock.patch('treadmill.services._base_service.ResourceService'
                 '._check_requests',
                 mock.Mock(return_value=['foo-1', 'foo-2']))
@@ -204,11 +209,17 @@ class BaseServiceTest(unittest.TestCase):
                 ('eventfd', mock.ANY, mock.ANY),
                 ('mock_inotiy', mock.ANY, mock.ANY),
                 ('status_socket', mock.ANY, mock.ANY),
+                (select.epoll.return_value, mock.ANY, mock.ANY),
                 ('filenoA', mock.ANY, mock.ANY),
                 ('filenoB', mock.ANY, mock.ANY),
             ],
         )
 
+        # Request channels are accepted on the request socket
+        select.epoll.return_value.register.assert_called_with(
+            'request_socket', select.EPOLLIN
+        )
+
         # Loop exits immediately
 
         # Watchdog lease should be cleared
@@ -276,6 +287,99 @@ class BaseServiceTest(unittest.TestCase):
 
         self.assertTrue(res)
 
+    @mock.patch('treadmill.services._base_service._wait_for_file',
+                mock.Mock(spec_set=True))
+    @mock.patch('yaml.load', mock.Mock(spec_set=True))
+    def test_request_channel(self):
+        """Test requests and replies through the request channel.
+        """
+        # Access to a protected member of a client class
+        # pylint: disable=W0212
+
+        instance = _base_service.ResourceService(
+            service_dir=os.path.join(self.root, 'svc'),
+            impl=MyTestService,
+        )
+        instance._request_socket = instance._create_request_socket()
+        instance._channels_poll = select.epoll()
+        instance._channels_poll.register(instance._request_socket,
+                                         select.EPOLLIN)
+        impl = MyTestService()
+        impl.on_create_request = mock.Mock(return_value={'hello': 'world'})
+        client = instance.make_client(os.path.join(self.root, 'client'))
+        req_dir = os.path.join(self.root, 'client', 'req-MyTestService-foo')
+
+        client.put('foo', {'a': 1})
+        res = instance._on_created(impl,
+                                   os.path.join(self.root, 'svc', 'resources',
+                                                'foo'))
+
+        # Request data is taken from the channel, reply sent through it.
+        self.assertTrue(res)
+        impl.on_create_request.assert_called_with('foo', {'a': 1})
+        self.assertFalse(yaml.load.called)
+        self.assertTrue(os.path.exists(os.path.join(req_dir, 'reply.yml')))
+        self.assertEqual(client.wait('foo', timeout=1), {'hello': 'world'})
+        self.assertFalse(_base_service._wait_for_file.called)
+
+        # Update, with error.
+        impl.on_create_request.return_value = {
+            '_error': {'input': {'a': 2}, 'why': 'boom'},
+        }
+        client.put('foo', {'a': 2})
+        self.assertFalse(os.path.exists(os.path.join(req_dir, 'reply.yml')))
+        res = instance._on_created(impl,
+                                   os.path.join(self.root, 'svc', 'resources',
+                                                'foo'))
+
+        self.assertFalse(res)
+        impl.on_create_request.assert_called_with('foo', {'a': 2})
+        self.assertRaises(
+            _base_service.ResourceServiceRequestError,
+            client.wait, 'foo', timeout=1
+        )
+        self.assertFalse(_base_service._wait_for_file.called)
+
+        # Requests of closed channels are read from the request files.
+        client.put('foo', {'a': 3})
+        instance._handle_channels()
+        self.assertIn('foo', instance._announced)
+        client._close_channel()
+        instance._handle_channels()
+        self.assertEqual(instance._announced, {})
+        self.assertEqual(instance._channels, {})
+
+    @mock.patch('treadmill.services._base_service._wait_for_file',
+                mock.Mock(return_value=False))
+    def test_request_channel_unavailable(self):
+        """Test the fallback to the request files without request channel.
+        """
+        # Access to a protected member of a client class
+        # pylint: disable=W0212
+
+        instance = _base_service.ResourceService(
+            service_dir=os.path.join(self.root, 'svc'),
+            impl=MyTestService,
+        )
+        client = instance.make_client(os.path.join(self.root, 'client'))
+
+        client.put('foo', {'a': 1})
+
+        self.assertIsNone(client._channel)
+        self.assertTrue(
+            os.path.islink(os.path.join(self.root, 'svc', 'resources', 'foo'))
+        )
+        self.assertRaises(
+            _base_service.ResourceServiceTimeoutError,
+            client.wait, 'foo', timeout=1
+        )
+        _base_service._wait_for_file.assert_called_with(
+            os.path.join(self.root, 'client', 'req-MyTestService-foo',
+                         'reply.yml'),
+            mock.ANY,
+            1
+        )
+
 
 if __name__ == '__main__':
     unittest.main()
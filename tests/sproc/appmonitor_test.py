@@ -42,11 +42,11 @@ class AppMonitorTest(unittest.TestCase):
         instance_api = mock.MagicMock()
         appmonitor.reevaluate(instance_api, state)
         self.assertFalse(instance_api.create.called)
-        self.assertFalse(instance_api.delete.called)
+        self.assertFalse(instance_api.bulk_delete.called)
 
         state['scheduled']['foo.baz'].append('foo.baz#5')
         appmonitor.reevaluate(instance_api, state)
-        instance_api.delete.assert_called_with('foo.baz#3')
+        instance_api.bulk_delete.assert_called_with(['foo.baz#3'])
 
         self.assertEquals(101, state['monitors']['foo.bar']['last_update'])
         self.assertEquals(101, state['monitors']['foo.baz']['last_update'])
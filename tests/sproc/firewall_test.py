@@ -0,0 +1,72 @@
+"""Unit test for treadmill.sproc.firewall
+"""
+
+import unittest
+
+import mock
+
+import treadmill
+from treadmill import firewall
+from treadmill import iptables
+from treadmill.sproc import firewall as firewall_sproc
+
+
+class FirewallTest(unittest.TestCase):
+    """Test treadmill.sproc.firewall"""
+
+    @mock.patch('treadmill.iptables.configure_nat_chains', mock.Mock())
+    @mock.patch('treadmill.iptables.ipset_update', mock.Mock())
+    def test_rule_engine(self):
+        """Test rule changes are applied in batches."""
+        # Disable W0212: Test access protected members of admin module.
+        # pylint: disable=W0212
+        dnat_rule = firewall.DNATRule(proto='tcp',
+                                      dst_ip='1.1.1.1', dst_port=123,
+                                      new_ip='2.2.2.2', new_port=345)
+        pt_rule1 = firewall.PassThroughRule(src_ip='3.3.3.3',
+                                            dst_ip='4.4.4.4')
+        pt_rule2 = firewall.PassThroughRule(src_ip='3.3.3.3',
+                                            dst_ip='5.5.5.5')
+
+        engine = firewall_sproc._RuleEngine()
+        engine.add_rule(iptables.PREROUTING_DNAT, dnat_rule)
+        engine.add_rule(iptables.PREROUTING_PASSTHROUGH, pt_rule1)
+        engine.add_rule(iptables.PREROUTING_PASSTHROUGH, pt_rule2)
+        engine.apply()
+
+        treadmill.iptables.configure_nat_chains.assert_called_with({
+            iptables.PREROUTING_DNAT: set([dnat_rule]),
+            iptables.PREROUTING_PASSTHROUGH: set([pt_rule1, pt_rule2]),
+        })
+        treadmill.iptables.ipset_update.assert_called_with(
+            [('add', iptables.SET_PASSTHROUGHS, '3.3.3.3')]
+        )
+
+        # Nothing changed, nothing to apply.
+        treadmill.iptables.configure_nat_chains.reset_mock()
+        engine.delete_rule(iptables.PREROUTING_DNAT, pt_rule1)
+        engine.apply()
+        self.assertFalse(treadmill.iptables.configure_nat_chains.called)
+
+        # Passthrough IP is removed with its last rule.
+        engine.delete_rule(iptables.PREROUTING_PASSTHROUGH, pt_rule1)
+        engine.apply()
+        treadmill.iptables.ipset_update.assert_called_with([])
+
+        engine.delete_rule(iptables.PREROUTING_PASSTHROUGH, pt_rule2)
+        engine.apply()
+        treadmill.iptables.configure_nat_chains.assert_called_with({
+            iptables.PREROUTING_PASSTHROUGH: set(),
+        })
+        treadmill.iptables.ipset_update.assert_called_with(
+            [('del', iptables.SET_PASSTHROUGHS, '3.3.3.3')]
+        )
+
+        self.assertRaises(
+            ValueError,
+            engine.add_rule, 'TM_UNKNOWN', dnat_rule
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
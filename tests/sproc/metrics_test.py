@@ -1,14 +1,75 @@
 """Unit test for treadmill.sproc.metrics"""
 
+import subprocess
 import unittest
 
-# the point of this file is to check at least the syntax
-from treadmill.sproc import metrics  # noqa: F401
+import mock
+
+import treadmill
+from treadmill.sproc import metrics
 
 
 class MetricsTest(unittest.TestCase):
     """Test treadmill.sproc.metrics"""
-    pass
+
+    @mock.patch('treadmill.metrics.rrd.sample', mock.Mock())
+    @mock.patch('treadmill.rrdutils.lastupdate', mock.Mock())
+    def test_sampler_collect(self):
+        """Test sampling cgroups, last values are kept in memory."""
+        # pylint: disable=W0212
+        def _lastupdate(rrdfile):
+            """Mock last update of existing rrd files."""
+            if rrdfile == 'a.rrd':
+                return {'cpu_total': 1, 'timestamp': 10}
+            raise subprocess.CalledProcessError(1, 'rrdtool')
+
+        treadmill.rrdutils.lastupdate.side_effect = _lastupdate
+        treadmill.metrics.rrd.sample.side_effect = (
+            lambda cgrp, _last, _maj_min, _dev: (
+                None if cgrp == 'gone' else {'cputotal': 2, 'timestamp': 20}
+            )
+        )
+        sampler = metrics._Sampler(workers=2)
+        sampler.reset('new.rrd')
+        targets = [
+            ('a.rrd', 'a', '1:2', '/dev/a'),
+            ('b.rrd', 'gone', None, None),
+            ('new.rrd', 'new', None, None),
+        ]
+
+        updates = sampler.collect(targets)
+
+        self.assertEqual(
+            updates,
+            [
+                ('a.rrd', {'cputotal': 2, 'timestamp': 20}, 20),
+                ('new.rrd', {'cputotal': 2, 'timestamp': 20}, 20),
+            ]
+        )
+        treadmill.rrdutils.lastupdate.assert_has_calls(
+            [mock.call('a.rrd'), mock.call('b.rrd')],
+            any_order=True
+        )
+        self.assertEqual(treadmill.rrdutils.lastupdate.call_count, 2)
+        treadmill.metrics.rrd.sample.assert_has_calls(
+            [
+                mock.call('a', {'cpu_total': 1, 'timestamp': 10}, '1:2',
+                          '/dev/a'),
+                mock.call('gone', {}, None, None),
+                mock.call('new', {}, None, None),
+            ],
+            any_order=True
+        )
+
+        # Second cycle does not ask the rrd daemon again.
+        treadmill.rrdutils.lastupdate.reset_mock()
+        treadmill.metrics.rrd.sample.reset_mock()
+        sampler.collect(targets[:1])
+
+        self.assertFalse(treadmill.rrdutils.lastupdate.called)
+        treadmill.metrics.rrd.sample.assert_called_with(
+            'a', {'cpu_total': 2, 'timestamp': 20}, '1:2', '/dev/a'
+        )
 
 
 if __name__ == '__main__':
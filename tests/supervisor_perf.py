@@ -0,0 +1,113 @@
+"""Performance test for service supervision.
+
+Compares the native s6-supervise client with the s6 command line tools
+(forked through subproc) on start/stop/status of many services. Requires s6,
+with TREADMILL_ALIASES_PATH set:
+
+    python tests/supervisor_perf.py
+"""
+
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+
+from treadmill import subproc
+from treadmill import supervisor
+
+
+_SERVICES = 200
+
+
+def _create_services(scan_dir):
+    """Create services, normally down."""
+    for idx in range(_SERVICES):
+        svc_dir = os.path.join(scan_dir, 'svc%d' % idx)
+        os.mkdir(svc_dir)
+        with open(os.path.join(svc_dir, 'run'), 'w') as f:
+            f.write('#!/bin/sh\nexec sleep 1000\n')
+        os.chmod(os.path.join(svc_dir, 'run'), 0o755)
+        open(os.path.join(svc_dir, 'down'), 'w').close()
+
+
+def _run_native(scan_dir, services):
+    """Start, check and stop services with the native client."""
+    timings = []
+
+    start_time = time.time()
+    for service in services:
+        supervisor.start_service(scan_dir, service, once=False)
+    supervisor.wait_all_up(scan_dir)
+    timings.append(time.time() - start_time)
+
+    start_time = time.time()
+    state = supervisor.get_state(scan_dir)
+    timings.append(time.time() - start_time)
+    assert all(svc['state'] == 'up' for svc in state.values())
+
+    start_time = time.time()
+    for service in services:
+        supervisor.stop_service(scan_dir, service)
+    supervisor.wait_all_down(scan_dir)
+    timings.append(time.time() - start_time)
+
+    return timings
+
+
+def _run_subprocess(scan_dir, services):
+    """Start, check and stop services with the s6 tools."""
+    svc_dirs = [os.path.join(scan_dir, service) for service in services]
+    timings = []
+
+    start_time = time.time()
+    for svc_dir in svc_dirs:
+        subproc.check_call(['s6_svc', '-u', svc_dir])
+    subproc.check_call(['s6_svwait', '-u', '-a'] + svc_dirs)
+    timings.append(time.time() - start_time)
+
+    start_time = time.time()
+    for svc_dir in svc_dirs:
+        subproc.check_output(['s6_svstat', svc_dir])
+    timings.append(time.time() - start_time)
+
+    start_time = time.time()
+    for svc_dir in svc_dirs:
+        subproc.check_call(['s6_svc', '-d', svc_dir])
+    subproc.check_call(['s6_svwait', '-d', '-a'] + svc_dirs)
+    timings.append(time.time() - start_time)
+
+    return timings
+
+
+def run():
+    """Time supervision operations with both backends."""
+    scan_dir = tempfile.mkdtemp()
+    _create_services(scan_dir)
+    services = sorted(os.listdir(scan_dir))
+
+    svscan = subprocess.Popen([subproc.resolve('s6_svscan'), scan_dir])
+    try:
+        while not all(supervisor.is_supervisor_running(scan_dir, service)
+                      for service in services):
+            time.sleep(0.1)
+
+        for name, runner in (('subprocess', _run_subprocess),
+                             ('native', _run_native)):
+            start, status, stop = runner(scan_dir, services)
+            print('%-10s start: %7.3fms, status: %7.3fms, stop: %7.3fms '
+                  '(per service)' % (
+                      name,
+                      start * 1000 / _SERVICES,
+                      status * 1000 / _SERVICES,
+                      stop * 1000 / _SERVICES,
+                  ))
+
+    finally:
+        subproc.call(['s6_svscanctl', '-t', scan_dir])
+        svscan.wait()
+        shutil.rmtree(scan_dir)
+
+
+if __name__ == '__main__':
+    run()
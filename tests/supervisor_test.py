@@ -4,14 +4,15 @@
 import os
 import re
 import shutil
+import subprocess
 import tempfile
 import unittest
 
 import mock
 
-import treadmill
 from treadmill import fs
 from treadmill import supervisor
+from treadmill.s6 import supervise
 
 
 def _strip(content):
@@ -98,7 +99,8 @@ class SupervisorTest(unittest.TestCase):
             supervisor._parse_state('down 100 seconds normally up')
         )
 
-    @mock.patch('treadmill.subproc.check_call', mock.Mock(return_value=0))
+    @mock.patch('treadmill.s6.supervise.wait_for',
+                mock.Mock(return_value=True))
     def test_wait(self):
         """Test waiting for service status change."""
         # Disable W0212: accessing protected member
@@ -109,38 +111,35 @@ class SupervisorTest(unittest.TestCase):
         fs.mkdir_safe(os.path.join(svcroot, 'b'))
 
         supervisor._service_wait(svcroot, '-u', '-o')
-        treadmill.subproc.check_call.assert_called_with(
-            [
-                's6_svwait', '-u',
-                '-t', '0', '-o',
-                svcroot + '/a',
-                svcroot + '/b'
-            ]
+        args, kwargs = supervise.wait_for.call_args
+        self.assertEqual(
+            sorted(args[0]), [svcroot + '/a', svcroot + '/b']
         )
-        treadmill.subproc.check_call.reset_mock()
-
-        supervisor._service_wait(svcroot, '-u', '-o', subset=['a'])
-        treadmill.subproc.check_call.assert_called_with(
-            [
-                's6_svwait', '-u',
-                '-t', '0', '-o',
-                svcroot + '/a'
-            ]
+        self.assertEqual(args[1], supervise.WaitFor.up)
+        self.assertEqual(kwargs, {'wait_all': False, 'timeout': 0})
+        supervise.wait_for.reset_mock()
+
+        supervisor._service_wait(svcroot, '-D', '-a', subset=['a'])
+        supervise.wait_for.assert_called_with(
+            [svcroot + '/a'], supervise.WaitFor.really_down,
+            wait_all=True, timeout=0
         )
-        treadmill.subproc.check_call.reset_mock()
+        supervise.wait_for.reset_mock()
 
         supervisor._service_wait(svcroot, '-u', '-o', subset={'a': 1})
-        treadmill.subproc.check_call.assert_called_with(
-            [
-                's6_svwait', '-u',
-                '-t', '0', '-o',
-                svcroot + '/a'
-            ]
+        supervise.wait_for.assert_called_with(
+            [svcroot + '/a'], supervise.WaitFor.up,
+            wait_all=False, timeout=0
         )
-        treadmill.subproc.check_call.reset_mock()
+        supervise.wait_for.reset_mock()
 
         supervisor._service_wait(svcroot, '-u', '-o', subset=[])
-        self.assertFalse(treadmill.subproc.check_call.called)
+        self.assertFalse(supervise.wait_for.called)
+
+        supervise.wait_for.return_value = False
+        with self.assertRaises(subprocess.CalledProcessError) as ctx:
+            supervisor._service_wait(svcroot, '-d', '-a', timeout=100)
+        self.assertEqual(ctx.exception.returncode, supervisor.ERR_TIMEOUT)
 
 
 if __name__ == '__main__':
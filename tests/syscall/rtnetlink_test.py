@@ -0,0 +1,140 @@
+"""Unit test for rtnetlink client
+"""
+
+import errno
+import socket
+import struct
+import unittest
+
+import mock
+
+from treadmill.syscall import rtnetlink
+
+
+def _ack(seq, err=0):
+    """Build a netlink acknowledgment (NLMSG_ERROR) message."""
+    payload = struct.pack('=i', -err) + b'\0' * 16
+    return struct.pack('=IHHII', 16 + len(payload), rtnetlink.NLMSG_ERROR, 0,
+                       seq, 0) + payload
+
+
+def _messages(data):
+    """Split a datagram into (type, flags, seq, payload) tuples."""
+    messages = []
+    offset = 0
+    while offset < len(data):
+        length, msg_type, flags, seq, _pid = struct.unpack_from('=IHHII',
+                                                                data, offset)
+        messages.append((msg_type, flags, seq, data[offset + 16:
+                                                    offset + length]))
+        offset += (length + 3) & ~3
+    return messages
+
+
+class RtNetlinkTest(unittest.TestCase):
+    """Tests for teadmill.syscall.rtnetlink."""
+
+    def setUp(self):
+        patcher = mock.patch('socket.socket', autospec=True)
+        self.mock_socket = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+
+    def test_attr(self):
+        """Test routing attributes encoding and alignment."""
+        self.assertEqual(
+            rtnetlink._attr_str(rtnetlink.IFLA_IFNAME, 'eth0'),
+            b'\x09\x00\x03\x00eth0\x00\x00\x00\x00'
+        )
+        self.assertEqual(
+            rtnetlink._attr_u32(rtnetlink.IFLA_MTU, 9000),
+            b'\x08\x00\x04\x00' + struct.pack('=I', 9000)
+        )
+
+    def test_link_set(self):
+        """Test single request."""
+        rtnl = rtnetlink.RtNetlink()
+        self.mock_socket.recv.return_value = _ack(1)
+
+        rtnl.link_set('foo', up=True, mtu=9000)
+
+        data, = self.mock_socket.send.call_args[0]
+        (msg_type, flags, seq, payload), = _messages(data)
+        self.assertEqual(msg_type, rtnetlink.RTMType.SETLINK)
+        self.assertEqual(flags, rtnetlink.NLM_F_REQUEST | rtnetlink.NLM_F_ACK)
+        self.assertEqual(seq, 1)
+        self.assertEqual(
+            payload,
+            struct.pack('=BxHiII', socket.AF_UNSPEC, 0, 0, 1, 1) +
+            rtnetlink._attr_str(rtnetlink.IFLA_IFNAME, 'foo') +
+            rtnetlink._attr_u32(rtnetlink.IFLA_MTU, 9000)
+        )
+
+    def test_batch(self):
+        """Test batched requests are sent in one datagram."""
+        rtnl = rtnetlink.RtNetlink()
+        # Acknowledgments can span several datagrams.
+        self.mock_socket.recv.side_effect = [
+            _ack(1) + _ack(2),
+            _ack(3),
+        ]
+
+        with rtnl.batch():
+            rtnl.link_add_veth('veth0', 'veth1')
+            rtnl.link_set('veth0', master=3)
+            rtnl.addr_add(7, '10.0.0.1/16', scope='link')
+            self.assertFalse(self.mock_socket.send.called)
+
+        self.assertEqual(self.mock_socket.send.call_count, 1)
+        data, = self.mock_socket.send.call_args[0]
+        messages = _messages(data)
+        self.assertEqual(
+            [(msg_type, seq) for msg_type, _flags, seq, _payload in messages],
+            [
+                (rtnetlink.RTMType.NEWLINK, 1),
+                (rtnetlink.RTMType.SETLINK, 2),
+                (rtnetlink.RTMType.NEWADDR, 3),
+            ]
+        )
+        self.assertIn(b'veth\0', messages[0][3])
+        self.assertIn(b'veth1\0', messages[0][3])
+        self.assertEqual(
+            messages[2][3][:8],
+            struct.pack('=BBBBi', socket.AF_INET, 16, 0, 253, 7)
+        )
+
+    def test_batch_error(self):
+        """Test errors are raised once all requests are acknowledged."""
+        rtnl = rtnetlink.RtNetlink()
+        self.mock_socket.recv.return_value = (
+            _ack(1, errno.EEXIST) + _ack(2)
+        )
+
+        with self.assertRaises(OSError) as ctx:
+            with rtnl.batch():
+                rtnl.link_add_bridge('br0')
+                rtnl.link_set('br0', up=True)
+
+        self.assertEqual(ctx.exception.errno, errno.EEXIST)
+        self.assertEqual(self.mock_socket.recv.call_count, 1)
+
+    def test_route_add(self):
+        """Test route encoding."""
+        rtnl = rtnetlink.RtNetlink()
+        self.mock_socket.recv.return_value = _ack(1)
+
+        rtnl.route_add('default', via='10.0.0.1', src='10.0.0.2')
+
+        data, = self.mock_socket.send.call_args[0]
+        (msg_type, _flags, _seq, payload), = _messages(data)
+        self.assertEqual(msg_type, rtnetlink.RTMType.NEWROUTE)
+        self.assertEqual(
+            payload,
+            struct.pack('=BBBBBBBBI', socket.AF_INET, 0, 0, 0, 254, 3, 0, 1,
+                        0) +
+            rtnetlink._attr_ipv4(rtnetlink.RTA_GATEWAY, '10.0.0.1') +
+            rtnetlink._attr_ipv4(rtnetlink.RTA_PREFSRC, '10.0.0.2')
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
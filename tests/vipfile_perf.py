@@ -0,0 +1,45 @@
+"""Performance test for treadmill.vipfile
+"""
+
+import os
+import shutil
+import tempfile
+import timeit
+
+from treadmill import vipfile
+
+# Number of allocatable IPs in the 192.168.0.0/16 pool (x.x.128.x and x.x.x.0
+# addresses are reserved).
+_POOL_CAPACITY = 255 * 255
+
+
+def test_alloc(usage, count=1000):
+    """Allocate and free count IPs with pool filled to usage ratio."""
+    root = tempfile.mkdtemp()
+    try:
+        owners_dir = os.path.join(root, 'owners')
+        os.mkdir(owners_dir)
+        with open(os.path.join(owners_dir, 'owner'), 'w'):
+            pass
+
+        vips = vipfile.VipMgr(os.path.join(root, 'vips'), owners_dir)
+        for _idx in range(0, int(_POOL_CAPACITY * usage)):
+            vips.alloc('owner')
+
+        def _alloc():
+            """Allocate and free IPs."""
+            for _idx in range(0, count):
+                vips.free('owner', vips.alloc('owner'))
+
+        interval = timeit.timeit(stmt=_alloc, number=1)
+        print('usage: %d%%, %d allocations: %.3fs' % (
+            usage * 100, count, interval))
+        return interval
+
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == '__main__':
+    for pool_usage in [0, 0.5, 0.95]:
+        test_alloc(pool_usage)
@@ -59,6 +59,44 @@ class VipFileTest(unittest.TestCase):
         self.vips.free(owner, ip0)
         self.assertFalse(os.path.exists(os.path.join(self.vips_dir, ip0)))
 
+    def test_alloc_cursor(self):
+        """Tests allocation skips allocated IPs and rotates over freed IPs."""
+        os.symlink(os.path.join(self.root, 'owners', '0'),
+                   os.path.join(self.vips_dir, '192.168.0.1'))
+        # Allocation map is loaded from the directory.
+        vips = vipfile.VipMgr(self.vips_dir, os.path.join(self.root, 'owners'))
+
+        ip0 = vips.alloc('1')
+        self.assertEqual('192.168.0.2', ip0)
+        vips.free('1', ip0)
+        self.assertEqual('192.168.0.3', vips.alloc('2'))
+
+        # IP allocated outside of the manager is skipped.
+        os.symlink(os.path.join(self.root, 'owners', '0'),
+                   os.path.join(self.vips_dir, '192.168.0.4'))
+        self.assertEqual('192.168.0.5', vips.alloc('3'))
+
+        # x.x.x.0 and x.x.128.x addresses are never allocated.
+        self.assertEqual('192.168.1.1', vips.alloc('4', '192.168.1.1'))
+        self.assertEqual(
+            sorted([
+                ('192.168.0.1', '0'),
+                ('192.168.0.3', '2'),
+                ('192.168.0.4', '0'),
+                ('192.168.0.5', '3'),
+                ('192.168.1.1', '4'),
+            ]),
+            sorted(vips.list())
+        )
+
+    def test_garbage_collect(self):
+        """Tests IPs without owner are reclaimed."""
+        ip0 = self.vips.alloc('3')
+        os.unlink(os.path.join(self.root, 'owners', '3'))
+        self.vips.garbage_collect()
+        self.assertFalse(os.path.lexists(os.path.join(self.vips_dir, ip0)))
+        self.assertEqual([], self.vips.list())
+
 
 if __name__ == '__main__':
     unittest.main()
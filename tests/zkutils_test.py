@@ -106,6 +106,81 @@ class ZkTest(unittest.TestCase):
         kazoo.client.KazooClient.get.return_value = (None, None)
         self.assertIsNone(zkutils.get(client, '/foo'))
 
+        # JSON
+        kazoo.client.KazooClient.get.return_value = (
+            b'{"xxx": [1, 2]}', None
+        )
+        self.assertEqual({'xxx': [1, 2]}, zkutils.get(client, '/foo'))
+
+        # Flow style YAML, not a valid JSON.
+        kazoo.client.KazooClient.get.return_value = (b'[xxx, yyy]', None)
+        self.assertEqual(['xxx', 'yyy'], zkutils.get(client, '/foo'))
+
+        # Written by default YAML dumper.
+        kazoo.client.KazooClient.get.return_value = (
+            b'xxx: !!python/tuple [1, 2]', None
+        )
+        self.assertEqual({'xxx': (1, 2)}, zkutils.get(client, '/foo'))
+
+    def test_codec(self):
+        """Test serializing node data with YAML/JSON codec."""
+        # Access to protected member warning.
+        #
+        # pylint: disable=W0212
+        self.assertEqual(
+            b'xxx: [1, 2]\n',
+            zkutils._payload({'xxx': (1, 2)})
+        )
+
+        zkutils.set_codec('json')
+        try:
+            payload = zkutils._payload({'xxx': (1, 2)})
+        finally:
+            zkutils.set_codec('yaml')
+
+        self.assertEqual(b'{"xxx":[1,2]}', payload)
+        self.assertEqual({'xxx': [1, 2]}, zkutils.loads(payload))
+
+    @mock.patch('kazoo.client.KazooClient.get', mock.Mock())
+    @mock.patch('kazoo.client.KazooClient.get_children', mock.Mock())
+    def test_get_many(self):
+        """Test reading nodes in bulk."""
+        content = {
+            '/a/1': (b'{xxx: 1}', None),
+            '/a/2': (b'{"xxx": 2}', None),
+        }
+
+        def _get(path, watch=None):  # pylint: disable=W0613
+            """Return node content, raise if node does not exist."""
+            if path not in content:
+                raise kazoo.client.NoNodeError()
+            return content[path]
+
+        def _get_children(path):
+            """Return node children, raise if node does not exist."""
+            if path != '/a':
+                raise kazoo.client.NoNodeError()
+            return ['1', '2']
+
+        kazoo.client.KazooClient.get.side_effect = _get
+        kazoo.client.KazooClient.get_children.side_effect = _get_children
+        client = kazoo.client.KazooClient()
+
+        paths = ['/a/%s' % idx for idx in range(1, 101)]
+        self.assertEqual(
+            [{'xxx': 1}, {'xxx': 2}, None],
+            zkutils.get_many(client, paths, max_inflight=10)[:3]
+        )
+        self.assertEqual(
+            [{}] * 98,
+            zkutils.get_many(client, paths[2:], default={})
+        )
+
+        self.assertEqual(
+            [['1', '2'], []],
+            zkutils.get_children_many(client, ['/a', '/b'], default=[])
+        )
+
     @mock.patch('kazoo.client.KazooClient.create', mock.Mock())
     def test_ensure_exists(self):
         """Tests updating/creating node content."""
@@ -186,6 +261,99 @@ class ZkTest(unittest.TestCase):
         zkutils.update(zkclient, '/a', 'bbb', check_content=True)
         kazoo.client.KazooClient.set.assert_called_with('/a', b'bbb')
 
+    @mock.patch('kazoo.client.KazooClient.transaction', mock.Mock())
+    def test_apply_transactions(self):
+        """Verifies operations are committed in ordered chunks."""
+        zkclient = kazoo.client.KazooClient()
+        transaction = kazoo.client.KazooClient.transaction.return_value
+        transaction.commit.return_value = []
+
+        ops = [
+            ('delete', '/a/1'),
+            ('create', '/a/2', 'aaa', None),
+            ('set', '/a/3', 'bbb', None),
+        ]
+        self.assertEqual(1, zkutils.apply_transactions(zkclient, ops))
+        self.assertEqual(
+            [
+                mock.call.delete('/a/1'),
+                mock.call.create('/a/2', b'aaa', acl=mock.ANY),
+                mock.call.set_data('/a/3', b'bbb'),
+                mock.call.commit(),
+            ],
+            transaction.mock_calls
+        )
+
+        # Each operation exceeds half of the max size.
+        transaction.reset_mock()
+        self.assertEqual(
+            3, zkutils.apply_transactions(zkclient, ops, max_size=300)
+        )
+        self.assertEqual(
+            [
+                mock.call.delete('/a/1'),
+                mock.call.commit(),
+                mock.call.create('/a/2', b'aaa', acl=mock.ANY),
+                mock.call.commit(),
+                mock.call.set_data('/a/3', b'bbb'),
+                mock.call.commit(),
+            ],
+            transaction.mock_calls
+        )
+
+    @mock.patch('kazoo.client.KazooClient.transaction', mock.Mock())
+    @mock.patch('treadmill.zkutils.ensure_deleted', mock.Mock())
+    @mock.patch('treadmill.zkutils.put', mock.Mock())
+    def test_apply_transactions_failed(self):
+        """Verifies failed transaction is applied one op at a time."""
+        zkclient = kazoo.client.KazooClient()
+        transaction = kazoo.client.KazooClient.transaction.return_value
+        transaction.commit.return_value = [
+            kazoo.exceptions.NoNodeError(),
+            kazoo.exceptions.RolledBackError(),
+        ]
+
+        ops = [
+            ('delete', '/a/1'),
+            ('create', '/a/2', 'aaa', None),
+        ]
+        zkutils.apply_transactions(zkclient, ops)
+        zkutils.ensure_deleted.assert_called_with(zkclient, '/a/1')
+        zkutils.put.assert_called_with(zkclient, '/a/2', 'aaa', acl=None)
+
+    @mock.patch('kazoo.client.KazooClient.transaction', mock.Mock())
+    @mock.patch('treadmill.zkutils.put', mock.Mock(return_value='/a/x#9'))
+    def test_create_sequential(self):
+        """Verifies sequential nodes are created in chunked transactions."""
+        zkclient = kazoo.client.KazooClient()
+        transaction = kazoo.client.KazooClient.transaction.return_value
+        transaction.commit.side_effect = [
+            ['/a/x#1', '/a/x#2'],
+            [kazoo.exceptions.NoNodeError()],
+        ]
+
+        # Two operations fit in the first chunk.
+        self.assertEqual(
+            ['/a/x#1', '/a/x#2', '/a/x#9'],
+            zkutils.create_sequential(zkclient, '/a/x#', 'aaa', 3,
+                                      max_size=600)
+        )
+        self.assertEqual(
+            [
+                mock.call.create('/a/x#', b'aaa', acl=mock.ANY,
+                                 sequence=True),
+                mock.call.create('/a/x#', b'aaa', acl=mock.ANY,
+                                 sequence=True),
+                mock.call.commit(),
+                mock.call.create('/a/x#', b'aaa', acl=mock.ANY,
+                                 sequence=True),
+                mock.call.commit(),
+            ],
+            transaction.mock_calls
+        )
+        zkutils.put.assert_called_once_with(zkclient, '/a/x#', b'aaa',
+                                            acl=None, sequence=True)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -140,14 +140,38 @@ class API(object):
 
             master.delete_apps(context.GLOBAL.zk.conn, [rsrc_id])
 
+        @schema.schema(
+            {'type': 'array',
+             'items': {'$ref': 'instance.json#/resource_id'}}
+        )
+        def bulk_delete(rsrc_ids):
+            """Delete configured instances."""
+            _LOGGER.info('bulk_delete: %d instances', len(rsrc_ids))
+
+            master.delete_apps(context.GLOBAL.zk.conn, rsrc_ids)
+
         self.list = _list
         self.get = get
         self.create = create
         self.update = update
         self.delete = delete
+        self.bulk_delete = bulk_delete
 
 
 def init(authorizer):
     """Returns module API wrapped with authorizer function."""
     api = API()
-    return authz.wrap(api, authorizer)
+    bulk_delete = api.bulk_delete
+    api = authz.wrap(api, authorizer)
+
+    if authorizer:
+        def authorized_bulk_delete(rsrc_ids):
+            """Authorize the delete of every instance, as ``delete`` does,
+            then delete them all at once."""
+            for rsrc_id in rsrc_ids:
+                authorizer.authorize(__name__, 'delete', (rsrc_id,), {})
+            return bulk_delete(rsrc_ids)
+
+        api.bulk_delete = authorized_bulk_delete
+
+    return api
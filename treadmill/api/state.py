@@ -1,25 +1,33 @@
 """Implementation of state API."""
 
 
+import bisect
+import collections
+import itertools
 import logging
 
 import os
 import zlib
 import sqlite3
 import tempfile
+import threading
 import fnmatch
 
-import yaml
+import kazoo
 
 from treadmill import context
 from treadmill import schema
 from treadmill import exc
+from treadmill import master
 from treadmill import zknamespace as z
 from treadmill import zkutils
 
 
 _LOGGER = logging.getLogger(__name__)
 
+# Number of parsed finished entries kept in memory.
+FINISHED_CACHE_SIZE = 10000
+
 
 def watch_running(zkclient, cell_state):
     """Watch running instances."""
@@ -28,13 +36,15 @@ def watch_running(zkclient, cell_state):
     @zkclient.ChildrenWatch(z.path.running())
     def _watch_running(running):
         """Watch /running nodes."""
-        cell_state.running = set(running)
-        for name, item in cell_state.placement.items():
-            state = item['state'] = (
-                'running' if name in cell_state.running else 'scheduled'
-            )
-            if item['host'] is not None:
-                item['state'] = state
+        running = set(running)
+        changed = running.symmetric_difference(cell_state.running)
+        cell_state.running = running
+        for name in changed:
+            item = cell_state.placement.get(name)
+            if item is not None and item['host'] is not None:
+                item['state'] = (
+                    'running' if name in running else 'scheduled'
+                )
         return True
 
     _LOGGER.info('Loaded running.')
@@ -43,49 +53,142 @@ def watch_running(zkclient, cell_state):
 def watch_finished(zkclient, cell_state):
     """Watch finished instances."""
 
+    loaded = set()
+
+    def _get_finished(instance):
+        """Get raw finished node data, None if node does not exist."""
+        try:
+            data, _stat = zkclient.get(z.path.finished(instance))
+            return data
+        except kazoo.client.NoNodeError:
+            return None
+
     @exc.exit_on_unhandled
     @zkclient.ChildrenWatch(z.path.finished())
     def _watch_finished(finished):
         """Watch /finished nodes."""
-        for instance in finished:
-            if instance in cell_state.finished:
-                continue
-            finished_data = zkutils.get_default(
-                zkclient,
-                z.path.finished(instance),
-                {}
-            )
-            cell_state.finished[instance] = finished_data
+        finished = set(finished)
+        new = sorted(finished - loaded)
+        cell_state.finished.update(
+            zip(new, zkutils.map_concurrent(_get_finished, new))
+        )
+        loaded.intersection_update(finished)
+        loaded.update(new)
+        return True
 
     _LOGGER.info('Loaded finished.')
 
 
+def _placement_item(cell_state, instance, host, expires):
+    """Return instance placement state."""
+    if host is None:
+        state = 'pending'
+    else:
+        state = 'scheduled'
+        if instance in cell_state.running:
+            state = 'running'
+    return {
+        'state': state,
+        'host': host,
+        'expires': expires,
+    }
+
+
+def _load_placement(cell_state, placement):
+    """Load placement snapshot, return sequence of the last delta included.
+
+    Snapshot stored by older master is YAML list of placement rows, such
+    snapshot is never followed by deltas.
+    """
+    try:
+        snapshot = master.decode_placement(placement)
+    except zlib.error:
+        snapshot = {
+            'delta': None,
+            'placement': [
+                (instance, after, expires)
+                for instance, _before, _exp_before, after, expires in
+                zkutils.loads(placement)
+            ],
+        }
+
+    cell_state.set_placement({
+        instance: _placement_item(cell_state, instance, host, expires)
+        for instance, host, expires in snapshot['placement']
+    })
+    return snapshot['delta']
+
+
+def _load_placement_deltas(zkclient, cell_state, deltas):
+    """Apply placement deltas following the loaded snapshot, in order."""
+    for delta in sorted(deltas):
+        seq = int(delta)
+        if cell_state.placement_delta is None:
+            break
+        if seq <= cell_state.placement_delta:
+            continue
+        if seq != cell_state.placement_delta + 1:
+            # Missing delta, new snapshot will be loaded.
+            _LOGGER.warning('Missing placement delta: %s', delta)
+            break
+
+        try:
+            data, _stat = zkclient.get(z.path.placement_delta(delta))
+        except kazoo.client.NoNodeError:
+            # Removed by newer snapshot.
+            break
+
+        data = master.decode_placement(data)
+        for instance in data['removed']:
+            cell_state.remove_placement(instance)
+        for instance, host, expires in data['placement']:
+            cell_state.update_placement(
+                instance,
+                _placement_item(cell_state, instance, host, expires)
+            )
+        cell_state.placement_delta = seq
+
+
 def watch_placement(zkclient, cell_state):
-    """Watch placement."""
+    """Watch placement snapshot and deltas.
+
+    /placement.deltas is created by the master, the deltas watch is set once
+    it exists (checked on every snapshot change), as a children watch on a
+    missing node stops for good.
+    """
+    deltas_watch = []
+
+    def _watch_deltas():
+        """Start watching /placement.deltas, if not yet watched."""
+        if deltas_watch or not zkclient.exists(z.PLACEMENT_DELTAS):
+            return
+
+        @exc.exit_on_unhandled
+        @zkclient.ChildrenWatch(z.PLACEMENT_DELTAS)
+        def _watch_placement_deltas(deltas):
+            """Watch /placement.deltas nodes."""
+            _load_placement_deltas(zkclient, cell_state, deltas)
+            return True
+
+        deltas_watch.append(_watch_placement_deltas)
 
     @exc.exit_on_unhandled
     @zkclient.DataWatch(z.path.placement())
     def _watch_placement(placement, _stat, event):
         """Watch /placement data."""
         if placement is None or event == 'DELETED':
-            cell_state.placement.clear()
+            cell_state.set_placement({})
+            cell_state.placement_delta = None
+            _watch_deltas()
             return True
 
-        updated_placement = {}
-        for row in yaml.load(placement):
-            instance, _before, _exp_before, after, expires = tuple(row)
-            if after is None:
-                state = 'pending'
-            else:
-                state = 'scheduled'
-                if instance in cell_state.running:
-                    state = 'running'
-            updated_placement[instance] = {
-                'state': state,
-                'host': after,
-                'expires': expires,
-            }
-        cell_state.placement = updated_placement
+        cell_state.placement_delta = _load_placement(cell_state, placement)
+        try:
+            deltas = zkclient.get_children(z.PLACEMENT_DELTAS)
+        except kazoo.client.NoNodeError:
+            deltas = []
+        _load_placement_deltas(zkclient, cell_state, deltas)
+        _watch_deltas()
         return True
 
     _LOGGER.info('Loaded placement.')
@@ -95,55 +198,184 @@ def watch_finished_history(zkclient, cell_state):
     """Watch finished historical snapshots."""
 
     loaded_snapshots = set()
-    _len_finished = len('/finished/')
-
-    def _get_instance(path):
-        """Get instance from finished node name."""
-        return path[_len_finished:]
 
     @exc.exit_on_unhandled
     @zkclient.ChildrenWatch(z.FINISHED_HISTORY)
     def _watch_finished_snapshots(snapshots):
         """Watch /finished.history nodes."""
-        for db_node in set(snapshots) - loaded_snapshots:
+        for db_node in sorted(set(snapshots) - loaded_snapshots):
             _LOGGER.debug('Loading snapshot: %s', db_node)
             data, _stat = zkclient.get(z.path.finished_history(db_node))
 
             with tempfile.NamedTemporaryFile(delete=False, mode='wb') as f:
                 f.write(zlib.decompress(data))
 
-            conn = sqlite3.connect(f.name)
-            cur = conn.cursor()
-            for row in cur.execute('select path, data from finished;'):
-                path, data = row
-                instance = _get_instance(path)
-                if data:
-                    data = yaml.load(data)
-                cell_state.finished[instance] = data
-            conn.close()
-            os.unlink(f.name)
+            try:
+                cell_state.finished.load_snapshot(f.name)
+            finally:
+                os.unlink(f.name)
+            loaded_snapshots.add(db_node)
 
         return True
 
     _LOGGER.info('Loaded finished snapshots.')
 
 
+def _glob_prefix(match):
+    """Return literal prefix of glob pattern."""
+    for idx, char in enumerate(match):
+        if char in '*?[':
+            return match[:idx]
+    return match
+
+
+class FinishedStore(object):
+    """Finished instances, indexed by name.
+
+    Raw node data is stored in temporary on-disk SQLite database, only
+    FINISHED_CACHE_SIZE recently used entries are kept parsed in memory.
+    Store is shared by Zookeeper watches and API calls, so access is
+    serialized.
+    """
+
+    __slots__ = (
+        '_conn',
+        '_cache',
+        '_cache_size',
+        '_lock',
+    )
+
+    def __init__(self, cache_size=FINISHED_CACHE_SIZE):
+        # Empty name opens private database, removed when closed.
+        self._conn = sqlite3.connect('', check_same_thread=False)
+        self._conn.execute(
+            'create table finished (name text primary key, data blob)'
+        )
+        self._cache = collections.OrderedDict()
+        self._cache_size = cache_size
+        self._lock = threading.Lock()
+
+    def __contains__(self, name):
+        with self._lock:
+            return self._conn.execute(
+                'select 1 from finished where name = ?', (name,)
+            ).fetchone() is not None
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute(
+                'select count(*) from finished'
+            ).fetchone()[0]
+
+    def update(self, entries):
+        """Add or replace (name, raw data) entries."""
+        with self._lock:
+            with self._conn:
+                for name, data in entries:
+                    self._cache.pop(name, None)
+                    self._conn.execute(
+                        'insert or replace into finished values (?, ?)',
+                        (name, data)
+                    )
+
+    def load_snapshot(self, path):
+        """Add or replace entries from finished history snapshot DB."""
+        # Snapshot rows are keyed by node path, substr() is 1-based.
+        offset = len(z.path.finished('')) + 1
+        with self._lock:
+            self._cache.clear()
+            self._conn.execute('attach database ? as snapshot', (path,))
+            try:
+                with self._conn:
+                    self._conn.execute(
+                        'insert or replace into finished'
+                        ' select substr(path, ?), data from snapshot.finished',
+                        (offset,)
+                    )
+            finally:
+                self._conn.execute('detach database snapshot')
+
+    def get(self, name):
+        """Get parsed finished data, None if not found."""
+        with self._lock:
+            if name in self._cache:
+                self._cache.move_to_end(name)
+                return self._cache[name]
+
+            row = self._conn.execute(
+                'select data from finished where name = ?', (name,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            data = zkutils.loads(row[0]) if row[0] else None
+            self._cache[name] = data
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+            return data
+
+    def names(self, prefix=''):
+        """Return sorted names starting with prefix."""
+        query = 'select name from finished'
+        args = ()
+        if prefix:
+            # Names are compared as text, so the range of names starting
+            # with prefix is [prefix, prefix with last char incremented).
+            query += ' where name >= ? and name < ?'
+            args = (prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1))
+        with self._lock:
+            return [
+                name for (name,) in
+                self._conn.execute(query + ' order by name', args)
+            ]
+
+
 class CellState(object):
     """Cell state."""
 
     __slots__ = (
         'running',
         'placement',
+        'placement_index',
+        'placement_delta',
         'finished',
         'watches',
     )
 
     def __init__(self):
-        self.running = []
+        self.running = set()
         self.placement = {}
-        self.finished = {}
+        self.placement_index = []
+        self.placement_delta = None
+        self.finished = FinishedStore()
         self.watches = set()
 
+    def set_placement(self, placement):
+        """Replace placement."""
+        self.placement = placement
+        self.placement_index = sorted(placement)
+
+    def update_placement(self, instance, item):
+        """Add or replace instance placement."""
+        if instance not in self.placement:
+            bisect.insort(self.placement_index, instance)
+        self.placement[instance] = item
+
+    def remove_placement(self, instance):
+        """Remove instance placement."""
+        if self.placement.pop(instance, None) is not None:
+            idx = bisect.bisect_left(self.placement_index, instance)
+            del self.placement_index[idx]
+
+    def placement_names(self, prefix=''):
+        """Return sorted placement names starting with prefix."""
+        index = self.placement_index
+        start = bisect.bisect_left(index, prefix)
+        return list(itertools.takewhile(
+            lambda name: name.startswith(prefix),
+            itertools.islice(index, start, None)
+        ))
+
     def get_finished(self, rsrc_id):
         """Get finished state if present."""
         data = self.finished.get(rsrc_id)
@@ -193,14 +425,22 @@ class API(object):
                 match = '*'
             if '#' not in match:
                 match += '#*'
-            filtered = [
-                {'name': name, 'state': item['state'], 'host': item['host']}
-                for name, item in cell_state.placement.items()
-                if fnmatch.fnmatch(name, match)
-            ]
+            prefix = _glob_prefix(match)
+
+            filtered = []
+            for name in cell_state.placement_names(prefix):
+                if fnmatch.fnmatch(name, match):
+                    item = cell_state.placement.get(name)
+                    if item is None:
+                        continue
+                    filtered.append(
+                        {'name': name,
+                         'state': item['state'],
+                         'host': item['host']}
+                    )
 
             if finished:
-                for name in cell_state.finished.keys():
+                for name in cell_state.finished.names(prefix):
                     if fnmatch.fnmatch(name, match):
                         state = cell_state.get_finished(name)
                         item = {'name': name}
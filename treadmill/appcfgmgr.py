@@ -24,12 +24,17 @@ Upon change, appcfgmgr will do the following:
    to run and will start all the new apps.
 """
 
+import collections
 import errno
+import functools
 import glob
 import logging
 import os
+import threading
 import time
 
+import concurrent.futures
+
 from treadmill import appenv
 from treadmill import appcfg
 from treadmill import fs
@@ -39,6 +44,7 @@ from treadmill import subproc
 
 from treadmill.appcfg import configure as app_cfg
 from treadmill.appcfg import abort as app_abort
+from treadmill.s6 import supervise
 
 if os.name == 'nt':
     from .syscall import winsymlink  # noqa: F401
@@ -49,6 +55,135 @@ _LOGGER = lc.Adapter(logging.getLogger(__name__))
 _HEARTBEAT_SEC = 30
 _WATCHDOG_TIMEOUT_SEC = _HEARTBEAT_SEC * 4
 
+#: Default number of instances configured/terminated concurrently.
+_WORKERS = 4
+#: Interval to check for completed tasks while the queue is not empty.
+_COMPLETION_POLL_SEC = 0.1
+#: Maximum number of cache events handled between completion checks.
+_MAX_EVENTS = 100
+
+
+class _InstanceQueue(object):
+    """Bounded worker pool running configure/terminate tasks.
+
+    Tasks of the same instance are run in the order they were submitted, one
+    at a time, so configure and terminate of an instance never interleave.
+    """
+
+    __slots__ = (
+        '_pool',
+        '_lock',
+        '_idle',
+        '_pending',
+        '_completed',
+        '_depth',
+        '_max_depth',
+        '_configured',
+        '_configure_time',
+        '_max_configure_time',
+    )
+
+    def __init__(self, workers=_WORKERS):
+        self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._pending = {}
+        self._completed = []
+        self._depth = 0
+        self._max_depth = 0
+        self._configured = 0
+        self._configure_time = 0.0
+        self._max_configure_time = 0.0
+
+    @property
+    def depth(self):
+        """Number of tasks queued or running."""
+        return self._depth
+
+    def submit(self, instance_name, action, func):
+        """Queue a task for an instance.
+
+        :param ``str`` action:
+            Task name ('configure' or 'terminate').
+        :param ``callable`` func:
+            Task, returning ``True`` on success.
+        """
+        task = (action, func, time.time())
+        with self._lock:
+            self._depth += 1
+            self._max_depth = max(self._max_depth, self._depth)
+            if instance_name in self._pending:
+                # Run after the tasks already queued for the instance.
+                self._pending[instance_name].append(task)
+                return
+
+            self._pending[instance_name] = collections.deque()
+
+        self._pool.submit(self._run, instance_name, task)
+
+    def _run(self, instance_name, task):
+        """Run the tasks of an instance, in order."""
+        while task is not None:
+            action, func, queued = task
+            try:
+                res = func()
+            except Exception:  # pylint: disable=W0703
+                _LOGGER.exception('Error in %s of %r', action, instance_name)
+                res = False
+
+            elapsed = time.time() - queued
+            with self._lock:
+                self._completed.append((instance_name, action, res))
+                if action == 'configure':
+                    self._configured += 1
+                    self._configure_time += elapsed
+                    self._max_configure_time = max(self._max_configure_time,
+                                                   elapsed)
+
+                self._depth -= 1
+                if self._pending[instance_name]:
+                    task = self._pending[instance_name].popleft()
+                else:
+                    del self._pending[instance_name]
+                    task = None
+
+                if not self._depth:
+                    self._idle.notify_all()
+
+    def wait(self):
+        """Wait for all the queued tasks to complete."""
+        with self._lock:
+            while self._depth:
+                self._idle.wait()
+
+    def completed(self):
+        """Return (and forget) the completed tasks.
+
+        :returns:
+            List of ``(instance_name, action, result)``.
+        """
+        with self._lock:
+            completed, self._completed = self._completed, []
+        return completed
+
+    def stats(self):
+        """Return queue depth and time-to-configure statistics.
+
+        Time to configure is measured from the time the configure task was
+        queued.
+        """
+        with self._lock:
+            return {
+                'depth': self._depth,
+                'max_depth': self._max_depth,
+                'configured': self._configured,
+                'configure_time_avg': (
+                    self._configure_time / self._configured
+                    if self._configured else 0.0
+                ),
+                'configure_time_max': self._max_configure_time,
+            }
+
 
 class AppCfgMgr(object):
     """Configure apps from the cache onto the node."""
@@ -56,12 +191,21 @@ class AppCfgMgr(object):
     __slots__ = (
         'tm_env',
         '_is_active',
+        '_queue',
+        '_cache_mtime',
     )
 
-    def __init__(self, root):
+    def __init__(self, root, workers=_WORKERS):
         _LOGGER.info('init appcfgmgr: %s', root)
         self.tm_env = appenv.AppEnvironment(root=root)
         self._is_active = False
+        self._queue = _InstanceQueue(workers)
+        self._cache_mtime = None
+
+    @property
+    def stats(self):
+        """Configuration queue statistics."""
+        return self._queue.stats()
 
     @property
     def name(self):
@@ -91,36 +235,21 @@ class AppCfgMgr(object):
         watchdog_lease.heartbeat()
 
         while True:
-            if watch.wait_for_events(timeout=_HEARTBEAT_SEC):
-                watch.process_events(max_events=5)
-            else:
+            busy = self._queue.depth > 0
+            if watch.wait_for_events(
+                    timeout=_COMPLETION_POLL_SEC if busy else _HEARTBEAT_SEC):
+                watch.process_events(max_events=_MAX_EVENTS)
+            elif not busy:
                 if self._is_active is True:
-                    cached_files = glob.glob(
-                        os.path.join(self.tm_env.cache_dir, '*')
-                    )
-                    running_links = glob.glob(
-                        os.path.join(self.tm_env.running_dir, '*')
-                    )
-                    # Calculate the container names from every event file
-                    cached_containers = {
-                        appcfg.eventfile_unique_name(filename)
-                        for filename in cached_files
-                    }
-                    # Calculate the instance names from every event running
-                    # link
-                    running_instances = {
-                        os.path.basename(linkname)
-                        for linkname in running_links
-                    }
-                    _LOGGER.debug('content of %r and %r: %r <-> %r',
-                                  self.tm_env.cache_dir,
-                                  self.tm_env.running_dir,
-                                  cached_containers,
-                                  running_instances)
+                    _LOGGER.info('Configuration stats: %r', self.stats)
+                    # Rescan, in case events were missed.
+                    if self._cache_mtime != self._get_cache_mtime():
+                        self._synchronize()
 
                 else:
                     _LOGGER.info('Still inactive during heartbeat event.')
 
+            self._refresh_completed()
             watchdog_lease.heartbeat()
 
         # Graceful shutdown.
@@ -170,14 +299,11 @@ class AppCfgMgr(object):
             _LOGGER.debug('Inactive in created event handler.')
             return
 
-        elif os.path.islink(os.path.join(self.tm_env.running_dir,
-                                         instance_name)):
-            _LOGGER.warning('Event on already configured %r',
-                            instance_name)
-            return
-
-        elif self._configure(instance_name):
-            self._refresh_supervisor(instance_names=[instance_name])
+        else:
+            self._queue.submit(
+                instance_name, 'configure',
+                functools.partial(self._configure_new, instance_name)
+            )
 
     def _on_deleted(self, event_file):
         """Handle removal event of a cached manifest: terminate an instance.
@@ -204,8 +330,10 @@ class AppCfgMgr(object):
             return
 
         else:
-            self._terminate(instance_name)
-            self._refresh_supervisor()
+            self._queue.submit(
+                instance_name, 'terminate',
+                functools.partial(self._terminate, instance_name)
+            )
 
     def _first_sync(self):
         """Bring the appcfgmgr into active mode and do a first sync.
@@ -229,7 +357,15 @@ class AppCfgMgr(object):
           - The cached entry and the running link must be for the same
             container (equal unique name). Otherwise, terminate it.
 
+        Running instances whose cached entry did not change since they were
+        configured are left as is. Instances are configured/terminated by the
+        worker pool.
         """
+        # Let the queued event handlers complete first.
+        self._queue.wait()
+        self._refresh_completed()
+
+        self._cache_mtime = self._get_cache_mtime()
         cached_files = glob.glob(os.path.join(self.tm_env.cache_dir, '*'))
         running_links = glob.glob(os.path.join(self.tm_env.running_dir, '*'))
 
@@ -274,7 +410,10 @@ class AppCfgMgr(object):
                 continue
 
             elif instance_name not in cached_instances:
-                self._terminate(instance_name)
+                self._queue.submit(
+                    instance_name, 'terminate',
+                    functools.partial(self._terminate, instance_name)
+                )
                 removed_instances.add(instance_name)
 
             else:
@@ -282,17 +421,27 @@ class AppCfgMgr(object):
                 container_dir = self._resolve_running_link(instance_link)
                 container_name = os.path.basename(container_dir)
                 if container_name not in cached_containers:
-                    self._terminate(instance_name)
+                    self._queue.submit(
+                        instance_name, 'terminate',
+                        functools.partial(self._terminate, instance_name)
+                    )
                     removed_instances.add(instance_name)
 
-        # For all new apps, read the manifest and configure the app. When all
-        # apps are configured, force rescan again.
+        # For all new (or changed) apps, read the manifest and configure the
+        # app. When all apps are configured, force rescan again.
         for instance_name in cached_instances:
-            instance_link = os.path.join(
-                self.tm_env.running_dir,
-                instance_name
+            if (instance_name not in removed_instances and
+                    self._is_configured(instance_name)):
+                continue
+
+            self._queue.submit(
+                instance_name, 'configure',
+                functools.partial(self._configure, instance_name)
             )
-            if self._configure(instance_name):
+
+        self._queue.wait()
+        for instance_name, action, res in self._queue.completed():
+            if action == 'configure' and res:
                 added_instances.add(instance_name)
 
         _LOGGER.debug('End resuld: %r / %r - %r + %r',
@@ -306,6 +455,68 @@ class AppCfgMgr(object):
         _LOGGER.info('running post cleanup: %r', running_instances)
         self._refresh_supervisor(instance_names=running_instances)
 
+    def _refresh_completed(self):
+        """Notify the supervisor of the instances configured/terminated by the
+        worker pool.
+        """
+        completed = self._queue.completed()
+        if not completed:
+            return
+
+        self._refresh_supervisor(
+            instance_names=[
+                instance_name
+                for instance_name, action, res in completed
+                if action == 'configure' and res
+            ]
+        )
+
+    def _get_cache_mtime(self):
+        """Return the modification time of the cache directory."""
+        try:
+            return os.stat(self.tm_env.cache_dir).st_mtime
+        except OSError as err:
+            if err.errno == errno.ENOENT:
+                return None
+            raise
+
+    def _is_configured(self, instance_name):
+        """Check if a running instance was configured from its current cached
+        entry (the cached entry was not modified since).
+        """
+        event_file = os.path.join(self.tm_env.cache_dir, instance_name)
+        container_dir = self._resolve_running_link(
+            os.path.join(self.tm_env.running_dir, instance_name)
+        )
+        if (not container_dir or
+                os.path.basename(container_dir) !=
+                appcfg.eventfile_unique_name(event_file)):
+            return False
+
+        try:
+            configured = os.stat(os.path.join(container_dir, 'manifest.yml'))
+            cached = os.stat(event_file)
+        except OSError as err:
+            if err.errno == errno.ENOENT:
+                return False
+            raise
+
+        return configured.st_mtime >= cached.st_mtime
+
+    def _configure_new(self, instance_name):
+        """Configures and starts a new instance (cache created event).
+
+        :returns ``bool``:
+            True for successfully configured container.
+        """
+        if os.path.islink(os.path.join(self.tm_env.running_dir,
+                                       instance_name)):
+            _LOGGER.warning('Event on already configured %r',
+                            instance_name)
+            return False
+
+        return self._configure(instance_name)
+
     def _configure(self, instance_name):
         """Configures and starts the instance based on instance cached event.
 
@@ -399,26 +610,27 @@ class AppCfgMgr(object):
                     instance_name
                 )
                 # Wait for the supervisor to pick up the new instance.
-                for _ in range(10):
-                    res = subproc.call(
-                        [
-                            's6_svok',
-                            instance_run_link,
-                        ]
-                    )
-                    if res == 0:
+                for _ in range(50):
+                    if supervise.is_supervised(instance_run_link):
+                        break
+                    elif not os.path.lexists(instance_run_link):
+                        # Terminated by the worker pool in the meantime.
                         break
                     else:
                         _LOGGER.warning('Supervisor has not picked it up yet')
-                        time.sleep(0.5)
+                        time.sleep(0.1)
                 # Bring the instance up.
-                subproc.check_call(
-                    [
-                        's6_svc',
-                        '-uO',
-                        instance_run_link,
-                    ]
-                )
+                try:
+                    supervise.control(instance_run_link, 'uO')
+                except OSError as err:
+                    # The instance can be terminated concurrently, its
+                    # running link removed (ENOENT) or its supervisor gone
+                    # (ENXIO).
+                    if err.errno in (errno.ENOENT, errno.ENXIO):
+                        _LOGGER.warning('Instance gone, not starting: %s',
+                                        err)
+                    else:
+                        raise
 
     @staticmethod
     def _resolve_running_link(running_link):
@@ -0,0 +1,386 @@
+"""Scheduler benchmark CLI plugin.
+
+Generates synthetic cell, allocations and apps, then replays churn and
+measures each Cell.schedule() run.
+"""
+
+import json
+import logging
+import math
+import random
+import time
+
+import click
+
+from treadmill import cli
+from treadmill import scheduler
+
+
+_LOGGER = logging.getLogger(__name__)
+
+_BUCKET_LEVELS = ['building', 'rack']
+
+_SERVER_LIFETIME = 7 * 24 * 60 * 60
+
+
+class ScheduleBenchPrettyFormatter(object):
+    """Pretty table scheduler benchmark formatter."""
+
+    @staticmethod
+    def format(item):
+        """Return pretty-formatted item."""
+        schedules_tbl = cli.make_list_to_table([
+            ('round', None, None),
+            ('time', None, '{:.3f}'.format),
+            ('apps', None, None),
+            ('placed', None, None),
+            ('new', None, None),
+            ('moved', None, None),
+            ('evicted', None, None),
+            ('servers-down', 'servers_down', None),
+            ('apps-added', 'apps_added', None),
+            ('apps-removed', 'apps_removed', None),
+            ('allocs-changed', 'allocs_changed', None),
+        ])
+
+        summary_tbl = cli.make_dict_to_table([
+            ('servers', None, None),
+            ('apps', None, None),
+            ('setup', None, '{:.3f}'.format),
+            ('min', None, '{:.3f}'.format),
+            ('mean', None, '{:.3f}'.format),
+            ('p95', None, '{:.3f}'.format),
+            ('max', None, '{:.3f}'.format),
+        ])
+
+        return '\n\n'.join([
+            str(schedules_tbl(item['schedules'])),
+            str(summary_tbl(item['summary'])),
+        ])
+
+
+def _make_cell(rand, params):
+    """Create synthetic cell topology.
+
+    Servers are grouped in racks, racks in buildings. Each server has
+    random set of traits and belongs to one of the partitions.
+    """
+    cell = scheduler.Cell('bench',
+                          capacity_store=params['capacity_store'],
+                          incremental=params['incremental'])
+
+    valid_until = time.time() + _SERVER_LIFETIME
+    servers_per_rack = params['servers_per_rack']
+    racks_per_building = params['racks_per_building']
+
+    building = None
+    rack = None
+    for idx in range(0, params['servers']):
+        rack_idx = idx // servers_per_rack
+        if idx % servers_per_rack == 0:
+            if rack_idx % racks_per_building == 0:
+                building = scheduler.Bucket(
+                    'building:%s' % (rack_idx // racks_per_building),
+                    traits=0, level=_BUCKET_LEVELS[0]
+                )
+                cell.add_node(building)
+
+            rack = scheduler.Bucket('rack:%s' % rack_idx,
+                                    traits=0, level=_BUCKET_LEVELS[1])
+            building.add_node(rack)
+
+        traits = 0
+        for trait in range(0, params['traits']):
+            if rand.random() < 0.5:
+                traits |= 1 << trait
+
+        label = _partition_label(idx % params['partitions'])
+        server = scheduler.Server('server%05d' % idx, params['capacity'],
+                                  valid_until=valid_until,
+                                  traits=traits, label=label)
+        rack.add_node(server)
+
+    for idx in range(0, params['identity_groups']):
+        cell.configure_identity_group('proid.group%s' % idx,
+                                      params['identity_count'])
+
+    return cell
+
+
+def _partition_label(idx):
+    """Return label of the partition, first partition is the default one."""
+    if idx == 0:
+        return None
+    return 'partition%s' % idx
+
+
+def _reservation(rand, params):
+    """Return random reservation of the leaf allocation."""
+    total = [
+        capacity * params['servers'] * params['reserved'] /
+        params['allocations']
+        for capacity in params['capacity']
+    ]
+    return [int(value * rand.uniform(0.5, 1.5)) for value in total]
+
+
+def _make_allocations(rand, cell, params):
+    """Create allocation tree: partition/tenant/allocation."""
+    allocations = []
+    for idx in range(0, params['allocations']):
+        label = _partition_label(idx % params['partitions'])
+        partition_alloc = cell.partitions[label].allocation
+        partition_alloc.label = label
+
+        tenant_alloc = partition_alloc.get_sub_alloc(
+            'tenant%s' % (idx % params['tenants'])
+        )
+        tenant_alloc.label = label
+
+        traits = 0
+        if params['traits'] and rand.random() < 0.2:
+            traits = 1 << rand.randrange(0, params['traits'])
+
+        alloc = scheduler.Allocation(_reservation(rand, params),
+                                     rank=scheduler.DEFAULT_RANK,
+                                     traits=traits)
+        tenant_alloc.add_sub_alloc('alloc%s' % idx, alloc)
+        alloc.label = label
+        allocations.append(alloc)
+
+    return allocations
+
+
+def _make_app(rand, idx, params):
+    """Create synthetic app."""
+    proid_app = 'proid.app%s' % (idx % params['affinities'])
+
+    demand = [
+        rand.uniform(1, capacity * params['max_demand'])
+        for capacity in params['capacity']
+    ]
+
+    affinity_limits = None
+    if rand.random() < 0.1:
+        affinity_limits = {'server': 1}
+
+    identity_group = None
+    if params['identity_groups'] and rand.random() < 0.1:
+        identity_group = 'proid.group%s' % rand.randrange(
+            0, params['identity_groups']
+        )
+
+    return scheduler.Application(
+        '%s#%010d' % (proid_app, idx),
+        rand.randint(0, 100),
+        demand,
+        affinity=proid_app,
+        affinity_limits=affinity_limits,
+        identity_group=identity_group,
+    )
+
+
+class _Bench(object):
+    """Synthetic cell state and churn replay."""
+
+    def __init__(self, params):
+        self.params = params
+        self.rand = random.Random(params['seed'])
+
+        self.cell = _make_cell(self.rand, params)
+        self.allocations = _make_allocations(self.rand, self.cell, params)
+
+        self.app_idx = 0
+        self.down = []
+        self.add_apps(params['apps'])
+
+    def add_apps(self, count):
+        """Add new apps to random allocations."""
+        for _ in range(0, count):
+            app = _make_app(self.rand, self.app_idx, self.params)
+            self.app_idx += 1
+            self.cell.add_app(self.rand.choice(self.allocations), app)
+
+    def churn(self):
+        """Bring servers down/up, add/remove apps, change reservations, then
+        add new pending apps."""
+        rate = self.params['churn']
+        servers = sorted(self.cell.members())
+        apps = sorted(self.cell.apps)
+
+        # Servers brought down in the previous round come back up.
+        for servername in self.down:
+            self.cell.members()[servername].state = scheduler.State.up
+
+        self.down = self.rand.sample(
+            servers, _churn_count(rate, len(servers))
+        )
+        for servername in self.down:
+            self.cell.members()[servername].state = scheduler.State.down
+
+        removed = self.rand.sample(apps, _churn_count(rate, len(apps)))
+        for appname in removed:
+            self.cell.remove_app(appname)
+        self.add_apps(len(removed))
+
+        changed = self.rand.sample(
+            self.allocations,
+            _churn_count(rate, len(self.allocations))
+        )
+        for alloc in changed:
+            alloc.set_reserved(_reservation(self.rand, self.params))
+
+        self.add_apps(self.params['new_apps'])
+
+        return {
+            'servers_down': len(self.down),
+            'apps_added': len(removed) + self.params['new_apps'],
+            'apps_removed': len(removed),
+            'allocs_changed': len(changed),
+        }
+
+    def schedule(self):
+        """Run the scheduler, return time, placement and eviction stats."""
+        begin = time.time()
+        placement = self.cell.schedule()
+        duration = time.time() - begin
+
+        new = moved = evicted = 0
+        for _app, before, _exp_before, after, _exp_after in placement:
+            if before == after:
+                continue
+            if not before:
+                new += 1
+            elif after:
+                moved += 1
+            else:
+                evicted += 1
+
+        return {
+            'time': duration,
+            'apps': len(self.cell.apps),
+            'placed': len([app for app in self.cell.apps.values()
+                           if app.server]),
+            'new': new,
+            'moved': moved,
+            'evicted': evicted,
+        }
+
+
+def _churn_count(rate, total):
+    """Number of items to change in the churn round."""
+    return min(total, int(math.ceil(rate * total)))
+
+
+def _percentile(values, percent):
+    """Return percentile of the values, nearest rank."""
+    ordered = sorted(values)
+    rank = int(math.ceil(percent / 100. * len(ordered)))
+    return ordered[max(rank - 1, 0)]
+
+
+def run_bench(params):
+    """Run the benchmark, return the results."""
+    scheduler.DIMENSION_COUNT = len(params['capacity'])
+
+    begin = time.time()
+    bench = _Bench(params)
+    setup = time.time() - begin
+
+    no_churn = {
+        'servers_down': 0,
+        'apps_added': 0,
+        'apps_removed': 0,
+        'allocs_changed': 0,
+    }
+
+    schedules = []
+    for round_idx in range(0, params['rounds'] + 1):
+        churn = bench.churn() if round_idx else dict(no_churn)
+        stats = bench.schedule()
+        stats.update(churn)
+        stats['round'] = round_idx
+        _LOGGER.info('Round %s: %r', round_idx, stats)
+        schedules.append(stats)
+
+    times = [stats['time'] for stats in schedules]
+    return {
+        'params': params,
+        'schedules': schedules,
+        'summary': {
+            'servers': len(bench.cell.members()),
+            'apps': len(bench.cell.apps),
+            'setup': setup,
+            'min': min(times),
+            'mean': sum(times) / len(times),
+            'p95': _percentile(times, 95),
+            'max': max(times),
+        },
+    }
+
+
+def init():
+    """Return top level command handler."""
+
+    formatter = cli.make_formatter(ScheduleBenchPrettyFormatter)
+
+    @click.command(name='scheduler-bench')
+    @click.option('--servers', type=int, default=1000,
+                  help='Number of servers.')
+    @click.option('--servers-per-rack', type=int, default=40,
+                  help='Number of servers in a rack.')
+    @click.option('--racks-per-building', type=int, default=25,
+                  help='Number of racks in a building.')
+    @click.option('--capacity', type=cli.LIST, default='100,100,100',
+                  help='Server capacity vector, comma separated.')
+    @click.option('--traits', type=int, default=4,
+                  help='Number of server traits.')
+    @click.option('--partitions', type=int, default=1,
+                  help='Number of partitions.')
+    @click.option('--tenants', type=int, default=10,
+                  help='Number of tenants.')
+    @click.option('--allocations', type=int, default=50,
+                  help='Number of leaf allocations.')
+    @click.option('--reserved', type=float, default=0.8,
+                  help='Fraction of cell capacity reserved by allocations.')
+    @click.option('--apps', type=int, default=4000,
+                  help='Number of apps.')
+    @click.option('--affinities', type=int, default=200,
+                  help='Number of distinct app affinities.')
+    @click.option('--max-demand', type=float, default=0.25,
+                  help='Max app demand as fraction of server capacity.')
+    @click.option('--identity-groups', type=int, default=10,
+                  help='Number of identity groups.')
+    @click.option('--identity-count', type=int, default=10,
+                  help='Number of identities in identity group.')
+    @click.option('--rounds', type=int, default=10,
+                  help='Number of churn rounds after initial schedule.')
+    @click.option('--churn', type=float, default=0.01,
+                  help='Fraction of servers/apps/allocations changed in '
+                  'each round.')
+    @click.option('--new-apps', type=int, default=0,
+                  help='Number of new pending apps added in each round.')
+    @click.option('--seed', type=int, default=0,
+                  help='Random seed.')
+    @click.option('--capacity-store', is_flag=True, default=False,
+                  help='Use contiguous capacity store.')
+    @click.option('--incremental', is_flag=True, default=False,
+                  help='Use incremental scheduling.')
+    @click.option('--output', type=click.Path(dir_okay=False, writable=True),
+                  help='Save results as JSON.')
+    def scheduler_bench(output, **params):
+        """Benchmark scheduler on synthetic cell."""
+        try:
+            params['capacity'] = [int(value) for value in params['capacity']]
+        except ValueError:
+            cli.bad_exit('Invalid capacity: %s', ','.join(params['capacity']))
+
+        results = run_bench(params)
+
+        if output:
+            with open(output, 'w') as f:
+                json.dump(results, f, indent=4, sort_keys=True)
+
+        cli.out(formatter(results))
+
+    return scheduler_bench
@@ -5,6 +5,7 @@ import collections
 import logging
 import os
 import sys
+import time
 
 import enum
 
@@ -33,15 +34,25 @@ class DirWatcher(object):
         'on_created',
         'on_deleted',
         'on_modified',
-        '_watches'
+        'debounce',
+        '_watches',
+        '_coalesced',
     )
 
-    def __init__(self, watch_dir=None):
+    def __init__(self, watch_dir=None, debounce=0):
+        """
+        :param ``float`` debounce:
+            Events received for the same path within ``debounce`` seconds
+            are coalesced, and emitted ``debounce`` seconds after the first
+            one was received (0 emits every event as soon as received).
+        """
         self.event_list = collections.deque()
         self.on_created = self._noop
         self.on_deleted = self._noop
         self.on_modified = self._noop
+        self.debounce = debounce
         self._watches = {}
+        self._coalesced = collections.OrderedDict()
 
         if watch_dir is not None:
             self.add_dir(watch_dir)
@@ -117,10 +128,66 @@ class DirWatcher(object):
         if self.event_list:
             return True
 
+        # Wake up when the oldest coalesced event is due.
+        due = self._coalesced_due()
+        if due is not None and (timeout == -1 or due < timeout):
+            timeout = due
+
         if timeout != -1:
             timeout *= 1000  # timeout is in milliseconds
 
-        return self._wait_for_events(timeout)
+        if self._wait_for_events(timeout):
+            return True
+
+        due = self._coalesced_due()
+        return due is not None and due <= 0
+
+    def _coalesced_due(self):
+        """Seconds until the oldest coalesced event is due (None if none)."""
+        if not self._coalesced:
+            return None
+
+        first_seen = next(iter(self._coalesced.values()))
+        return max(0, first_seen + self.debounce - time.time())
+
+    def _coalesce(self, events):
+        """Merge events with the events already pending for the same path.
+
+        :param events: List of ``(DirWatcherEvent, <path>)``
+        """
+        now = time.time()
+        for event, src_path in events:
+            if event == DirWatcherEvent.DELETED:
+                self._coalesced.pop((src_path, DirWatcherEvent.MODIFIED), None)
+                if self._coalesced.pop((src_path, DirWatcherEvent.CREATED),
+                                       None) is not None:
+                    # Created and deleted within the window, drop both.
+                    continue
+
+            elif event == DirWatcherEvent.MODIFIED:
+                if (src_path, DirWatcherEvent.CREATED) in self._coalesced:
+                    continue
+
+            self._coalesced.setdefault((src_path, event), now)
+
+    def _pop_coalesced(self):
+        """Pop the coalesced events that are due, in order.
+
+        :returns: List of ``(DirWatcherEvent, <path>)``
+        """
+        due = time.time() - self.debounce
+        results = []
+        while self._coalesced:
+            (src_path, event), first_seen = next(
+                iter(self._coalesced.items())
+            )
+            if first_seen > due:
+                break
+
+            del self._coalesced[(src_path, event)]
+            results.append((event, src_path))
+
+        return results
 
     @abc.abstractmethod
     def _read_events(self):
@@ -149,7 +216,11 @@ class DirWatcher(object):
 
         # If we are out of cached events, get more from inotify
         if not self.event_list and not resume:
-            self.event_list.extend(self._read_events())
+            if self.debounce:
+                self._coalesce(self._read_events())
+                self.event_list.extend(self._pop_coalesced())
+            else:
+                self.event_list.extend(self._read_events())
 
         results = []
         step = 0
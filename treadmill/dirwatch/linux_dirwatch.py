@@ -2,7 +2,9 @@
 
 import errno
 import logging
+import os
 import select
+import stat
 
 from . import dirwatch_base
 
@@ -10,20 +12,63 @@ from treadmill.syscall import inotify
 
 _LOGGER = logging.getLogger(__name__)
 
+# Maximum number of events read in one ``_read_events`` call (the default
+# inotify max_queued_events), so a busy writer cannot starve the caller.
+_MAX_READ_EVENTS = 16384
+
 
 class LinuxDirWatcher(dirwatch_base.DirWatcher):
-    """Linux directory watcher implementation."""
+    """Linux directory watcher implementation.
+
+    In ``close_write`` mode, files are only reported once written: a new file
+    is ``CREATED`` when closed after writing (or moved in) and ``MODIFIED``
+    when rewritten, instead of on every write and attribute change.
+
+    In ``recursive`` mode, the subdirectories of watched directories are
+    watched as well, and are added/removed as they are created/deleted.
+    """
 
     __slots__ = (
         'inotify',
-        'poll'
+        'poll',
+        'close_write',
+        'recursive',
+        '_creating',
     )
 
-    def __init__(self, watch_dir=None):
+    def __init__(self, watch_dir=None, close_write=False, recursive=False,
+                 debounce=0):
         self.inotify = inotify.Inotify(inotify.IN_CLOEXEC)
         self.poll = select.poll()
         self.poll.register(self.inotify, select.POLLIN)
-        super(LinuxDirWatcher, self).__init__(watch_dir)
+        self.close_write = close_write
+        self.recursive = recursive
+        self._creating = set()
+        super(LinuxDirWatcher, self).__init__(watch_dir, debounce=debounce)
+
+    def add_dir(self, directory):
+        """Add `directory` (and its subdirectories if recursive) to the list
+        of watched directories.
+        """
+        super(LinuxDirWatcher, self).add_dir(directory)
+        if not self.recursive:
+            return
+
+        for watch_dir, dirs, _files in os.walk(os.path.realpath(directory)):
+            for name in dirs:
+                super(LinuxDirWatcher, self).add_dir(
+                    os.path.join(watch_dir, name)
+                )
+
+    def remove_dir(self, directory):
+        """Remove `directory` (and its subdirectories if recursive) from the
+        list of watched directories.
+        """
+        if not self.recursive:
+            super(LinuxDirWatcher, self).remove_dir(directory)
+            return
+
+        self._remove_subtree(os.path.realpath(directory))
 
     def _add_dir(self, watch_dir):
         """Add `directory` to the list of watched directories.
@@ -31,9 +76,16 @@ class LinuxDirWatcher(dirwatch_base.DirWatcher):
         :param watch_dir: watch directory real path
         :returns: watch id
         """
-        return self.inotify.add_watch(
-            watch_dir,
-            event_mask=(
+        if self.close_write:
+            event_mask = (
+                inotify.IN_CLOSE_WRITE |
+                inotify.IN_CREATE |
+                inotify.IN_DELETE |
+                inotify.IN_DELETE_SELF |
+                inotify.IN_MOVE
+            )
+        else:
+            event_mask = (
                 inotify.IN_ATTRIB |
                 inotify.IN_CREATE |
                 inotify.IN_DELETE |
@@ -41,7 +93,8 @@ class LinuxDirWatcher(dirwatch_base.DirWatcher):
                 inotify.IN_MODIFY |
                 inotify.IN_MOVE
             )
-        )
+
+        return self.inotify.add_watch(watch_dir, event_mask=event_mask)
 
     def _remove_dir(self, watch_id):
         """Remove `directory` from the list of watched directories.
@@ -50,6 +103,50 @@ class LinuxDirWatcher(dirwatch_base.DirWatcher):
         """
         self.inotify.remove_watch(watch_id)
 
+    def _add_subtree(self, directory):
+        """Watch a new subdirectory and its content.
+
+        :returns:
+            List of ``(DirWatcherEvent, <path>)`` for the entries created
+            before the watches were added.
+        """
+        results = []
+        for watch_dir, dirs, files in os.walk(directory):
+            try:
+                super(LinuxDirWatcher, self).add_dir(watch_dir)
+            except OSError as err:
+                if err.errno != errno.ENOENT:
+                    raise
+                # Removed already.
+                del dirs[:]
+                continue
+
+            results.extend(
+                (
+                    dirwatch_base.DirWatcherEvent.CREATED,
+                    os.path.join(watch_dir, name)
+                )
+                for name in dirs + files
+            )
+
+        return results
+
+    def _remove_subtree(self, directory):
+        """Stop watching a directory and its subdirectories."""
+        prefix = os.path.join(directory, '')
+        for wid, watch_dir in list(self._watches.items()):
+            if watch_dir != directory and not watch_dir.startswith(prefix):
+                continue
+
+            _LOGGER.info('Unwatching directory %r (id: %r)', watch_dir, wid)
+            del self._watches[wid]
+            try:
+                self._remove_dir(wid)
+            except OSError as err:
+                # Watch was already removed by the kernel.
+                if err.errno != errno.EINVAL:
+                    raise
+
     def _wait_for_events(self, timeout):
         """Wait for directory change event for up to ``timeout`` seconds.
 
@@ -69,42 +166,120 @@ class LinuxDirWatcher(dirwatch_base.DirWatcher):
     def _read_events(self):
         """Reads the events from the system and formats as ``DirWatcherEvent``.
 
+        All the events queued by the kernel are read, up to
+        ``_MAX_READ_EVENTS``.
+
         :returns: List of ``(DirWatcherEvent, <path>)``
         """
-        results = []
-        events = self.inotify.read_events()
+        events = []
+        while len(events) < _MAX_READ_EVENTS and self.poll.poll(0):
+            events.extend(self.inotify.read_events())
 
+        results = []
         for event in events:
-            if (event.is_modify or
-                    event.is_attrib):
-                results.append(
-                    (
-                        dirwatch_base.DirWatcherEvent.MODIFIED,
-                        event.src_path
-                    )
-                )
+            if event.mask & inotify.IN_Q_OVERFLOW:
+                _LOGGER.warning('Inotify event queue overflow, '
+                                'events were lost')
+                continue
 
-            elif (event.is_delete or
-                  event.is_moved_from or
-                  event.is_delete_self):
-                results.append(
-                    (
-                        dirwatch_base.DirWatcherEvent.DELETED,
-                        event.src_path
-                    )
-                )
+            if event.mask == inotify.IN_IGNORED:
+                if self._watches.pop(event.wd, None):
+                    _LOGGER.info('Watch on %r auto-removed', event.src_path)
+                continue
 
-            elif (event.is_create or
-                  event.is_moved_to):
-                results.append(
-                    (
-                        dirwatch_base.DirWatcherEvent.CREATED,
-                        event.src_path
+            if self.recursive and event.is_directory:
+                if event.is_create or event.is_moved_to:
+                    # Report the directory before its content.
+                    results.append(
+                        (
+                            dirwatch_base.DirWatcherEvent.CREATED,
+                            event.src_path
+                        )
                     )
-                )
+                    results.extend(self._add_subtree(event.src_path))
+                    continue
 
-            elif event.mask == inotify.IN_IGNORED:
-                if self._watches.pop(event.wd, None):
-                    _LOGGER.info('Watch on %r auto-removed', event.src_path)
+                elif event.is_moved_from:
+                    self._remove_subtree(event.src_path)
+
+            if (self.recursive and event.is_delete_self and
+                    os.path.dirname(event.src_path) in
+                    self._watches.values()):
+                # Already reported by the parent directory watch.
+                continue
+
+            if self.close_write:
+                result = self._close_write_event(event)
+            else:
+                result = self._event(event)
+
+            if result is not None:
+                results.append((result, event.src_path))
 
         return results
+
+    @staticmethod
+    def _event(event):
+        """Map an inotify event to a ``DirWatcherEvent``."""
+        if (event.is_modify or
+                event.is_attrib):
+            return dirwatch_base.DirWatcherEvent.MODIFIED
+
+        elif (event.is_delete or
+              event.is_moved_from or
+              event.is_delete_self):
+            return dirwatch_base.DirWatcherEvent.DELETED
+
+        elif (event.is_create or
+              event.is_moved_to):
+            return dirwatch_base.DirWatcherEvent.CREATED
+
+        return None
+
+    def _close_write_event(self, event):
+        """Map an inotify event to a ``DirWatcherEvent`` (close_write mode)."""
+        if event.is_create:
+            if not event.is_directory and _is_written(event.src_path):
+                # Reported once closed.
+                self._creating.add(event.src_path)
+                return None
+
+            # Directories, links, etc. are complete once created.
+            return dirwatch_base.DirWatcherEvent.CREATED
+
+        elif event.is_close_write:
+            if event.src_path in self._creating:
+                self._creating.discard(event.src_path)
+                return dirwatch_base.DirWatcherEvent.CREATED
+
+            return dirwatch_base.DirWatcherEvent.MODIFIED
+
+        elif event.is_moved_to:
+            self._creating.discard(event.src_path)
+            return dirwatch_base.DirWatcherEvent.CREATED
+
+        elif (event.is_delete or
+              event.is_moved_from or
+              event.is_delete_self):
+            if event.src_path in self._creating:
+                # Never reported.
+                self._creating.discard(event.src_path)
+                return None
+
+            return dirwatch_base.DirWatcherEvent.DELETED
+
+        return None
+
+
+def _is_written(path):
+    """Check if a newly created file is a regular file being written (as
+    opposed to a hard link, symlink, FIFO, etc.)."""
+    try:
+        st = os.lstat(path)
+    except OSError as err:
+        # Already gone, the events that follow tell what happened to it.
+        if err.errno == errno.ENOENT:
+            return True
+        raise
+
+    return stat.S_ISREG(st.st_mode) and st.st_nlink == 1
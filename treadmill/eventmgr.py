@@ -46,6 +46,7 @@ class EventMgr(object):
     __slots__ = (
         'tm_env',
         '_hostname',
+        '_versions',
     )
 
     def __init__(self, root):
@@ -53,6 +54,9 @@ class EventMgr(object):
         self.tm_env = appenv.AppEnvironment(root=root)
 
         self._hostname = sysinfo.hostname()
+        # Versions (mzxid) of the app and placement nodes of manifests
+        # cached by this process.
+        self._versions = {}
 
     @property
     def name(self):
@@ -97,7 +101,7 @@ class EventMgr(object):
                 _LOGGER.info('Presence is up.')
                 seen.set()
                 apps = zkclient.get_children(z.path.placement(self._hostname))
-                self._synchronize(zkclient, apps)
+                self._synchronize(zkclient, apps, check_existing=True)
             return True
 
         @zkclient.ChildrenWatch(z.path.placement(self._hostname))
@@ -119,14 +123,22 @@ class EventMgr(object):
         _LOGGER.info('service shutdown.')
         watchdog_lease.remove()
 
-    def _synchronize(self, zkclient, expected):
+    def _synchronize(self, zkclient, expected, check_existing=False):
         """synchronize local app cache with the expected list.
 
+        Manifests are fetched and written concurrently.
+
         :param expected:
             List of instances expected to be running on the server.
         :type expected:
             ``list``
+        :param check_existing:
+            Refresh manifests cached by this process as well, if app or
+            placement node changed.
+        :type check_existing:
+            ``bool``
         """
+        begin = time.time()
         expected_set = set(expected)
         current_set = {
             os.path.basename(manifest)
@@ -144,37 +156,70 @@ class EventMgr(object):
         for app in extra:
             manifest = os.path.join(self.tm_env.cache_dir, app)
             os.unlink(manifest)
+            self._versions.pop(app, None)
 
         # If app is missing, fetch its manifest in the cache
-        for app in missing:
-            self._cache(zkclient, app)
+        refresh = missing
+        if check_existing:
+            refresh = missing | {
+                app for app in expected_set & current_set
+                if app in self._versions
+            }
+
+        results = zkutils.map_concurrent(
+            lambda app: self._cache(zkclient, app),
+            refresh
+        )
+
+        _LOGGER.info(
+            'Synchronized in %.3f sec, removed: %d, written: %d, '
+            'unchanged: %d, not found: %d',
+            time.time() - begin,
+            len(extra),
+            results.count(True),
+            results.count(False),
+            results.count(None)
+        )
 
     def _cache(self, zkclient, app):
         """Reads the manifest from Zk and stores it as YAML in <cache>/<app>.
+
+        Returns True if the manifest is written, False if the cached manifest
+        is up to date and None if the app is not found.
         """
         appnode = z.path.scheduled(app)
         placement_node = z.path.placement(self._hostname, app)
-        manifest_file = None
+        manifest_file = os.path.join(self.tm_env.cache_dir, app)
         try:
-            manifest = zkutils.get(zkclient, appnode)
-            # TODO: need a function to parse instance id from name.
-            manifest['task'] = app[app.index('#') + 1:]
-
-            placement_info = zkutils.get(zkclient, placement_node)
-            if placement_info is not None:
-                manifest.update(placement_info)
-
-            manifest_file = os.path.join(self.tm_env.cache_dir, app)
-            with tempfile.NamedTemporaryFile(dir=self.tm_env.cache_dir,
-                                             prefix='.%s-' % app,
-                                             delete=False,
-                                             mode='w') as temp_manifest:
-                yaml.dump(manifest, stream=temp_manifest)
-            os.rename(temp_manifest.name, manifest_file)
-            _LOGGER.info('Created cache manifest: %s', manifest_file)
-
+            manifest, manifest_stat = zkutils.get(zkclient, appnode,
+                                                  need_metadata=True)
+            placement_info, placement_stat = zkutils.get(zkclient,
+                                                         placement_node,
+                                                         need_metadata=True)
         except kazoo.exceptions.NoNodeError:
             _LOGGER.warning('App %r not found', app)
+            return None
+
+        versions = (_mzxid(manifest_stat), _mzxid(placement_stat))
+        if (self._versions.get(app) == versions and
+                os.path.exists(manifest_file)):
+            _LOGGER.debug('Cache manifest up to date: %s', manifest_file)
+            return False
+
+        # TODO: need a function to parse instance id from name.
+        manifest['task'] = app[app.index('#') + 1:]
+        if placement_info is not None:
+            manifest.update(placement_info)
+
+        with tempfile.NamedTemporaryFile(dir=self.tm_env.cache_dir,
+                                         prefix='.%s-' % app,
+                                         delete=False,
+                                         mode='w') as temp_manifest:
+            yaml.dump(manifest, stream=temp_manifest)
+        os.rename(temp_manifest.name, manifest_file)
+        self._versions[app] = versions
+        _LOGGER.info('Created cache manifest: %s', manifest_file)
+        return True
 
     def _cache_notify(self, is_seen):
         """Sent a cache status notification event.
@@ -194,3 +239,10 @@ class EventMgr(object):
         else:
             # Mark the cache folder as outdated.
             fs.rm_safe(os.path.join(self.tm_env.cache_dir, _SEEN_FILE))
+
+
+def _mzxid(stat):
+    """Return last modified transaction id of the node, None if unknown."""
+    if stat is None:
+        return None
+    return stat.mzxid
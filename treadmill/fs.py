@@ -7,6 +7,7 @@ import io
 import logging
 import os
 import stat
+import struct
 import tarfile
 import tempfile
 
@@ -406,6 +407,73 @@ def read_filesystem_info(block_dev):
     return res
 
 
+# ext2/3/4 superblock, see struct ext4_super_block in fs/ext4/ext4.h
+_EXT_SUPERBLOCK_OFFSET = 1024
+_EXT_SUPERBLOCK_SIZE = 1024
+_EXT_SUPER_MAGIC = 0xEF53
+_EXT4_FEATURE_INCOMPAT_64BIT = 0x80
+# s_blocks_count_lo, s_r_blocks_count_lo, s_free_blocks_count_lo
+_EXT_SB_COUNTS_LO = struct.Struct('<4xIII')
+# s_log_block_size
+_EXT_SB_LOG_BLOCK_SIZE = struct.Struct('<24xI')
+# s_magic
+_EXT_SB_MAGIC = struct.Struct('<56xH')
+# s_feature_incompat
+_EXT_SB_FEATURE_INCOMPAT = struct.Struct('<96xI')
+# s_blocks_count_hi, s_r_blocks_count_hi, s_free_blocks_count_hi
+_EXT_SB_COUNTS_HI = struct.Struct('<336xIII')
+
+
+def read_filesystem_superblock(block_dev):
+    """
+    Returns the block counts of the ext2/3/4 filesystem present on block_dev.
+
+    The superblock is read directly from the device, the result has the same
+    keys and values as the ones of the same name in `read_filesystem_info`.
+
+    :param block_dev:
+        Block device for the filesystem info to query.
+    :type block_dev:
+        ``str``
+    :returns:
+        Block count, reserved block count, free blocks and block size.
+    :rtype:
+        ``dict``
+    :raises:
+        ValueError if the device does not contain an ext2/3/4 filesystem.
+    """
+    fd = os.open(block_dev, os.O_RDONLY)
+    try:
+        data = os.pread(fd, _EXT_SUPERBLOCK_SIZE, _EXT_SUPERBLOCK_OFFSET)
+    finally:
+        os.close(fd)
+
+    if len(data) < _EXT_SUPERBLOCK_SIZE:
+        raise ValueError('%s: short superblock read' % block_dev)
+
+    magic, = _EXT_SB_MAGIC.unpack_from(data)
+    if magic != _EXT_SUPER_MAGIC:
+        raise ValueError('%s: not an ext filesystem (magic %#x)' %
+                         (block_dev, magic))
+
+    blocks, reserved, free = _EXT_SB_COUNTS_LO.unpack_from(data)
+    incompat, = _EXT_SB_FEATURE_INCOMPAT.unpack_from(data)
+    if incompat & _EXT4_FEATURE_INCOMPAT_64BIT:
+        blocks_hi, reserved_hi, free_hi = _EXT_SB_COUNTS_HI.unpack_from(data)
+        blocks |= blocks_hi << 32
+        reserved |= reserved_hi << 32
+        free |= free_hi << 32
+
+    log_block_size, = _EXT_SB_LOG_BLOCK_SIZE.unpack_from(data)
+
+    return {
+        'block count': str(blocks),
+        'reserved block count': str(reserved),
+        'free blocks': str(free),
+        'block size': str(1024 << log_block_size),
+    }
+
+
 @osnoop.windows
 def maj_min_to_blk(major, minor):
     """
@@ -90,6 +90,9 @@ _IPTABLES_FILTER_TABLE = JINJA2_ENV.get_template(
     'iptables-filter-table-restore'
 )
 
+#: Iptables NAT chains, used to atomically replace Treadmill NAT rules.
+_IPTABLES_NAT_CHAINS = JINJA2_ENV.get_template('iptables-nat-chains-restore')
+
 #: Iptables tables, generated with `iptables-save`, used to set the initial
 #: state of the Treadmill container rules.
 #:
@@ -749,6 +752,52 @@ def flush_conntrack_table(vip):
             raise
 
 
+def _rule_format(rule):
+    """Format a DNAT/SNAT/PassThrough rule as a iptables rule.
+
+    :param rule:
+        Rule to format
+    :type rule:
+        ``DNATRule``||``SNATRule``||``PassThroughRule``
+    :returns:
+        ``str`` -- Iptables rule.
+    """
+    if isinstance(rule, firewall.DNATRule):
+        return _dnat_rule_format(rule)
+
+    elif isinstance(rule, firewall.SNATRule):
+        return _snat_rule_format(rule)
+
+    elif isinstance(rule, firewall.PassThroughRule):
+        return _PASSTHROUGH_RULE_PATTERN.format(
+            src_ip=rule.src_ip,
+            dst_ip=rule.dst_ip,
+        )
+
+    else:
+        raise ValueError("Unknown rule type %r" % (type(rule)))
+
+
+def configure_nat_chains(chain_rules):
+    """Replace the rules of NAT chains in a single atomic batch.
+
+    All the chains are created if missing, flushed and loaded with their
+    target rules with one `iptables-restore --noflush` invocation. Chains not
+    listed are left untouched.
+
+    :param ``dict`` chain_rules:
+        Map of chain name to the desired ``set`` of DNAT/SNAT/PassThrough
+        rules in that chain.
+    """
+    nat_state = _IPTABLES_NAT_CHAINS.render(
+        chains=[
+            (chain, sorted(_rule_format(rule) for rule in rules))
+            for chain, rules in sorted(chain_rules.items())
+        ]
+    )
+    _iptables_restore(nat_state, noflush=True)
+
+
 def add_rule(rule, chain=None):
     """Adds a rule to a given chain.
 
@@ -964,6 +1013,28 @@ def ipset_restore(ipset_state):
     _ipset('restore', cmd_input=ipset_state)
 
 
+def ipset_update(changes):
+    """Apply IPSet set changes in a single batch.
+
+    :param changes:
+        Sequence of ``(action, set, ip)`` tuples, where action is ``'add'``
+        or ``'del'``. Changes are applied in order.
+    :type changes:
+        ``[tuple(str, str, str)]``
+    """
+    if not changes:
+        return
+
+    ipset_restore(
+        ''.join(
+            '{action} {target_set} {ip}\n'.format(
+                action=action, target_set=target_set, ip=ip
+            )
+            for action, target_set, ip in changes
+        )
+    )
+
+
 def _ipset(*args, **kwargs):
     """Invoke the IPSet command"""
     # Default to using exceptions.
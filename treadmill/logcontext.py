@@ -3,8 +3,16 @@
 import logging
 import threading
 
-LOCAL_ = threading.local()
-LOCAL_.ctx = []
+
+class _Local(threading.local):
+    """Thread local log context, every thread has its own context stack."""
+
+    def __init__(self):
+        super(_Local, self).__init__()
+        self.ctx = []
+
+
+LOCAL_ = _Local()
 
 
 class Adapter(logging.LoggerAdapter):
@@ -25,10 +33,21 @@ class Adapter(logging.LoggerAdapter):
         """
         super(Adapter, self).__init__(logger, extra)
 
-        if self.extra:
-            self.extra = [self.extra]
-        else:
-            self.extra = LOCAL_.ctx
+        if extra:
+            self.extra = [extra]
+
+    @property
+    def extra(self):
+        """The 'extra' list, or the log context of the current thread."""
+        if self._extra:
+            return self._extra
+
+        return LOCAL_.ctx
+
+    @extra.setter
+    def extra(self, value):
+        """Set the 'extra' list."""
+        self._extra = value
 
     def warn(self, msg, *args, **kwargs):
         """
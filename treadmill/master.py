@@ -6,12 +6,15 @@
 # pylint: disable=C0302
 
 import collections
+import contextlib
+import json
 import logging
 import fnmatch
 import os
 import time
 import threading
 import re
+import zlib
 
 import kazoo
 
@@ -29,6 +32,13 @@ from treadmill.apptrace import events as traceevents
 _LOGGER = logging.getLogger(__name__)
 
 
+def _merge_names(names_lists):
+    """Merge lists of names, preserving order of first occurrence."""
+    return list(collections.OrderedDict.fromkeys(
+        name for names in names_lists if names for name in names
+    ))
+
+
 def _app_node(app_id, existing=True):
     """Returns node path given app id."""
     path = os.path.join(z.SCHEDULED, app_id)
@@ -80,38 +90,137 @@ _SERVERS_ACL_DEL = zkutils.make_role_acl('servers', 'd')
 # Time interval between running the scheduler (seconds).
 SCHEDULER_INTERVAL = 2
 
-# Interval to sleep before checking if there is new event in the queue.
-CHECK_EVENT_INTERVAL = 0.5
-
 # Check integrity of the scheduler every 5 minutes.
 INTEGRITY_INTERVAL = 5 * 60
 
 # Check for reboots every hour.
 REBOOT_CHECK_INTERVAL = 60 * 60
 
-# Max number of events to process before checking if scheduler is due.
-EVENT_BATCH_COUNT = 20
+# Max number of placement deltas stored before full placement snapshot.
+PLACEMENT_SNAPSHOT_INTERVAL = 100
 
 # Delay between re-establishing collection watch (seconds).
 # COLLECTION_EVENT_DELAY = 0.5
 
 
+class AssignmentMatcher(object):
+    """Compiled app assignment patterns.
+
+    Patterns are matched in reverse sorted order, first match wins, same as
+    trying fnmatch on each pattern in turn. Patterns with literal proid are
+    grouped by proid and combined in single regex per proid, patterns with
+    wildcard proid are combined in another regex. App name is matched only
+    against patterns of its proid and wildcard proid patterns.
+    """
+
+    __slots__ = (
+        'patterns',
+        'assignments',
+        'by_proid',
+        'generic',
+    )
+
+    def __init__(self, assignments):
+        ordered = sorted(assignments.items(), reverse=True)
+        self.patterns = [pattern for pattern, _assignment in ordered]
+        self.assignments = [assignment for _pattern, assignment in ordered]
+
+        by_proid = collections.defaultdict(list)
+        generic = []
+        for idx, pattern in enumerate(self.patterns):
+            proid = _pattern_proid(pattern)
+            if proid is None:
+                generic.append(idx)
+            else:
+                by_proid[proid].append(idx)
+
+        self.generic = self._compile(generic)
+        self.by_proid = {
+            proid: self._compile(indices)
+            for proid, indices in by_proid.items()
+        }
+
+    def _compile(self, indices):
+        """Combine patterns in single regex, group name is pattern index."""
+        if not indices:
+            return None
+
+        return re.compile('|'.join(
+            '(?P<p%d>%s)' % (idx, fnmatch.translate(self.patterns[idx]))
+            for idx in indices
+        ))
+
+    def match(self, name):
+        """Return (pattern, assignment) matching app name, None if none."""
+        proid = name.split('.', 1)[0]
+        matches = [
+            idx for idx in [
+                _match_index(self.by_proid.get(proid), name),
+                _match_index(self.generic, name),
+            ]
+            if idx is not None
+        ]
+        if not matches:
+            return None
+
+        idx = min(matches)
+        return self.patterns[idx], self.assignments[idx]
+
+
+def _match_index(regex, name):
+    """Return index of the first pattern in combined regex matching name."""
+    if regex is None:
+        return None
+
+    match = regex.match(name)
+    if not match:
+        return None
+
+    # The outer group of the matching pattern is the last one closed.
+    return int(match.lastgroup[1:])
+
+
+def _pattern_proid(pattern):
+    """Return literal proid of the pattern, None if proid has wildcards."""
+    if '.' not in pattern:
+        return None
+
+    proid = pattern.split('.', 1)[0]
+    if any(char in proid for char in '*?['):
+        return None
+
+    return proid
+
+
 class Master(object):
     """Treadmill master scheduler."""
 
-    def __init__(self, zkclient, cellname, events_dir=None):
+    def __init__(self, zkclient, cellname, events_dir=None,
+                 incremental=False):
         self.zkclient = zkclient
-        self.cell = scheduler.Cell(cellname)
+        self.cell = scheduler.Cell(cellname, incremental=incremental)
         self.events_dir = events_dir
 
         self.buckets = dict()
         self.servers = dict()
         self.allocations = dict()
         self.assignments = dict()
+        self.assignment_matcher = AssignmentMatcher(self.assignments)
         self.partitions = dict()
 
         self.queue = collections.deque()
+        # Signals that new event is queued.
+        self.queue_cond = threading.Condition()
         self.up_to_date = False
+        # Time to commit placement changes of the last reschedule.
+        self.reschedule_latency = None
+        # Last stored placement, sequence of the last delta and number of
+        # deltas since the last snapshot.
+        self.stored_placement = None
+        self.placement_seq = 0
+        self.placement_deltas = 0
+        # Duration of each cell state load phase (seconds).
+        self.load_timings = collections.OrderedDict()
         self.exit = False
         # Signals that processing of a given event.
         self.process_complete = dict()
@@ -127,6 +236,7 @@ class Master(object):
             z.CELL: None,
             z.IDENTITY_GROUPS: None,
             z.PLACEMENT: None,
+            z.PLACEMENT_DELTAS: None,
             z.PARTITIONS: None,
             z.SCHEDULED: [_SERVERS_ACL_DEL],
             z.SCHEDULER: None,
@@ -214,49 +324,42 @@ class Master(object):
         return bucket
 
     def load_servers(self, readonly=False):
-        """Load server topology."""
+        """Load server topology.
+
+        Server data, presence and state nodes are read in bulk, updated
+        server states are stored concurrently.
+        """
         servers = self.zkclient.get_children(z.SERVERS)
-        for servername in servers:
-            self.load_server(servername, readonly)
+        servers_data = zkutils.get_many(
+            self.zkclient, [z.path.server(name) for name in servers]
+        )
+        presence = zkutils.map_concurrent(
+            self.zkclient.exists,
+            [z.path.server_presence(name) for name in servers]
+        )
+        states = zkutils.get_many(
+            self.zkclient, [z.path.placement(name) for name in servers]
+        )
+
+        loaded = []
+        for servername, data, is_up, state_since in zip(servers, servers_data,
+                                                        presence, states):
+            if self._add_server(servername, data):
+                self._set_server_state(servername, is_up, state_since)
+                loaded.append(servername)
+
+        if not readonly:
+            zkutils.map_concurrent(self._store_new_server_state, loaded)
 
     def load_server(self, servername, readonly=False):
         """Load individual server."""
         try:
             data = zkutils.get(self.zkclient, z.path.server(servername))
-            if not data:
-                # The server is configured, but never reported it's capacity.
-                _LOGGER.info('No capacity detected: %s',
-                             z.path.server(servername))
-                return
-
-            assert 'parent' in data
-            parentname = data['parent']
-            label = data.get('partition')
-            if not label:
-                # TODO: it will be better to have separate module for constants
-                #       and avoid unnecessary cross imports.
-                label = admin.DEFAULT_PARTITION
-            up_since = data.get('up_since', int(time.time()))
-
-            partition = self.cell.partitions[label]
-            server = scheduler.Server(
-                servername,
-                resources(data),
-                valid_until=partition.valid_until(up_since),
-                label=label,
-                traits=data.get('traits', 0)
-            )
-
-            parent = self.buckets.get(parentname)
-            if not parent:
-                _LOGGER.warn('Server parent does not exist: %s/%s',
-                             servername, parentname)
-                return
-
-            self.buckets[parentname].add_node(server)
-            self.servers[servername] = server
-            assert server.parent == self.buckets[parentname]
+        except kazoo.client.NoNodeError:
+            _LOGGER.warn('Server node not found: %s', servername)
+            return
 
+        if self._add_server(servername, data):
             if not readonly:
                 zkutils.ensure_exists(self.zkclient,
                                       z.path.placement(servername),
@@ -264,8 +367,42 @@ class Master(object):
 
             self.adjust_server_state(servername, readonly)
 
-        except kazoo.client.NoNodeError:
-            _LOGGER.warn('Server node not found: %s', servername)
+    def _add_server(self, servername, data):
+        """Add server to the cell, return True if server was added."""
+        if not data:
+            # The server is configured, but never reported it's capacity.
+            _LOGGER.info('No capacity detected: %s',
+                         z.path.server(servername))
+            return False
+
+        assert 'parent' in data
+        parentname = data['parent']
+        label = data.get('partition')
+        if not label:
+            # TODO: it will be better to have separate module for constants
+            #       and avoid unnecessary cross imports.
+            label = admin.DEFAULT_PARTITION
+        up_since = data.get('up_since', int(time.time()))
+
+        partition = self.cell.partitions[label]
+        server = scheduler.Server(
+            servername,
+            resources(data),
+            valid_until=partition.valid_until(up_since),
+            label=label,
+            traits=data.get('traits', 0)
+        )
+
+        parent = self.buckets.get(parentname)
+        if not parent:
+            _LOGGER.warn('Server parent does not exist: %s/%s',
+                         servername, parentname)
+            return False
+
+        self.buckets[parentname].add_node(server)
+        self.servers[servername] = server
+        assert server.parent == self.buckets[parentname]
+        return True
 
     def remove_server(self, servername):
         """Remove server from scheduler."""
@@ -329,6 +466,7 @@ class Master(object):
                 # Nothing changed, no need to update anything.
                 _LOGGER.info('server is same, keeping old.')
                 current_server.valid_until = server.valid_until
+                self.cell.mark_dirty()
             else:
                 # Something changed - clear everything and re-register server
                 # as new.
@@ -348,16 +486,23 @@ class Master(object):
 
         is_up = self.zkclient.exists(z.path.server_presence(servername))
 
-        placement_node = z.path.placement(servername)
-
-        # Restore state as it was stored in server placement node.
-        #
         # zkutils.get_default return tuple if need_metadata is True, default it
         # is False, so it will return dict. pylint complains about it,
         # and it should be fixed in zkutils.
         #
         # pylint: disable=R0204
-        state_since = zkutils.get_default(self.zkclient, placement_node)
+        state_since = zkutils.get_default(self.zkclient,
+                                          z.path.placement(servername))
+        self._set_server_state(servername, is_up, state_since)
+
+        if not readonly:
+            self._store_server_state(servername)
+
+    def _set_server_state(self, servername, is_up, state_since):
+        """Restore state as it was stored in server placement node, then
+        adjust it according to server presence.
+        """
+        server = self.servers[servername]
         if not state_since:
             state_since = {'state': 'down', 'since': time.time()}
 
@@ -372,11 +517,18 @@ class Master(object):
             if server.state is not scheduler.State.frozen:
                 server.state = scheduler.State.up
 
-        # Record server state:
-        state, since = server.get_state()
-        if not readonly:
-            zkutils.put(self.zkclient, placement_node,
-                        {'state': state.value, 'since': since})
+    def _store_server_state(self, servername):
+        """Record server state in server placement node."""
+        state, since = self.servers[servername].get_state()
+        zkutils.put(self.zkclient, z.path.placement(servername),
+                    {'state': state.value, 'since': since})
+
+    def _store_new_server_state(self, servername):
+        """Create server placement node and record server state."""
+        zkutils.ensure_exists(self.zkclient,
+                              z.path.placement(servername),
+                              acl=[_SERVERS_ACL])
+        self._store_server_state(servername)
 
     def load_allocations(self):
         """Load allocations and assignments map."""
@@ -406,15 +558,16 @@ class Master(object):
                 _LOGGER.info('Assignment: %s - %s', pattern, priority)
                 self.assignments[pattern] = (priority, alloc)
 
+        self.assignment_matcher = AssignmentMatcher(self.assignments)
+
     def find_assignment(self, name):
         """Find allocation by matching app assignment."""
         _LOGGER.debug('Find assignment: %s', name)
-        assignments = reversed(sorted(self.assignments.items()))
-
-        for pattern, assignment in assignments:
-            if fnmatch.fnmatch(name, pattern):
-                _LOGGER.info('Found: %s, assignment: %s', pattern, assignment)
-                return assignment
+        found = self.assignment_matcher.match(name)
+        if found:
+            pattern, assignment = found
+            _LOGGER.info('Found: %s, assignment: %s', pattern, assignment)
+            return assignment
 
         _LOGGER.info('Default assignment.')
         return self.find_default_assignment(name)
@@ -436,16 +589,24 @@ class Master(object):
     def load_apps(self):
         """Load application data."""
         apps = self.zkclient.get_children(z.SCHEDULED)
-        for appname in apps:
-            self.load_app(appname)
+        manifests = zkutils.get_many(
+            self.zkclient, [z.path.scheduled(appname) for appname in apps]
+        )
+        for appname, manifest in zip(apps, manifests):
+            self._update_app(appname, manifest)
 
-        self.restore_placements()
+        with self._load_phase('placements'):
+            self.restore_placements()
 
     def load_app(self, appname):
         """Load single application data."""
-        # TODO: need to check if app is blacklisted.
         manifest = zkutils.get_default(self.zkclient,
                                        z.path.scheduled(appname))
+        self._update_app(appname, manifest)
+
+    def _update_app(self, appname, manifest):
+        """Add or update application given the app manifest."""
+        # TODO: need to check if app is blacklisted.
         if not manifest:
             self.cell.remove_app(appname)
             return
@@ -504,13 +665,14 @@ class Master(object):
         """Restore placements after reload."""
         integrity = collections.defaultdict(list)
 
-        for servername in self.servers:
-            try:
-                placement_node = z.path.placement(servername)
-                placed_apps = self.zkclient.get_children(placement_node)
-            except kazoo.exceptions.NoNodeError:
-                placed_apps = []
+        servers = list(self.servers)
+        placement = zkutils.get_children_many(
+            self.zkclient,
+            [z.path.placement(servername) for servername in servers],
+            default=[]
+        )
 
+        for servername, placed_apps in zip(servers, placement):
             for appname in placed_apps:
                 appnode = z.path.placement(servername, appname)
                 if appname not in self.cell.apps:
@@ -560,14 +722,16 @@ class Master(object):
 
     def load_placement_data(self):
         """Restore app identities."""
-        for appname, app in self.cell.apps.items():
-            if app.server:
-                placement_data = zkutils.get_default(
-                    self.zkclient, z.path.placement(app.server, appname))
+        placed = [app for app in self.cell.apps.values() if app.server]
+        placement = zkutils.get_many(
+            self.zkclient,
+            [z.path.placement(app.server, app.name) for app in placed]
+        )
 
-                if placement_data is not None:
-                    app.force_set_identity(placement_data.get('identity'))
-                    app.placement_expiry = placement_data.get('expires', 0)
+        for app, placement_data in zip(placed, placement):
+            if placement_data is not None:
+                app.force_set_identity(placement_data.get('identity'))
+                app.placement_expiry = placement_data.get('expires', 0)
 
     def adjust_presence(self, servers):
         """Given current presence set, adjust status."""
@@ -713,9 +877,23 @@ class Master(object):
                           for event in events
                           if re.match(r'\d+\-\w+\-\d+$', event)])
 
+        #
+        # Events of the same resource are coalesced, each resource is
+        # reloaded once, in order of its first event.
+        resources = collections.OrderedDict()
         for prio, seq, resource in ordered:
             _LOGGER.info('event: %s %s %s', prio, seq, resource)
             node_name = '-'.join([prio, resource, seq])
+            names = resources.setdefault(resource, [])
+            if resource in ('apps', 'servers'):
+                # The event node contains list of apps/servers to be
+                # re-evaluated, empty list of servers means all servers.
+                names.append(zkutils.get_default(
+                    self.zkclient,
+                    z.path.event(node_name),
+                    default=[]))
+
+        for resource, names in resources.items():
             if resource == 'allocations':
                 # TODO: changing allocations has potential of complete
                 #                reshuffle, so while ineffecient, reload
@@ -723,21 +901,14 @@ class Master(object):
                 self.load_allocations()
                 self.load_apps()
             elif resource == 'apps':
-                # The event node contains list of apps to be re-evaluated.
-                apps = zkutils.get_default(
-                    self.zkclient,
-                    z.path.event(node_name),
-                    default=[])
-                for app in apps:
+                for app in _merge_names(names):
                     self.load_app(app)
             elif resource == 'cell':
                 self.load_cell()
             elif resource == 'servers':
-                servers = zkutils.get_default(
-                    self.zkclient,
-                    z.path.event(node_name),
-                    default=[])
-                if not servers:
+                if all(names):
+                    servers = _merge_names(names)
+                else:
                     # If not specified, reload all. Use union of servers in
                     # the model and in zookeeper.
                     servers = (set(self.servers.keys()) ^
@@ -768,7 +939,9 @@ class Master(object):
             if path in self.process_complete:
                 self.process_complete[path].clear()
 
-            self.queue.append((path, children))
+            with self.queue_cond:
+                self.queue.append((path, children))
+                self.queue_cond.notify()
 
             if path in self.process_complete:
                 _LOGGER.debug('watcher waiting for completion: %s', path)
@@ -779,21 +952,38 @@ class Master(object):
             _LOGGER.debug('watcher finished: %s', path)
             return True
 
+    @contextlib.contextmanager
+    def _load_phase(self, phase):
+        """Record duration of the cell state load phase."""
+        begin = time.time()
+        yield
+        self.load_timings[phase] = time.time() - begin
+        _LOGGER.info('Loaded %s in %.3f sec.',
+                     phase, self.load_timings[phase])
+
     @exc.exit_on_unhandled
     def run_real(self):
         """Loads cell state from Zookeeper."""
-        self.create_rootns()
-        self.load_buckets()
-        self.load_cell()
-        self.load_servers()
-        self.load_allocations()
-        self.load_strategies()
-        self.load_apps()
-        self.load_identity_groups()
-        self.load_placement_data()
-
-        # Must be called last
-        self.load_schedule()
+        begin = time.time()
+        phases = [
+            ('rootns', self.create_rootns),
+            ('buckets', self.load_buckets),
+            ('cell', self.load_cell),
+            ('servers', self.load_servers),
+            ('allocations', self.load_allocations),
+            ('strategies', self.load_strategies),
+            ('apps', self.load_apps),
+            ('identity_groups', self.load_identity_groups),
+            ('placement_data', self.load_placement_data),
+            # Must be called last
+            ('schedule', self.load_schedule),
+        ]
+        for phase, load in phases:
+            with self._load_phase(phase):
+                load()
+
+        _LOGGER.info('Cell state loaded in %.3f sec: %r',
+                     time.time() - begin, self.load_timings)
 
         self.watch(z.SERVER_PRESENCE)
         self.watch(z.SCHEDULED)
@@ -803,33 +993,54 @@ class Master(object):
         last_integrity_check = 0
         last_reboot_check = 0
         while not self.exit:
-            queue_empty = False
-            for _idx in range(0, EVENT_BATCH_COUNT):
-                try:
-                    event = self.queue.popleft()
-                    self.process(event)
-                except IndexError:
-                    queue_empty = True
-                    break
-            try:
-                if time_past(last_sched_time + SCHEDULER_INTERVAL):
-                    last_sched_time = time.time()
-                    if not self.up_to_date:
-                        self.reschedule()
-                        self.check_placement_integrity()
-
-                if time_past(last_integrity_check + INTEGRITY_INTERVAL):
-                    assert self.check_integrity()
-                    last_integrity_check = time.time()
-            except AssertionError:
-                raise
+            self.process_queue()
+
+            # Reschedule as soon as there are changes, but not more often
+            # than SCHEDULER_INTERVAL.
+            if (not self.up_to_date and
+                    time_past(last_sched_time + SCHEDULER_INTERVAL)):
+                last_sched_time = time.time()
+                self.reschedule()
+                self.check_placement_integrity()
+
+            if time_past(last_integrity_check + INTEGRITY_INTERVAL):
+                assert self.check_integrity()
+                last_integrity_check = time.time()
 
             if time_past(last_reboot_check + REBOOT_CHECK_INTERVAL):
                 self.check_reboot()
                 last_reboot_check = time.time()
 
-            if queue_empty:
-                time.sleep(CHECK_EVENT_INTERVAL)
+            deadlines = [
+                last_integrity_check + INTEGRITY_INTERVAL,
+                last_reboot_check + REBOOT_CHECK_INTERVAL,
+            ]
+            if not self.up_to_date:
+                deadlines.append(last_sched_time + SCHEDULER_INTERVAL)
+            self.wait_for_events(min(deadlines) - time.time())
+
+    def process_queue(self):
+        """Process all queued events.
+
+        Each watch event carries complete list of children, so only the
+        latest event of each path is processed.
+        """
+        with self.queue_cond:
+            events = list(self.queue)
+            self.queue.clear()
+
+        latest = collections.OrderedDict()
+        for path, children in events:
+            latest[path] = children
+
+        for event in latest.items():
+            self.process(event)
+
+    def wait_for_events(self, timeout):
+        """Wait until event is queued or timeout (seconds) expires."""
+        with self.queue_cond:
+            if not self.queue and timeout > 0:
+                self.queue_cond.wait(timeout)
 
     @exc.exit_on_unhandled
     def run(self):
@@ -911,7 +1122,7 @@ class Master(object):
                 self._update_task(app, servername, why=None)
 
         # Store latest placement as reference.
-        zkutils.put(self.zkclient, z.path.placement(), placement)
+        self._store_placement(placement, snapshot=True)
         self.up_to_date = True
 
     def reschedule(self):
@@ -925,20 +1136,19 @@ class Master(object):
             if before != after or exp_before != exp_after
         ]
 
-        # We run two loops. First - remove all old placement, before creating
-        # any new ones. This ensures that in the event of loop interruption
-        # for anyreason (like Zookeeper connection lost or master restart)
-        # there are no duplicate placements.
+        # All old placements are removed before creating any new ones. Ops
+        # are committed in order, in chunked transactions. This ensures that
+        # in the event of interruption for anyreason (like Zookeeper
+        # connection lost or master restart) there are no duplicate
+        # placements.
+        ops = []
         for app, before, exp_before, after, exp_after in changed_placement:
             if before and before != after:
                 _LOGGER.info('Unscheduling: %s - %s', before, app)
-                zkutils.ensure_deleted(
-                    self.zkclient,
-                    z.path.placement(before, app))
+                ops.append(('delete', z.path.placement(before, app)))
 
+        tasks = []
         for app, before, exp_before, after, exp_after in changed_placement:
-            placement_data = self._placement_data(app)
-
             why = ''
             if before is not None:
                 if (before not in self.servers or
@@ -957,21 +1167,108 @@ class Master(object):
                              self.cell.apps[app].identity,
                              exp_after)
 
-                zkutils.put(
-                    self.zkclient,
+                ops.append((
+                    'set' if before == after else 'create',
                     z.path.placement(after, app),
-                    placement_data,
-                    acl=[_SERVERS_ACL])
-                self._update_task(app, after, why=why)
-            else:
-                self._update_task(app, None, why=why)
+                    self._placement_data(app),
+                    [_SERVERS_ACL]
+                ))
+
+            tasks.append((app, after, why))
+
+        begin = time.time()
+        transactions = zkutils.apply_transactions(self.zkclient, ops)
+        self.reschedule_latency = time.time() - begin
+        _LOGGER.info('Committed %d placement changes in %d transactions: %.3f',
+                     len(ops), transactions, self.reschedule_latency)
+
+        for app, server, why in tasks:
+            self._update_task(app, server, why=why)
 
         self._unschedule_evicted()
 
         # Store latest placement as reference.
-        zkutils.put(self.zkclient, z.path.placement(), placement)
+        self._store_placement(placement)
         self.up_to_date = True
 
+    def _store_placement(self, placement, snapshot=False):
+        """Store placement delta since the last stored placement.
+
+        Full snapshot is stored if requested, on first run or every
+        PLACEMENT_SNAPSHOT_INTERVAL deltas. The snapshot records the
+        sequence of the last delta it includes, older deltas are removed.
+        """
+        current = {
+            app: (after, exp_after)
+            for app, _before, _exp_before, after, exp_after in placement
+        }
+
+        if (snapshot or self.stored_placement is None or
+                self.placement_deltas >= PLACEMENT_SNAPSHOT_INTERVAL):
+            self._store_placement_snapshot(current)
+        else:
+            changed = [
+                [app, server, expires]
+                for app, (server, expires) in current.items()
+                if self.stored_placement.get(app) != (server, expires)
+            ]
+            removed = [
+                app for app in self.stored_placement if app not in current
+            ]
+            if changed or removed:
+                self.placement_seq += 1
+                self.placement_deltas += 1
+                zkutils.put(
+                    self.zkclient,
+                    z.path.placement_delta(
+                        '{:010d}'.format(self.placement_seq)
+                    ),
+                    encode_placement({
+                        'placement': changed,
+                        'removed': removed,
+                    })
+                )
+
+        self.stored_placement = current
+
+    def _store_placement_snapshot(self, current):
+        """Store full placement snapshot, remove deltas it includes."""
+        if self.stored_placement is None:
+            # Deltas stored by the previous master are removed before the
+            # sequence starts over, otherwise readers could apply them on
+            # top of the new snapshot and skip the new deltas.
+            self._delete_placement_deltas()
+            self.placement_seq = 0
+
+        zkutils.put(
+            self.zkclient,
+            z.path.placement(),
+            encode_placement({
+                'delta': self.placement_seq,
+                'placement': [
+                    [app, server, expires]
+                    for app, (server, expires) in sorted(current.items())
+                ],
+            })
+        )
+
+        self._delete_placement_deltas()
+        self.placement_deltas = 0
+
+    def _delete_placement_deltas(self):
+        """Delete all stored placement deltas."""
+        try:
+            deltas = self.zkclient.get_children(z.PLACEMENT_DELTAS)
+        except kazoo.client.NoNodeError:
+            deltas = []
+
+        if deltas:
+            zkutils.apply_transactions(
+                self.zkclient,
+                [('delete', z.path.placement_delta(delta))
+                 for delta in sorted(deltas)]
+            )
+
     def _unschedule_evicted(self):
         """Delete schedule once and evicted apps."""
         # Apps that were evicted and are configured to be scheduled once
@@ -1023,6 +1320,19 @@ class Master(object):
 
 # master/scheduler "API"
 
+def encode_placement(data):
+    """Encode placement snapshot or delta as compressed JSON."""
+    return zlib.compress(json.dumps(data, separators=(',', ':')).encode())
+
+
+def decode_placement(payload):
+    """Decode placement snapshot or delta.
+
+    Raises zlib.error if payload is not compressed placement.
+    """
+    return json.loads(zlib.decompress(payload).decode())
+
+
 def create_event(zkclient, priority, event, payload):
     """Places event on the event queue."""
     assert 0 <= priority <= 100
@@ -1036,41 +1346,45 @@ def create_event(zkclient, priority, event, payload):
 
 def create_apps(zkclient, app_id, app, count):
     """Schedules new apps."""
-    instance_ids = []
     acl = zkutils.make_role_acl('servers', 'rwcd')
-    for _idx in range(0, count):
-        node_path = zkutils.put(zkclient,
-                                _app_node(app_id, existing=False),
-                                app,
-                                sequence=True,
-                                acl=[acl])
-        instance_id = os.path.basename(node_path)
-
-        # Create task for the app, and put it in pending state.
-        # TODO: probably need to create PendingEvent and use to_data method.
-        task_node = z.path.trace(
-            instance_id,
-            '{time},{hostname},pending,{data}'.format(
-                time=time.time(),
-                hostname=sysinfo.hostname(),
-                data='created'
-            )
-        )
-        try:
-            zkclient.create(task_node, b'',
-                            acl=[_SERVERS_ACL], makepath=True)
-        except kazoo.client.NodeExistsError:
-            pass
-
-        instance_ids.append(instance_id)
+    node_paths = zkutils.create_sequential(zkclient,
+                                           _app_node(app_id, existing=False),
+                                           app,
+                                           count,
+                                           acl=[acl])
+    instance_ids = [os.path.basename(path) for path in node_paths]
+
+    # Create task for the app, and put it in pending state.
+    # TODO: probably need to create PendingEvent and use to_data method.
+    now = time.time()
+    hostname = sysinfo.hostname()
+    zkutils.apply_transactions(
+        zkclient,
+        [
+            ('create',
+             z.path.trace(
+                 instance_id,
+                 '{time},{hostname},pending,{data}'.format(
+                     time=now,
+                     hostname=hostname,
+                     data='created'
+                 )
+             ),
+             None,
+             [_SERVERS_ACL])
+            for instance_id in instance_ids
+        ]
+    )
 
     return instance_ids
 
 
 def delete_apps(zkclient, app_ids):
     """Unschedules apps."""
-    for app_id in app_ids:
-        zkutils.ensure_deleted(zkclient, _app_node(app_id))
+    zkutils.apply_transactions(
+        zkclient,
+        [('delete', _app_node(app_id)) for app_id in app_ids]
+    )
 
 
 def get_app(zkclient, app_id):
@@ -177,11 +177,21 @@ def read_cpu_stats(cgrp):
 
 
 def get_fs_usage(block_dev):
-    """Get the block statistics and compute the used disk space."""
+    """Get the block statistics and compute the used disk space.
+
+    The block counts are read from the filesystem superblock, the container
+    filesystem is not mounted in our namespace so statvfs can't be used.
+    """
     if block_dev is None:
         return {}
 
-    fs_info = fs.read_filesystem_info(block_dev)
+    try:
+        fs_info = fs.read_filesystem_superblock(block_dev)
+    except ValueError as err:
+        # Not an ext filesystem, ask dumpe2fs.
+        _LOGGER.debug('Unable to read superblock: %s', err)
+        fs_info = fs.read_filesystem_info(block_dev)
+
     return {'fs.used_bytes': calc_fs_usage(fs_info)}
 
 
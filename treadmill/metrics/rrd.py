@@ -109,19 +109,28 @@ def app_metrics(cgrp, rrd_last, sys_major_minor, block_dev):
         'blk_write_bps': blk_bps['Write']
     })
 
-    result['fs_used_bytes'] = raw_metrics.get('fs.used_byes', 0)
+    result['fs_used_bytes'] = raw_metrics.get('fs.used_bytes', 0)
+    result['timestamp'] = timestamp
 
     return result
 
 
+def sample(cgrp, rrd_last, sys_maj_min, block_dev):
+    """Get rrd metrics of a cgroup, None if the cgroup has no metrics.
+
+    :param ``dict`` rrd_last:
+        Last values (`cpu_total` and `timestamp`) stored in the rrd file.
+    """
+    try:
+        return app_metrics(cgrp, rrd_last, sys_maj_min, block_dev)
+    except KeyError:
+        _LOGGER.warning('no rrd metrics for cgroup %s', cgrp)
+        return None
+
+
 def update(rrdclient, rrdfile, cgrp, sys_maj_min, block_dev):
     """ get and update metrics in rrd files """
     rrd_last = rrdutils.lastupdate(rrdfile)
-    try:
-        rrd_metrics = app_metrics(cgrp, rrd_last, sys_maj_min, block_dev)
-        rrdclient.update(
-            rrdfile,
-            rrd_metrics
-        )
-    except KeyError:
-        _LOGGER.warn('no rrd metrics for cgroup %s', cgrp)
+    rrd_metrics = sample(cgrp, rrd_last, sys_maj_min, block_dev)
+    if rrd_metrics is not None:
+        rrdclient.update(rrdfile, rrd_metrics)
@@ -1,5 +1,10 @@
-"""Network device management."""
+"""Network device management.
 
+Devices, addresses and routes are configured over rtnetlink when available,
+falling back to the `ip` and `brctl` commands otherwise.
+"""
+
+import contextlib
 import errno
 import os
 import logging
@@ -8,6 +13,11 @@ import enum
 
 from treadmill import subproc
 
+if os.name == 'posix':
+    from treadmill.syscall import rtnetlink
+else:
+    rtnetlink = None
+
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -19,6 +29,67 @@ _PROC_CONF_PROXY_ARP = '/proc/sys/net/ipv4/conf/{dev}/proxy_arp'
 _PROC_CONF_FORWARDING = '/proc/sys/net/ipv4/conf/{dev}/forwarding'
 _PROC_CONF_ARP_IGNORE = '/proc/sys/net/ipv4/conf/{dev}/arp_ignore'
 _PROC_CONF_ROUTE_LOCALNET = '/proc/sys/net/ipv4/conf/{dev}/route_localnet'
+_PROC_NS_NET = '/proc/self/ns/net'
+
+#: Use rtnetlink instead of forking `ip`/`brctl` when possible.
+USE_NETLINK = True
+
+# Persistent rtnetlink socket, per network namespace.
+_RTNL = {
+    'netns': None,
+    'socket': None,
+}
+
+
+def _rtnetlink():
+    """Return the rtnetlink socket of the current network namespace.
+
+    :returns:
+        ``RtNetlink`` - rtnetlink socket or ``None`` if rtnetlink is not
+        available (subprocess fallback is used).
+    """
+    if not USE_NETLINK or rtnetlink is None:
+        return None
+
+    # A netlink socket is bound to the network namespace it was created in,
+    # make sure we still are in the same one (see treadmill.newnet).
+    try:
+        netns = os.stat(_PROC_NS_NET).st_ino
+    except OSError:
+        netns = None
+
+    if _RTNL['socket'] is not None and _RTNL['netns'] != netns:
+        _RTNL['socket'].close()
+        _RTNL['socket'] = None
+
+    if _RTNL['socket'] is None:
+        try:
+            _RTNL['socket'] = rtnetlink.RtNetlink()
+            _RTNL['netns'] = netns
+        except (AttributeError, OSError) as err:
+            _LOGGER.warning('rtnetlink not available, using %s: %s',
+                            _IP_EXE, err)
+            return None
+
+    return _RTNL['socket']
+
+
+@contextlib.contextmanager
+def batch():
+    """Send all the device changes made in the context in one request.
+
+    Changes are applied when the context exits (errors are raised then).
+    Devices created in the batch can be referred to by name, but addresses
+    and routes need the device to exist beforehand. Without rtnetlink,
+    changes are applied immediately.
+    """
+    rtnl = _rtnetlink()
+    if rtnl is None:
+        yield
+        return
+
+    with rtnl.batch():
+        yield
 
 
 def dev_mtu(devname):
@@ -111,6 +182,11 @@ def link_set_up(devname):
     :param ``str`` devname:
         The name of the network device.
     """
+    rtnl = _rtnetlink()
+    if rtnl is not None:
+        rtnl.link_set(devname, up=True)
+        return
+
     subproc.check_call(
         [
             _IP_EXE, 'link',
@@ -127,6 +203,11 @@ def link_set_down(devname):
     :param ``str`` devname:
         The name of the network device.
     """
+    rtnl = _rtnetlink()
+    if rtnl is not None:
+        rtnl.link_set(devname, up=False)
+        return
+
     subproc.check_call(
         [
             _IP_EXE, 'link',
@@ -143,6 +224,11 @@ def link_set_name(devname, newname):
     :param ``str`` devname:
         The current name of the network device.
     """
+    rtnl = _rtnetlink()
+    if rtnl is not None:
+        rtnl.link_set_name(rtnetlink.link_index(devname), newname)
+        return
+
     subproc.check_call(
         [
             _IP_EXE, 'link',
@@ -159,6 +245,11 @@ def link_set_alias(devname, alias):
     :param ``str`` devname:
         The name of the network device.
     """
+    rtnl = _rtnetlink()
+    if rtnl is not None:
+        rtnl.link_set(devname, alias=alias)
+        return
+
     subproc.check_call(
         [
             _IP_EXE, 'link',
@@ -175,6 +266,11 @@ def link_set_mtu(devname, mtu):
     :param ``str`` devname:
         The name of the network device.
     """
+    rtnl = _rtnetlink()
+    if rtnl is not None:
+        rtnl.link_set(devname, mtu=int(mtu))
+        return
+
     subproc.check_call(
         [
             _IP_EXE, 'link',
@@ -191,6 +287,12 @@ def link_set_netns(devname, namespace):
     :param ``str`` devname:
         The name of the network device.
     """
+    rtnl = _rtnetlink()
+    # Named namespaces are resolved by `ip`.
+    if rtnl is not None and str(namespace).isdigit():
+        rtnl.link_set(devname, netns_pid=int(namespace))
+        return
+
     subproc.check_call(
         [
             _IP_EXE, 'link',
@@ -209,6 +311,11 @@ def link_set_addr(devname, macaddr):
     :param ``str`` macaddr:
         The mac address.
     """
+    rtnl = _rtnetlink()
+    if rtnl is not None:
+        rtnl.link_set(devname, address=macaddr)
+        return
+
     subproc.check_call(
         [
             _IP_EXE, 'link',
@@ -227,6 +334,11 @@ def link_add_veth(veth0, veth1):
     :param ``str`` veth1:
         The name of the second network device.
     """
+    rtnl = _rtnetlink()
+    if rtnl is not None:
+        rtnl.link_add_veth(veth0, veth1)
+        return
+
     subproc.check_call(
         [
             _IP_EXE, 'link',
@@ -243,6 +355,11 @@ def link_del_veth(devname):
     :param ``str`` devname:
         The name of the network device.
     """
+    rtnl = _rtnetlink()
+    if rtnl is not None:
+        rtnl.link_del(devname)
+        return
+
     subproc.check_call(
         [
             _IP_EXE, 'link',
@@ -261,6 +378,11 @@ def addr_add(addr, devname, addr_scope='link'):
     :param ``str`` devname:
         The name of the network device.
     """
+    rtnl = _rtnetlink()
+    if rtnl is not None:
+        rtnl.addr_add(rtnetlink.link_index(devname), addr, scope=addr_scope)
+        return
+
     subproc.check_call(
         [
             'ip', 'addr',
@@ -279,6 +401,19 @@ def route_add(dest, via=None, devname=None, src=None, route_scope=None):
         The name of the network device.
     """
     assert devname or via
+    rtnl = _rtnetlink()
+    if rtnl is not None:
+        rtnl.route_add(
+            dest,
+            via=via,
+            index=(
+                rtnetlink.link_index(devname) if devname is not None else None
+            ),
+            src=src,
+            scope=route_scope
+        )
+        return
+
     route = [
         'ip', 'route',
         'add', dest,
@@ -301,6 +436,11 @@ def bridge_create(devname):
     :param ``str`` devname:
         The name of the network device.
     """
+    rtnl = _rtnetlink()
+    if rtnl is not None:
+        rtnl.link_add_bridge(devname)
+        return
+
     subproc.check_call(
         [
             _BRCTL_EXE,
@@ -316,6 +456,11 @@ def bridge_delete(devname):
     :param ``str`` devname:
         The name of the network device.
     """
+    rtnl = _rtnetlink()
+    if rtnl is not None:
+        rtnl.link_del(devname)
+        return
+
     subproc.check_call(
         [
             _BRCTL_EXE,
@@ -331,6 +476,11 @@ def bridge_setfd(devname, forward_delay):
     :param ``str`` devname:
         The name of the network device.
     """
+    rtnl = _rtnetlink()
+    if rtnl is not None:
+        rtnl.bridge_set_forward_delay(devname, int(forward_delay))
+        return
+
     subproc.check_call(
         [
             _BRCTL_EXE,
@@ -347,6 +497,11 @@ def bridge_addif(devname, interface):
     :param ``str`` devname:
         The name of the network device.
     """
+    rtnl = _rtnetlink()
+    if rtnl is not None:
+        rtnl.link_set(interface, master=rtnetlink.link_index(devname))
+        return
+
     subproc.check_call(
         [
             _BRCTL_EXE,
@@ -363,6 +518,11 @@ def bridge_delif(devname, interface):
     :param ``str`` devname:
         The name of the network device.
     """
+    rtnl = _rtnetlink()
+    if rtnl is not None:
+        rtnl.link_set(interface, master=0)
+        return
+
     subproc.check_call(
         [
             _BRCTL_EXE,
@@ -4,7 +4,6 @@ import errno
 import os
 import time
 import logging
-import subprocess
 import sys
 
 import kazoo
@@ -15,13 +14,13 @@ from treadmill import cgroups
 from treadmill import supervisor
 from treadmill import sysinfo
 from treadmill import utils
-from treadmill import subproc
 from treadmill import zkutils
 from treadmill import appevents
 
 from treadmill import zknamespace as z
 
 from treadmill.apptrace import events as traceevents
+from treadmill.s6 import supervise
 
 
 _LOGGER = logging.getLogger(__name__)
@@ -34,6 +33,13 @@ _INVALID_IDENTITY = sys.maxsize
 _MAX_RESTART_RATE = 5
 _RESTART_RATE_INTERVAL = 60
 
+# Interval between checks that services are supervised.
+_SUPERVISED_POLL_INTERVAL = 0.1
+
+# Interval between service status checks when waiting for exit, in case a
+# supervisor notification is missed.
+_EXIT_RECHECK_INTERVAL = 1
+
 # Time to wait when registering endpoints in case previous ephemeral
 # endpoint is still present.
 _EPHEMERAL_RETRY_INTERVAL = 5
@@ -175,6 +181,14 @@ def is_oom():
         return False
 
 
+def _really_down(svc_dirs):
+    """Return the services that are down, with their finish script done."""
+    return [
+        svc_dir for svc_dir in svc_dirs
+        if supervise.read_status(svc_dir).is_really_down
+    ]
+
+
 def kill_node(zkclient, node):
     """Kills app, endpoints, and server node."""
     _LOGGER.info('killing node: %s', node)
@@ -204,15 +218,9 @@ def kill_node(zkclient, node):
 
 def is_down(svc_dir):
     """Check if service is running."""
-    try:
-        subproc.check_call(['s6_svwait', '-t', '100', '-D', svc_dir])
-        return True
-    except subprocess.CalledProcessError as err:
-        # If wait timed out, the app is already running, do nothing.
-        if err.returncode == 99:
-            return False
-        else:
-            raise
+    # If wait timed out, the app is already running.
+    return supervise.wait_for([svc_dir], supervise.WaitFor.really_down,
+                              timeout=100)
 
 
 class ServicePresence(object):
@@ -246,7 +254,7 @@ class ServicePresence(object):
                 _LOGGER.info('%s/%s not yet supervised.',
                              self.services_dir,
                              service)
-                time.sleep(0.5)
+                time.sleep(_SUPERVISED_POLL_INTERVAL)
 
     def _actual_restarts(self, service_name, restart_data):
         """Returns the number of restarts for the given service."""
@@ -319,34 +327,42 @@ class ServicePresence(object):
 
         if is_down(svc_dir):
             if os.path.exists(os.path.join(svc_dir, 'down')):
-                subproc.check_call(['s6_svc', '-o', svc_dir])
+                supervise.control(svc_dir, 'o')
             self.report_running(service_name)
         else:
             _LOGGER.info('Service %s already running', service_name)
 
-        subproc.check_call(['s6_svwait', '-u', svc_dir])
+        supervise.wait_for([svc_dir], supervise.WaitFor.up)
         return True
 
     def wait_for_exit(self, container_svc_dir):
         """Waits for service to be down, reports status to zk."""
-        watched_dirs = [os.path.join(self.services_dir, svc)
-                        for svc in self.services]
+        watched = {
+            os.path.join(self.services_dir, svc): svc
+            for svc in self.services
+        }
         if container_svc_dir:
-            watched_dirs.append(container_svc_dir)
-
-        _LOGGER.info('waiting for service exit: %r', watched_dirs)
-
-        # Wait for one of the services to come down.
-        # TODO: need to investigate why s6-svwait returns 111 rather
-        #                than 0.
-        subproc.call(['s6_svwait', '-o', '-D'] + watched_dirs)
-
-        # Wait for the supervisor to report finished status.
-        time.sleep(1)
-
-        for service in self.services:
-            # If service is running, update_exit_status is noop.
-            self.update_exit_status(service)
+            watched[container_svc_dir] = None
+
+        _LOGGER.info('waiting for service exit: %r', list(watched))
+
+        with supervise.ServiceWatcher() as watcher:
+            # Subscribe first, then check the status, so no exit is missed.
+            for svc_dir in watched:
+                watcher.add(svc_dir)
+
+            exited = _really_down(watched)
+            while not exited:
+                # Supervisors notify 'D' once the finish script, which
+                # records the exit status, is done. Re-check all services
+                # on timeout.
+                events = watcher.wait(_EXIT_RECHECK_INTERVAL)
+                exited = _really_down(events or watched)
+
+        for svc_dir in exited:
+            service = watched[svc_dir]
+            if service is not None:
+                self.update_exit_status(service)
 
     def exit_info(self, svc_dir):
         """Constructs exit summary given service directory."""
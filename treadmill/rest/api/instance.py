@@ -95,8 +95,7 @@ def init(api, cors, impl):
         def post(self):
             """Bulk deletes list of instances."""
             instance_ids = flask.request.json['instances']
-            for instance_id in instance_ids:
-                impl.delete(instance_id)
+            impl.bulk_delete(instance_ids)
 
     @namespace.route(
         '/_bulk/update',
@@ -38,6 +38,13 @@ SOCKET = '/tmp/treadmill.rrd'
 TIMEFRAME_TO_RRA_IDX = {"short": "0", "long": "1"}
 
 
+def _update_str(data, timestamp=None):
+    """Format rrd update values."""
+    if timestamp is None:
+        timestamp = time.time()
+    return ':'.join([str(int(timestamp)), _METRICS_FMT.format(**data)])
+
+
 class RRDError(Exception):
     """RRD protocol error."""
 
@@ -59,7 +66,7 @@ class RRDClient(object):
         """Sends rrd command and checks the output."""
         line = line.strip()
 
-        if not line.startswith('UPDATE'):
+        if not line.startswith(('UPDATE', 'BATCH')):
             _LOGGER.info('rrd command: %s', line)
         self.rrd.write(line + '\n')
         self.rrd.flush()
@@ -107,10 +114,9 @@ class RRDClient(object):
             'RRA:AVERAGE:0.5:10m:3d',
         ]))
 
-    def update(self, rrdfile, data):
+    def update(self, rrdfile, data, timestamp=None):
         """Updates rrd file with data, create if does not exist."""
-        rrd_update_str = ':'.join([str(int(time.time())),
-                                   _METRICS_FMT.format(**data)])
+        rrd_update_str = _update_str(data, timestamp)
         try:
             self.command('UPDATE %s %s' % (rrdfile, rrd_update_str))
         except RRDError:
@@ -120,6 +126,36 @@ class RRDClient(object):
             _LOGGER.exception('Error updating: %s', rrdfile)
             fs.rm_safe(rrdfile)
 
+    def batch_update(self, updates):
+        """Updates rrd files in a single BATCH request.
+
+        The daemon only replies once all the updates are sent. As in
+        ``update``, files that fail to update are removed.
+
+        :param updates:
+            List of (rrdfile, data, timestamp) tuples.
+        """
+        if not updates:
+            return
+
+        self.command('BATCH')
+        for rrdfile, data, timestamp in updates:
+            self.rrd.write(
+                'UPDATE %s %s\n' % (rrdfile, _update_str(data, timestamp))
+            )
+        self.rrd.write('.\n')
+        self.rrd.flush()
+
+        # Errors are reported per command, numbered from 1.
+        reply = self.rrd.readline()
+        status, _msg = reply.split(' ', 1)
+        for _ in range(0, int(status)):
+            reply = self.rrd.readline()
+            cmd_idx, msg = reply.split(' ', 1)
+            rrdfile = updates[int(cmd_idx) - 1][0]
+            _LOGGER.error('Error updating: %s: %s', rrdfile, msg.strip())
+            fs.rm_safe(rrdfile)
+
     def flush(self, rrdfile, oneway=False):
         """Send flush request to the rrd cache daemon."""
         self.command('FLUSH ' + rrdfile, oneway)
@@ -0,0 +1,371 @@
+"""Native s6-supervise client.
+
+Talks to s6-supervise directly through the files of the supervised service
+directory instead of forking the s6 command line tools:
+
+ - ``supervise/status`` is decoded to get the service state (`s6-svstat`),
+ - commands are written to the ``supervise/control`` FIFO (`s6-svc`,
+   `s6-svok`),
+ - waits subscribe to the ``event`` fifodir, where s6-supervise writes a
+   character on every state change (`s6-svwait`).
+"""
+
+import binascii
+import errno
+import logging
+import os
+import random
+import select
+import string
+import struct
+import time
+
+import enum
+
+_LOGGER = logging.getLogger(__name__)
+
+_SUPERVISE_DIR = 'supervise'
+_STATUS_FILE = 'status'
+_CONTROL_FIFO = 'control'
+_EVENT_DIR = 'event'
+
+# TAI64 label of the Unix epoch (skalibs system clock, see tain_sysclock).
+_TAI64_EPOCH = (1 << 62) + 10
+
+# s6_svstatus_t packing (s6/s6-supervise.h): stamp and readystamp (TAI64N),
+# pid, [pgid,] wait status and flags. pgid was added in s6 2.9.
+_STATUS = struct.Struct('>QI QI Q H B')
+_STATUS_PGID = struct.Struct('>QI QI Q Q H B')
+
+_FLAG_PAUSED = 0x1
+_FLAG_FINISHING = 0x2
+_FLAG_WANTUP = 0x4
+_FLAG_READY = 0x8
+
+# Name of the subscription FIFOs in the event fifodir (skalibs ftrig1_make):
+# ftrig1:@<TAI64N label, 24 hex>:<16 random characters>. Notifiers
+# (ftrigw_notify) only write to entries with the prefix and this exact length.
+_FTRIG_PREFIX = 'ftrig1'
+_FTRIG_NAME_LEN = len(_FTRIG_PREFIX) + 43
+_FTRIG_RANDOM_CHARS = string.ascii_letters + string.digits + '-_'
+
+# Status is re-read at this interval (seconds) while waiting, in case a
+# notification was missed.
+_WAIT_RECHECK_INTERVAL = 1
+
+
+class ServiceStatus(object):
+    """Decoded ``supervise/status`` of a service."""
+
+    __slots__ = (
+        'stamp',
+        'readystamp',
+        'pid',
+        'wstat',
+        'paused',
+        'finishing',
+        'wantup',
+        'ready',
+    )
+
+    def __init__(self, stamp, readystamp, pid, wstat, flags):
+        self.stamp = stamp
+        self.readystamp = readystamp
+        self.pid = pid
+        self.wstat = wstat
+        self.paused = bool(flags & _FLAG_PAUSED)
+        self.finishing = bool(flags & _FLAG_FINISHING)
+        self.wantup = bool(flags & _FLAG_WANTUP)
+        self.ready = bool(flags & _FLAG_READY)
+
+    @property
+    def is_up(self):
+        """Service process is running (same definition as `s6-svstat`)."""
+        return bool(self.pid) and not self.finishing
+
+    @property
+    def is_really_down(self):
+        """Service is down and its finish script is done."""
+        return not self.pid and not self.finishing
+
+
+def _tai64n_to_time(secs, _nano):
+    """Convert a TAI64N timestamp to Unix time (seconds)."""
+    return secs - _TAI64_EPOCH
+
+
+def _ftrig_name():
+    """Generate a subscription FIFO name, as skalibs ftrig1_make does."""
+    now = time.time()
+    secs = int(now)
+    label = struct.pack('>QI', _TAI64_EPOCH + secs,
+                        int((now - secs) * 1e9))
+    rand = random.SystemRandom()
+    return '{prefix}:@{label}:{rand}'.format(
+        prefix=_FTRIG_PREFIX,
+        label=binascii.hexlify(label).decode(),
+        rand=''.join(rand.choice(_FTRIG_RANDOM_CHARS) for _ in range(16)),
+    )
+
+
+def read_status(service_dir):
+    """Read the supervision status of a service.
+
+    :raises:
+        OSError (ENOENT) if the service was never supervised.
+        ValueError if the status format is unknown.
+    """
+    with open(os.path.join(service_dir, _SUPERVISE_DIR, _STATUS_FILE),
+              'rb') as f:
+        data = f.read()
+
+    if len(data) == _STATUS.size:
+        (stamp, stamp_nano, ready, ready_nano,
+         pid, wstat, flags) = _STATUS.unpack(data)
+    elif len(data) == _STATUS_PGID.size:
+        (stamp, stamp_nano, ready, ready_nano,
+         pid, _pgid, wstat, flags) = _STATUS_PGID.unpack(data)
+    else:
+        raise ValueError('%s: unknown s6 status format (%d bytes)' %
+                         (service_dir, len(data)))
+
+    return ServiceStatus(
+        stamp=_tai64n_to_time(stamp, stamp_nano),
+        readystamp=_tai64n_to_time(ready, ready_nano),
+        pid=pid,
+        wstat=wstat,
+        flags=flags,
+    )
+
+
+def is_supervised(service_dir):
+    """Check if s6-supervise is running on the service (`s6-svok`)."""
+    try:
+        fd = os.open(os.path.join(service_dir, _SUPERVISE_DIR, _CONTROL_FIFO),
+                     os.O_WRONLY | os.O_NONBLOCK)
+    except OSError as err:
+        # ENXIO: no reader on the FIFO, ENOENT: never supervised.
+        if err.errno in (errno.ENXIO, errno.ENOENT):
+            return False
+        raise
+
+    os.close(fd)
+    return True
+
+
+def control(service_dir, commands):
+    """Send commands to the supervisor of a service (`s6-svc`).
+
+    :param ``str`` commands:
+        s6-supervise command characters (e.g. 'o', 'd', 'uO', 't').
+    :raises:
+        OSError (ENXIO/ENOENT) if the service is not supervised.
+    """
+    fd = os.open(os.path.join(service_dir, _SUPERVISE_DIR, _CONTROL_FIFO),
+                 os.O_WRONLY | os.O_NONBLOCK)
+    try:
+        os.write(fd, commands.encode())
+    finally:
+        os.close(fd)
+
+
+class WaitFor(enum.Enum):
+    """Service states that can be waited for (`s6-svwait` options)."""
+
+    # Disable C0103: invalid constant name
+    # pylint: disable=C0103
+    up = 'u'
+    down = 'd'
+    really_down = 'D'
+
+    def reached(self, status):
+        """Check if the status is in the state."""
+        if self is WaitFor.up:
+            return status.is_up
+        elif self is WaitFor.down:
+            return not status.is_up
+        else:
+            return status.is_really_down
+
+
+class _Subscription(object):
+    """Subscription to the event fifodir of a service."""
+
+    __slots__ = (
+        'service_dir',
+        'fifo',
+        'fd',
+        '_wfd',
+    )
+
+    def __init__(self, service_dir):
+        self.service_dir = service_dir
+        event_dir = os.path.join(service_dir, _EVENT_DIR)
+        name = _ftrig_name()
+        # The FIFO is created under a hidden name (ignored by notifiers) and
+        # renamed once opened, notifiers remove FIFOs without readers.
+        tmp_fifo = os.path.join(event_dir, '.' + name)
+        self.fifo = os.path.join(event_dir, name)
+        os.mkfifo(tmp_fifo, 0o622)
+        try:
+            self.fd = os.open(tmp_fifo, os.O_RDONLY | os.O_NONBLOCK)
+            # Keep a writer open, so the FIFO never reports EOF.
+            self._wfd = os.open(tmp_fifo, os.O_WRONLY | os.O_NONBLOCK)
+            os.rename(tmp_fifo, self.fifo)
+        except OSError:
+            self.close()
+            _unlink(tmp_fifo)
+            raise
+
+    def drain(self):
+        """Read all pending events."""
+        try:
+            return os.read(self.fd, 4096)
+        except OSError as err:
+            if err.errno == errno.EAGAIN:
+                return b''
+            raise
+
+    def close(self):
+        """Unsubscribe."""
+        _unlink(self.fifo)
+        for fd in (getattr(self, 'fd', None), getattr(self, '_wfd', None)):
+            if fd is not None:
+                os.close(fd)
+
+
+def _unlink(path):
+    """Remove file, ignore if it does not exist."""
+    try:
+        os.unlink(path)
+    except OSError as err:
+        if err.errno != errno.ENOENT:
+            raise
+
+
+class ServiceWatcher(object):
+    """Watch state changes of many services in a single epoll loop.
+
+    Every watched service has a subscription in its event fifodir, the
+    events written by the supervisors are returned by ``wait``.
+    """
+
+    __slots__ = (
+        '_epoll',
+        '_by_fd',
+        '_by_dir',
+    )
+
+    def __init__(self):
+        self._epoll = select.epoll()
+        self._by_fd = {}
+        self._by_dir = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_args):
+        self.close()
+
+    @property
+    def services(self):
+        """Watched service directories."""
+        return list(self._by_dir)
+
+    def add(self, service_dir):
+        """Start watching a service."""
+        if service_dir in self._by_dir:
+            return
+
+        sub = _Subscription(service_dir)
+        self._epoll.register(sub.fd, select.EPOLLIN)
+        self._by_fd[sub.fd] = sub
+        self._by_dir[service_dir] = sub
+
+    def remove(self, service_dir):
+        """Stop watching a service."""
+        sub = self._by_dir.pop(service_dir, None)
+        if sub is None:
+            return
+
+        del self._by_fd[sub.fd]
+        self._epoll.unregister(sub.fd)
+        sub.close()
+
+    def wait(self, timeout=-1):
+        """Wait for service events for up to ``timeout`` seconds.
+
+        :param timeout:
+            Time in seconds to wait for events (-1 means forever)
+        :returns ``dict``:
+            Events received (as a ``str`` of event characters, e.g. 'dD'),
+            by service directory. Empty on timeout.
+        """
+        events = {}
+        for fd, _event in self._epoll.poll(timeout):
+            sub = self._by_fd[fd]
+            data = sub.drain()
+            if data:
+                events[sub.service_dir] = data.decode()
+
+        return events
+
+    def close(self):
+        """Remove all subscriptions."""
+        for service_dir in list(self._by_dir):
+            self.remove(service_dir)
+        self._epoll.close()
+
+
+def wait_for(service_dirs, state, wait_all=True, timeout=0):
+    """Wait for services to reach a state (`s6-svwait`).
+
+    :param ``list`` service_dirs:
+        Supervised service directories.
+    :param ``WaitFor`` state:
+        State to wait for.
+    :param ``bool`` wait_all:
+        Wait for all the services (or any of them).
+    :param ``int`` timeout:
+        Timeout in milliseconds, 0 waits forever.
+    :returns ``bool``:
+        ``True`` if the state is reached, ``False`` on timeout.
+
+    Services are woken up by the supervisor events, their status is also
+    re-read every ``_WAIT_RECHECK_INTERVAL`` so a missed notification
+    cannot block the wait.
+    """
+    if not service_dirs:
+        return True
+
+    with ServiceWatcher() as watcher:
+        # Subscribe first, then read the current status, so no transition
+        # can be missed.
+        for service_dir in service_dirs:
+            watcher.add(service_dir)
+
+        pending = set()
+        for service_dir in service_dirs:
+            if not state.reached(read_status(service_dir)):
+                pending.add(service_dir)
+
+        deadline = time.time() + timeout / 1000.0 if timeout else None
+        while pending and (wait_all or len(pending) == len(service_dirs)):
+            if deadline is None:
+                events = watcher.wait(_WAIT_RECHECK_INTERVAL)
+            else:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return False
+                events = watcher.wait(min(remaining, _WAIT_RECHECK_INTERVAL))
+
+            if events:
+                changed = pending.intersection(events)
+            else:
+                changed = set(pending)
+
+            for service_dir in changed:
+                if state.reached(read_status(service_dir)):
+                    pending.discard(service_dir)
+
+        return True
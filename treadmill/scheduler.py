@@ -7,7 +7,6 @@
 
 import abc
 import collections
-import heapq
 import logging
 import operator
 import itertools
@@ -42,6 +41,9 @@ DEFAULT_APP_LEASE = 24 * 60 * 60
 # Default partition threshold
 DEFAULT_THRESHOLD = 0.9
 
+# Run full schedule at least every 5 min in incremental mode.
+FULL_SCHEDULE_INTERVAL = 5 * 60
+
 
 def _bit_count(value):
     """Returns number of bits set."""
@@ -80,6 +82,55 @@ def utilization(demand, allocated, available):
     return np.max(np.subtract(demand, allocated) / available)
 
 
+def _utilization_cumulative(demand, priority, allocated, available):
+    """Calculates utilization score of each app in the demand queue.
+
+    Utilization of the app accounts for the demand of all apps ahead of it.
+    Priority 0 apps are treated specially - utilization is set to max float.
+    This ensures that they are at the end of the all queues.
+    """
+    acc_demand = np.cumsum(demand, axis=0)
+    util = np.max((acc_demand - allocated) / available, axis=1)
+    util[priority == 0] = _MAX_UTILIZATION
+    return util
+
+
+def _merge_order(keys, lengths):
+    """Returns order of merging concatenated queues.
+
+    Keys are given in np.lexsort order, the last key is primary. Same as
+    heapq.merge, queue order is preserved even if the queue is not sorted:
+    an element that is less than its predecessors is merged right after the
+    largest of them. Ties are resolved in favor of the first queue.
+    """
+    count = sum(lengths)
+    if not count:
+        return np.arange(0, dtype=int)
+
+    # Dense rank of each element in the global order.
+    idx = np.lexsort(keys)
+    changed = np.zeros(count, dtype=int)
+    for key in keys:
+        sorted_key = key[idx]
+        changed[1:] |= sorted_key[1:] != sorted_key[:-1]
+    key_rank = np.empty(count, dtype=int)
+    key_rank[idx] = np.cumsum(changed)
+
+    # Running max within each queue is the rank it is merged at.
+    merge_rank = np.empty(count, dtype=int)
+    queue = np.empty(count, dtype=int)
+    position = np.empty(count, dtype=int)
+    start = 0
+    for queue_idx, length in enumerate(lengths):
+        end = start + length
+        merge_rank[start:end] = np.maximum.accumulate(key_rank[start:end])
+        queue[start:end] = queue_idx
+        position[start:end] = np.arange(length)
+        start = end
+
+    return np.lexsort((position, queue, merge_rank))
+
+
 def _all(oper, left, right):
     """Short circuit all for ndarray."""
     return all(oper(ai, bi) for ai, bi in zip(left, right))
@@ -268,11 +319,6 @@ class Application(object):
         self.placement_expiry = None
         self.renew = False
 
-    # FIXME: What dictates order? heapq.merge in utilization_queue needs this
-    # comparison.
-    def __lt__(self, other):
-        return self.priority < other.priority
-
     def acquire_identity(self):
         """Try to acquire identity if belong to the group.
 
@@ -313,6 +359,14 @@ class Application(object):
             return self.allocation.traits
 
 
+def _cycle_indices(indices, start):
+    """Iterate over sorted indices in cyclic order following start."""
+    pos = np.searchsorted(indices, start, side='right')
+    for idx in itertools.chain(indices[pos:], indices[:pos]):
+        if idx != start:
+            yield int(idx)
+
+
 class Strategy(object, metaclass=abc.ABCMeta):
     """Base class for all placement strategies."""
 
@@ -326,6 +380,11 @@ class Strategy(object, metaclass=abc.ABCMeta):
         """Next node to try, if previous suggestion was rejected."""
         pass
 
+    @abc.abstractmethod
+    def next_nodes(self, candidates):
+        """Iterate over candidate nodes to try after the suggested node."""
+        pass
+
 
 class SpreadStrategy(Strategy):
     """Spread strategy will suggest new node for each subsequent placement."""
@@ -355,6 +414,19 @@ class SpreadStrategy(Strategy):
         """Suggest next node from the cycle."""
         return self.suggested_node()
 
+    def next_nodes(self, candidates):
+        """Iterate over candidate nodes remaining in the cycle.
+
+        Same as calling next_node until the cycle wraps to the suggested
+        node, with nodes not in candidates skipped.
+        """
+        suggested = self.current_idx - 1
+        for idx in _cycle_indices(candidates, suggested):
+            self.current_idx = idx + 1
+            yield self.node.children[idx]
+
+        self.current_idx = suggested + 1
+
 
 class PackStrategy(Strategy):
     """Pack strategy will suggest same node until it is full."""
@@ -383,6 +455,19 @@ class PackStrategy(Strategy):
         self.current_idx += 1
         return self.suggested_node()
 
+    def next_nodes(self, candidates):
+        """Iterate over candidate nodes remaining in the cycle.
+
+        Same as calling next_node until the cycle wraps to the suggested
+        node, with nodes not in candidates skipped.
+        """
+        suggested = self.current_idx
+        for idx in _cycle_indices(candidates, suggested):
+            self.current_idx = idx
+            yield self.node.children[idx]
+
+        self.current_idx = suggested
+
 
 class TraitSet(object):
     """Hierarchical set of traits."""
@@ -442,6 +527,71 @@ class AffinityCounter(object):
         self.affinity_counter = collections.Counter()
 
 
+class CapacityStore(object):
+    """Contiguous (servers x DIMENSION_COUNT) matrix of free capacity.
+
+    Each attached server uses a row of the matrix as free_capacity, so that
+    in-place updates on put/remove are visible to the store, and capacity
+    checks across many servers become single vectorized operations.
+    """
+    __slots__ = (
+        'matrix',
+        'servers',
+        'free_rows',
+    )
+
+    def __init__(self, size=64):
+        assert DIMENSION_COUNT is not None, 'Dimension count not set.'
+        self.matrix = np.zeros((size, DIMENSION_COUNT))
+        self.servers = [None] * size
+        self.free_rows = list(range(size - 1, -1, -1))
+
+    def _grow(self):
+        """Double the matrix size, rebind server row views."""
+        size = len(self.servers)
+        matrix = np.zeros((size * 2, DIMENSION_COUNT))
+        matrix[:size] = self.matrix
+        self.matrix = matrix
+        self.servers.extend([None] * size)
+        self.free_rows.extend(range(size * 2 - 1, size - 1, -1))
+
+        for row, server in enumerate(self.servers):
+            if server is not None:
+                server.free_capacity = self.matrix[row]
+
+    def attach(self, server):
+        """Move server free capacity into the store."""
+        if server.capacity_row is not None:
+            return
+
+        if not self.free_rows:
+            self._grow()
+
+        row = self.free_rows.pop()
+        self.matrix[row] = server.free_capacity
+        self.servers[row] = server
+        server.free_capacity = self.matrix[row]
+        server.capacity_row = row
+
+    def detach(self, server):
+        """Move server free capacity out of the store."""
+        row = server.capacity_row
+        if row is None:
+            return
+
+        server.free_capacity = self.matrix[row].copy()
+        server.capacity_row = None
+        self.matrix[row] = 0
+        self.servers[row] = None
+        self.free_rows.append(row)
+
+    def max_capacity(self, rows):
+        """Returns elementwise max free capacity of the rows."""
+        if not rows:
+            return zero_capacity()
+        return self.matrix[rows].max(axis=0)
+
+
 class Node(object):
     """Abstract placement node."""
 
@@ -456,6 +606,7 @@ class Node(object):
         'labels',
         'affinity_counters',
         'valid_until',
+        'capacity_row',
         '_state',
         '_state_since',
     )
@@ -471,6 +622,7 @@ class Node(object):
         self.labels = set()
         self.affinity_counters = collections.Counter()
         self.valid_until = valid_until
+        self.capacity_row = None
         self._state = State.up
         self._state_since = time.time()
 
@@ -492,6 +644,7 @@ class Node(object):
         """Sets the state and time since."""
         if self._state is not state:
             self._state_since = since
+            self.mark_dirty()
         self._state = state
         _LOGGER.debug('state: %s - (%s, %s)',
                       self.name, self._state, self._state_since)
@@ -536,7 +689,12 @@ class Node(object):
 
     def reset_children(self):
         """Reset children to empty list."""
+        self.mark_dirty()
+        store = self.get_capacity_store()
         for child in self.children_iter():
+            if store is not None:
+                child.detach_capacity(store)
+            self.unindex_members(child)
             child.parent = None
         self.children = list()
         self.children_by_name = dict()
@@ -550,6 +708,12 @@ class Node(object):
         self.children.append(node)
         self.children_by_name[node.name] = node
 
+        store = self.get_capacity_store()
+        if store is not None:
+            node.attach_capacity(store)
+
+        self.mark_dirty()
+        self.index_members(node)
         self.add_child_traits(node)
         self.increment_affinity(node.affinity_counters)
         self.add_labels(node.labels)
@@ -574,6 +738,12 @@ class Node(object):
         self.decrement_affinity(node.affinity_counters)
         self.adjust_valid_until(None)
 
+        store = self.get_capacity_store()
+        if store is not None:
+            node.detach_capacity(store)
+
+        self.mark_dirty()
+        self.unindex_members(node)
         node.parent = None
         return node
 
@@ -582,6 +752,37 @@ class Node(object):
         assert nodename in self.children_by_name
         return self.remove_node(self.children_by_name[nodename])
 
+    def get_capacity_store(self):
+        """Returns capacity store of the cell the node belongs to, if any."""
+        if self.parent:
+            return self.parent.get_capacity_store()
+        return None
+
+    def mark_dirty(self):
+        """Record topology/state change in the cell the node belongs to."""
+        if self.parent:
+            self.parent.mark_dirty()
+
+    def index_members(self, node):
+        """Add leaf servers of the node to the cell server index."""
+        if self.parent:
+            self.parent.index_members(node)
+
+    def unindex_members(self, node):
+        """Remove leaf servers of the node from the cell server index."""
+        if self.parent:
+            self.parent.unindex_members(node)
+
+    def attach_capacity(self, store):
+        """Recursively attach all leaf servers to the capacity store."""
+        for child in self.children_iter():
+            child.attach_capacity(store)
+
+    def detach_capacity(self, store):
+        """Recursively detach all leaf servers from the capacity store."""
+        for child in self.children_iter():
+            child.detach_capacity(store)
+
     def check_app_constraints(self, app):
         """Find app placement on the node."""
         if app.allocation is not None:
@@ -598,7 +799,7 @@ class Node(object):
                 app.affinity.limits[self.level]):
             return False
 
-        if _any_gt(app.demand, self.free_capacity):
+        if (app.demand > self.free_capacity).any():
             return False
 
         return True
@@ -642,6 +843,9 @@ class Bucket(Node):
     __slots__ = (
         'affinity_strategies',
         'traits',
+        'capacity_index',
+        'capacity_index_rows',
+        'constraint_masks',
     )
 
     _default_strategy_t = SpreadStrategy
@@ -650,6 +854,9 @@ class Bucket(Node):
         super(Bucket, self).__init__(name, traits, level)
         self.affinity_strategies = dict()
         self.traits = TraitSet(traits)
+        self.capacity_index = None
+        self.capacity_index_rows = dict()
+        self.constraint_masks = dict()
 
     def set_affinity_strategy(self, affinity, strategy_t):
         """Initilaizes placement strategy for given affinity."""
@@ -666,6 +873,7 @@ class Bucket(Node):
         """Node can only increase capacity."""
         self.free_capacity = np.maximum(self.free_capacity, new_capacity)
         if self.parent:
+            self.parent.update_capacity_index(self)
             self.parent.adjust_capacity_up(self.free_capacity)
 
     def adjust_capacity_down(self, prev_capacity=None):
@@ -673,25 +881,38 @@ class Bucket(Node):
         if self.empty():
             self.free_capacity = zero_capacity()
             if self.parent:
+                self.parent.update_capacity_index(self)
                 self.parent.adjust_capacity_down()
         else:
-            if prev_capacity is not None and _all_lt(prev_capacity,
-                                                     self.free_capacity):
+            if prev_capacity is not None and (prev_capacity <
+                                              self.free_capacity).all():
                 return
 
+            # Servers attached to the capacity store are reduced in a single
+            # vectorized max over their rows.
             free_capacity = zero_capacity()
+            rows = []
             for child_node in self.children_iter():
                 if child_node.state is not State.up:
                     continue
 
+                if child_node.capacity_row is not None:
+                    rows.append(child_node.capacity_row)
+                else:
+                    free_capacity = np.maximum(free_capacity,
+                                               child_node.free_capacity)
+            if rows:
+                store = self.get_capacity_store()
                 free_capacity = np.maximum(free_capacity,
-                                           child_node.free_capacity)
+                                           store.max_capacity(rows))
+
             # If resulting free_capacity is less the previous, we need to
             # adjust the parent, otherwise, nothing needs to be done.
             prev_capacity = self.free_capacity.copy()
-            if _any_lt(free_capacity, self.free_capacity):
+            if (free_capacity < self.free_capacity).any():
                 self.free_capacity = free_capacity
                 if self.parent:
+                    self.parent.update_capacity_index(self)
                     self.parent.adjust_capacity_down(prev_capacity)
 
     def add_node(self, node):
@@ -707,6 +928,59 @@ class Bucket(Node):
 
         return node
 
+    def mark_dirty(self):
+        """Invalidate the free capacity index, record the change up."""
+        self.capacity_index = None
+        self.capacity_index_rows = dict()
+        self.constraint_masks = dict()
+        super(Bucket, self).mark_dirty()
+
+    def update_capacity_index(self, node):
+        """Update indexed free capacity of the child node."""
+        idx = self.capacity_index_rows.get(node.name)
+        if idx is not None:
+            self.capacity_index[idx] = node.free_capacity
+
+    def _constraint_mask(self, app):
+        """Return mask of up children matching app label and traits.
+
+        Masks are cached per (label, traits) until the next topology or
+        state change.
+        """
+        check_label = app.allocation is not None
+        label = app.allocation.label if check_label else None
+        key = (check_label, label, app.traits)
+
+        mask = self.constraint_masks.get(key)
+        if mask is None:
+            mask = np.array([
+                child_node is not None and
+                child_node.state is State.up and
+                (not check_label or label in child_node.labels) and
+                (app.traits == 0 or child_node.traits.has(app.traits))
+                for child_node in self.children
+            ], dtype=bool)
+            self.constraint_masks[key] = mask
+
+        return mask
+
+    def _candidates(self, app):
+        """Return sorted indices of children that can possibly fit the app.
+
+        The free capacity of the children is kept in a matrix indexed by
+        child position, so the check is a single vectorized comparison.
+        """
+        if self.capacity_index is None:
+            self.capacity_index = np.zeros((len(self.children),
+                                            DIMENSION_COUNT))
+            for idx, child_node in enumerate(self.children):
+                if child_node is not None:
+                    self.capacity_index[idx] = child_node.free_capacity
+                    self.capacity_index_rows[child_node.name] = idx
+
+        fits = np.all(self.capacity_index >= app.demand, axis=1)
+        return np.flatnonzero(fits & self._constraint_mask(app))
+
     def put(self, app):
         """Try to put app on one of the nodes that belong to the bucket."""
         # Check if it is feasible to put app on some node low in the
@@ -722,26 +996,20 @@ class Bucket(Node):
             _LOGGER.debug('All nodes in the bucket deleted.')
             return False
 
-        nodename0 = node.name
-        first = True
-
-        while True:
-            # End of iteration.
-            if not first and node.name == nodename0:
-                _LOGGER.debug('Finished iterating on: %s.', self.name)
-                break
-            first = False
+        _LOGGER.debug('Trying node: %s:', node.name)
+        if node.state is not State.up:
+            _LOGGER.debug('Node not up: %s, %s', node.name, node.state)
+        elif node.put(app):
+            return True
 
+        # Suggested node did not fit, try only the rest of the children
+        # that pass the free capacity index.
+        for node in strategy.next_nodes(self._candidates(app)):
             _LOGGER.debug('Trying node: %s:', node.name)
+            if node.put(app):
+                return True
 
-            if node.state is not State.up:
-                _LOGGER.debug('Node not up: %s, %s', node.name, node.state)
-            else:
-                if node.put(app):
-                    return True
-
-            node = strategy.next_node()
-
+        _LOGGER.debug('Finished iterating on: %s.', self.name)
         return False
 
 
@@ -792,6 +1060,7 @@ class Server(Node):
         self.increment_affinity([app.affinity.name])
         app.server = self.name
         if self.parent:
+            self.parent.update_capacity_index(self)
             self.parent.adjust_capacity_down(prev_capacity)
 
         if app.placement_expiry is None:
@@ -844,6 +1113,7 @@ class Server(Node):
         self.decrement_affinity([app.affinity.name])
 
         if self.parent:
+            self.parent.update_capacity_index(self)
             self.parent.adjust_capacity_up(self.free_capacity)
 
     def remove_all(self):
@@ -862,6 +1132,14 @@ class Server(Node):
         """Return set of all leaf node names."""
         return {self.name: self}
 
+    def attach_capacity(self, store):
+        """Attach server free capacity to the capacity store."""
+        store.attach(self)
+
+    def detach_capacity(self, store):
+        """Detach server free capacity from the capacity store."""
+        store.detach(self)
+
     def set_state(self, state, since):
         """Change host state."""
         super(Server, self).set_state(state, since)
@@ -914,10 +1192,16 @@ class Allocation(object):
         'apps',
         'sub_allocations',
         'path',
+        'parent',
+        'dirty',
+        'queue_cache',
     )
 
     def __init__(self, reserved=None, rank=None, traits=None,
                  max_utilization=None):
+        self.parent = None
+        self.dirty = True
+        self.queue_cache = None
         self.set_reserved(reserved)
 
         self.rank = None
@@ -939,8 +1223,23 @@ class Allocation(object):
         """Returns full allocation name."""
         return '/'.join(self.path)
 
+    def mark_dirty(self):
+        """Mark allocation and all parent allocations as modified."""
+        self.queue_cache = None
+        alloc = self
+        while alloc is not None:
+            alloc.dirty = True
+            alloc = alloc.parent
+
+    def clear_dirty(self):
+        """Clear modified flag of the allocation and all sub-allocs."""
+        self.dirty = False
+        for alloc in self.sub_allocations.values():
+            alloc.clear_dirty()
+
     def set_reserved(self, reserved):
         """Update reserved capacity."""
+        self.mark_dirty()
         if reserved is None:
             self.reserved = zero_capacity()
         elif isinstance(reserved, int):
@@ -968,6 +1267,7 @@ class Allocation(object):
 
     def set_max_utilization(self, max_utilization):
         """Sets max_utilization, accounting for default None value."""
+        self.mark_dirty()
         if max_utilization is not None:
             self.max_utilization = max_utilization
         else:
@@ -975,6 +1275,7 @@ class Allocation(object):
 
     def set_traits(self, traits):
         """Set traits, account for default None value."""
+        self.mark_dirty()
         if not traits:
             self.traits = 0
         else:
@@ -993,12 +1294,106 @@ class Allocation(object):
 
         app.allocation = self
         self.apps[app.name] = app
+        self.mark_dirty()
 
     def remove(self, name):
         """Remove application from the allocation queue."""
         if name in self.apps:
             self.apps[name].allocation = None
             del self.apps[name]
+            self.mark_dirty()
+
+    def _priv_queue_cache(self):
+        """Returns apps with their demand, priority and order arrays.
+
+        Apps are sorted by priority, global order and name. The result is
+        cached until the allocation is modified or priority of the apps is
+        changed in place.
+        """
+        if self.queue_cache is not None:
+            apps, _demand, priority, _order = self.queue_cache
+            if not np.array_equal(
+                    priority, [app.priority for app in apps]):
+                self.queue_cache = None
+
+        if self.queue_cache is None:
+            apps = sorted(self.apps.values(),
+                          key=lambda app: (-app.priority, app.global_order,
+                                           app.name))
+            apps_arr = np.empty(len(apps), dtype=object)
+            apps_arr[:] = apps
+            demand = np.zeros((len(apps), DIMENSION_COUNT))
+            for idx, app in enumerate(apps):
+                demand[idx] = app.demand
+            self.queue_cache = (
+                apps_arr,
+                demand,
+                np.array([app.priority for app in apps], dtype=int),
+                np.array([app.global_order for app in apps], dtype=int),
+            )
+
+        return self.queue_cache
+
+    def _priv_queue_arrays(self):
+        """Returns local prioritization queue as tuple of arrays.
+
+        Apps are ordered by priority, state, global order and name, the
+        tuple is (rank, util, pending, order, priority, demand, apps).
+        """
+        apps, demand, priority, order = self._priv_queue_cache()
+
+        # All things equal, already scheduled applications have priority
+        # over pending.
+        pending = np.array([0 if app.server else 1 for app in apps],
+                           dtype=int)
+        idx = np.lexsort((pending, -priority))
+        apps, demand, priority, order, pending = (
+            apps[idx], demand[idx], priority[idx], order[idx], pending[idx]
+        )
+
+        available = self.reserved + np.finfo(float).eps
+        util = _utilization_cumulative(demand, priority, self.reserved,
+                                       available)
+
+        rank = np.where(util <= 0,
+                        self.rank - self.rank_adjustment,
+                        self.rank)
+        rank = np.where(util <= self.max_utilization - 1,
+                        rank,
+                        _UNPLACED_RANK)
+
+        return rank, util, pending, order, priority, demand, apps
+
+    def _utilization_queue_arrays(self, free_capacity):
+        """Returns utilization queue including sub-allocs as arrays."""
+        queues = [alloc._utilization_queue_arrays(free_capacity)
+                  for alloc in self.sub_allocations.values()]
+        queues.append(self._priv_queue_arrays())
+
+        rank, util, pending, order, priority, demand, apps = [
+            np.concatenate(column) for column in zip(*queues)
+        ]
+
+        # - lower rank allocations take precedence.
+        # - for same rank, utilization takes precedence
+        # - 0 < 1, so for apps with same utilization we prefer those that
+        #   already running (0 == not pending)
+        # - Global order
+        idx = _merge_order(
+            (priority, order, pending, util, rank),
+            [len(queue[0]) for queue in queues]
+        )
+        rank, pending, order, priority, demand, apps = (
+            rank[idx], pending[idx], order[idx], priority[idx],
+            demand[idx], apps[idx]
+        )
+
+        total_reserved = self.total_reserved()
+        available = total_reserved + free_capacity + np.finfo(float).eps
+        util = _utilization_cumulative(demand, priority, total_reserved,
+                                       available)
+
+        return rank, util, pending, order, priority, demand, apps
 
     def priv_utilization_queue(self):
         """Returns tuples for sorted by global utilization.
@@ -1012,36 +1407,11 @@ class Allocation(object):
         utilization ratio, so that this queue is suitable for merging into
         global priority queue.
         """
-        def app_key(app):
-            """Compares apps by priority, state, global index"""
-            return (-app.priority, 0 if app.server else 1,
-                    app.global_order, app.name)
-
-        acc_demand = zero_capacity()
-        prio_queue = sorted(self.apps.values(), key=app_key)
-
-        available = self.reserved + np.finfo(float).eps
-        for app in prio_queue:
-            acc_demand = acc_demand + app.demand
-            util = utilization(acc_demand, self.reserved, available)
-            # Priority 0 apps are treated specially - utilization is set to
-            # max float.
-            #
-            # This ensures that they are at the end of the all queues.
-            if app.priority == 0:
-                util = _MAX_UTILIZATION
-
-            # All things equal, already scheduled applications have priority
-            # over pending.
-            pending = 0 if app.server else 1
-            if util <= self.max_utilization - 1:
-                rank = self.rank
-                if util <= 0:
-                    rank -= self.rank_adjustment
-            else:
-                rank = _UNPLACED_RANK
-
-            yield (rank, util, pending, app.global_order, app)
+        rank, util, pending, order, _priority, _demand, apps = (
+            self._priv_queue_arrays()
+        )
+        return zip(rank.tolist(), util.tolist(), pending.tolist(),
+                   order.tolist(), apps)
 
     def utilization_queue(self, free_capacity):
         """Returns utilization queue including the sub-allocs.
@@ -1053,28 +1423,11 @@ class Allocation(object):
         The function maintains invariant that any app (self or inside sub-alloc
         with utilization < 1 will remain with utilzation < 1.
         """
-        total_reserved = self.total_reserved()
-        queues = [alloc.utilization_queue(free_capacity)
-                  for alloc in self.sub_allocations.values()]
-
-        queues.append(self.priv_utilization_queue())
-
-        acc_demand = zero_capacity()
-        available = total_reserved + free_capacity + np.finfo(float).eps
-
-        # FIXME: heapq.merge has an overhead of comparison
-        for item in heapq.merge(*queues):
-            rank, _util, pending, order, app = item
-            acc_demand = acc_demand + app.demand
-            util = utilization(acc_demand, total_reserved, available)
-            if app.priority == 0:
-                util = _MAX_UTILIZATION
-            # - lower rank allocations take precedence.
-            # - for same rank, utilization takes precedence
-            # - False < True, so for apps with same utilization we prefer
-            #   those that already running (False == not pending)
-            # - Global order
-            yield rank, util, pending, order, app
+        rank, util, pending, order, _priority, _demand, apps = (
+            self._utilization_queue_arrays(free_capacity)
+        )
+        return zip(rank.tolist(), util.tolist(), pending.tolist(),
+                   order.tolist(), apps)
 
     def total_reserved(self):
         """Total reserved capacity including sub-allocs."""
@@ -1087,11 +1440,15 @@ class Allocation(object):
         self.sub_allocations[name] = alloc
         assert not alloc.path
         alloc.path = self.path + [name]
+        alloc.parent = self
+        self.mark_dirty()
 
     def remove_sub_alloc(self, name):
         """Remove chlid allocation."""
         if name in self.sub_allocations:
+            self.sub_allocations[name].parent = None
             del self.sub_allocations[name]
+            self.mark_dirty()
 
     def get_sub_alloc(self, name):
         """Return sub allocation, create empty if it does not exist."""
@@ -1141,11 +1498,40 @@ class Cell(Bucket):
         'next_event_at',
         'apps',
         'identity_groups',
+        'capacity_store',
+        'servers',
+        'incremental',
+        'generation',
+        'partition_runs',
+        'last_full_schedule',
     )
 
-    def __init__(self, name, labels=None):
+    def __init__(self, name, labels=None, capacity_store=False,
+                 incremental=False):
         super(Cell, self).__init__(name, traits=0, level='cell')
 
+        # Index of all leaf servers by name, maintained as nodes are added
+        # and removed anywhere in the cell.
+        self.servers = dict()
+
+        # Optional contiguous store for all server capacities.
+        self.capacity_store = None
+        if capacity_store:
+            self.capacity_store = CapacityStore()
+
+        # In incremental mode, partitions that did not change since they were
+        # last scheduled are skipped. Change tracking is per partition: any
+        # change in a partition allocation tree (e.g. a new pending app)
+        # marks the whole partition for scheduling.
+        #
+        # Generation is incremented on every topology, server state and
+        # identity group change. For each partition, the result of the last
+        # run is recorded as (allocation, generation, fixed point, queue).
+        self.incremental = incremental
+        self.generation = 0
+        self.partition_runs = dict()
+        self.last_full_schedule = 0
+
         if not labels:
             labels = set()
 
@@ -1156,6 +1542,36 @@ class Cell(Bucket):
         self.identity_groups = collections.defaultdict(IdentityGroup)
         self.next_event_at = np.inf
 
+    def get_capacity_store(self):
+        """Returns cell capacity store."""
+        return self.capacity_store
+
+    def mark_dirty(self):
+        """Record topology/state change."""
+        super(Cell, self).mark_dirty()
+        self.generation += 1
+
+    def index_members(self, node):
+        """Add leaf servers of the node to the server index."""
+        self.servers.update(node.members())
+
+    def unindex_members(self, node):
+        """Remove leaf servers of the node from the server index."""
+        for servername in node.members():
+            self.servers.pop(servername, None)
+
+    def members(self):
+        """Return all leaf servers by name.
+
+        The index is maintained incrementally, callers must not modify it.
+        """
+        return self.servers
+
+    def reset_children(self):
+        """Reset children to empty list."""
+        super(Cell, self).reset_children()
+        self.servers = dict()
+
     def add_app(self, allocation, app):
         """Adds application to the scheduled list."""
         assert allocation is not None
@@ -1185,6 +1601,7 @@ class Cell(Bucket):
 
     def configure_identity_group(self, name, count):
         """Add identity group to the cell."""
+        self.mark_dirty()
         if name not in self.identity_groups:
             self.identity_groups[name] = IdentityGroup(count)
         else:
@@ -1192,6 +1609,7 @@ class Cell(Bucket):
 
     def remove_identity_group(self, name):
         """Remove identity group."""
+        self.mark_dirty()
         ident_group = self.identity_groups.get(name)
         if ident_group:
             in_use = False
@@ -1255,6 +1673,8 @@ class Cell(Bucket):
                         _LOGGER.debug('Expired placement: %s', name)
                         app.release_identity()
                         to_be_moved.append(name)
+                        if app.allocation:
+                            app.allocation.mark_dirty()
                     else:
                         _LOGGER.debug('Keep placement: %s until %s',
                                       name, expires_at)
@@ -1277,7 +1697,17 @@ class Cell(Bucket):
         evicted = dict()
         reversed_queue = queue[::-1]
 
+        # Apps at the head of the queue that are placed and valid are never
+        # modified (eviction only considers apps after the one being placed),
+        # so evaluation starts from the first app that needs attention.
+        start = 0
         for app in queue:
+            if (app.server is None or app.renew or
+                    app.final_rank == _UNPLACED_RANK):
+                break
+            start += 1
+
+        for app in itertools.islice(queue, start, None):
             _LOGGER.debug('scheduling %s', app.name)
 
             if app.final_rank == _UNPLACED_RANK:
@@ -1373,11 +1803,57 @@ class Cell(Bucket):
                 else:
                     app.release_identity()
 
+    def _can_skip(self, label, allocation):
+        """Check if partition allocation is unchanged since last run.
+
+        The partition can be skipped if nothing in the allocation tree or the
+        cell topology changed since it was last scheduled, the last run did
+        not change any placements, and there are no pending renewals or time
+        based events.
+
+        Granularity is the partition: a single change anywhere in the
+        partition allocation tree means its whole utilization queue is
+        rebuilt and replayed. Evictions depend on the order of the whole
+        queue, so individual apps are not re-evaluated on their own (see
+        `treadmill admin scheduler-bench --new-apps 1` for the cost of a
+        single new pending app).
+        """
+        if label not in self.partition_runs:
+            return False
+
+        prev_alloc, generation, fixed_point, queue = self.partition_runs[label]
+        if prev_alloc is not allocation or allocation.dirty:
+            return False
+
+        if generation != self.generation or not fixed_point:
+            return False
+
+        if time.time() >= self.next_event_at:
+            return False
+
+        return not any(app.renew for app in queue)
+
+    def _skip_alloc(self, label):
+        """Return unchanged placement of the partition skipped this run."""
+        _allocation, _generation, _fixed_point, queue = self.partition_runs[
+            label
+        ]
+        # Expired placements are handled in same order as in the full run.
+        self._handle_inactive_servers(self.members())
+
+        _LOGGER.info('Partition unchanged: %s, %d apps', label, len(queue))
+        return [(app.name, app.server, app.placement_expiry,
+                 app.server, app.placement_expiry)
+                for app in queue]
+
     def schedule_alloc(self, allocation):
         """Run the scheduler for given allocation."""
 
         begin = time.time()
 
+        generation = self.generation
+        allocation.clear_dirty()
+
         servers = self.members()
         size = self.size(allocation.label)
         util_queue = list(allocation.utilization_queue(size))
@@ -1403,24 +1879,64 @@ class Cell(Bucket):
         placement = [tuple(itertools.chain(b, a))
                      for b, a in zip(before, after)]
 
+        fixed_point = True
         for appname, s_before, exp_before, s_after, exp_after in placement:
             if s_before != s_after:
+                fixed_point = False
                 _LOGGER.info('New placement: %s - %s => %s',
                              appname, s_before, s_after)
             else:
                 if exp_before != exp_after:
+                    fixed_point = False
                     _LOGGER.info('Renewed: %s [%s] - %s => %s',
                                  appname, s_before, exp_before, exp_after)
 
+        self.partition_runs[allocation.label] = (
+            allocation, generation, fixed_point, queue
+        )
         return placement
 
-    def schedule(self):
-        """Run the scheduler."""
+    def schedule(self, full=None):
+        """Run the scheduler.
+
+        In incremental mode, only partitions that changed since last run are
+        scheduled, unless full run is requested or FULL_SCHEDULE_INTERVAL
+        passed since last full run. The full run also serves as consistency
+        check - partitions that would be skipped must remain unchanged.
+
+        Changed partitions are scheduled in full (see ``_can_skip``), only
+        the placed and valid apps at the head of their queue are passed over
+        by ``_find_placements``.
+        """
+        if full is None:
+            full = (not self.incremental or
+                    time.time() > (self.last_full_schedule +
+                                   FULL_SCHEDULE_INTERVAL))
+        if full:
+            self.last_full_schedule = time.time()
+
         placement = []
-        for label, partition in self.partitions.items():
+        for label, partition in list(self.partitions.items()):
             allocation = partition.allocation
             allocation.label = label
-            placement.extend(self.schedule_alloc(allocation))
+
+            can_skip = self.incremental and self._can_skip(label, allocation)
+            if can_skip and not full:
+                placement.extend(self._skip_alloc(label))
+                continue
+
+            alloc_placement = self.schedule_alloc(allocation)
+            if can_skip:
+                changed = [app for app, before, exp_before, after, exp_after
+                           in alloc_placement
+                           if before != after or exp_before != exp_after]
+                if changed:
+                    _LOGGER.critical(
+                        'Incremental schedule inconsistent: %s, %r',
+                        label, changed
+                    )
+            placement.extend(alloc_placement)
+
         return placement
 
     def resolve_reboot_conflicts(self):
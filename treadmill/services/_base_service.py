@@ -8,6 +8,7 @@ import errno
 import functools
 import glob
 import importlib
+import json
 import logging
 import os
 import select
@@ -39,11 +40,20 @@ _REQ_FILE = 'request.yml'
 _REP_FILE = 'reply.yml'
 #: Name of service status file
 _STATUS_SOCK = 'status.sock'
+#: Name of service request channel socket
+_REQUEST_SOCK = 'request.sock'
+#: Maximum size of a request channel message
+_MAX_MSG_SIZE = 64 * 1024
+#: Minimum interval between stale requests checks (seconds)
+_CHECK_REQUESTS_INTERVAL = 1
 
 
-def _wait_for_file(filename, timeout=60 * 60):
+def _wait_for_file(filename, watcher, timeout=60 * 60):
     """Wait at least ``timeout`` seconds for a file to appear or be modified.
 
+    :param ``DirWatcher`` watcher:
+        Watcher to use, the file directory is watched during the wait (reusing
+        the watcher, as closing inotify instances is slow).
     :param ``int`` timeout:
         Minimum amount of seconds to wait for the file.
     :returns ``bool``:
@@ -56,20 +66,23 @@ def _wait_for_file(filename, timeout=60 * 60):
         return os.path.exists(filename)
 
     filedir = os.path.dirname(filename)
-    # TODO: Fine tune the watcher mask for efficiency.
-    watcher = dirwatch.DirWatcher(filedir)
-
-    now = time.time()
-    end_time = now + timeout
-    while not os.path.exists(filename):
-        if watcher.wait_for_events(timeout=max(0, end_time - now)):
-            watcher.process_events()
+    watcher.add_dir(filedir)
 
+    try:
         now = time.time()
-        if now > end_time:
-            return False
+        end_time = now + timeout
+        while not os.path.exists(filename):
+            if watcher.wait_for_events(timeout=max(0, end_time - now)):
+                watcher.process_events()
+
+            now = time.time()
+            if now > end_time:
+                return False
+
+        return True
 
-    return True
+    finally:
+        watcher.remove_dir(filedir)
 
 
 class ResourceServiceError(exc.TreadmillError):
@@ -100,6 +113,100 @@ class ResourceServiceTimeoutError(ResourceServiceError, socket.timeout):
         super(ResourceServiceTimeoutError, self).__init__(message)
 
 
+class _RequestChannel(object):
+    """Client side of a service request channel.
+
+    The request files remain the durable record of the requests (replayed by
+    the service when it restarts) and their registration still triggers the
+    processing. Requests are sent through the channel before being registered,
+    so the service does not need to read the request file, and the replies are
+    sent back through the channel.
+    """
+
+    __slots__ = (
+        '_sock',
+        '_poll',
+        '_seq',
+        '_pending',
+        '_replies',
+    )
+
+    def __init__(self, request_sock):
+        self._sock = socket.socket(family=socket.AF_UNIX,
+                                   type=socket.SOCK_SEQPACKET,
+                                   proto=0)
+        try:
+            self._sock.connect(request_sock)
+        except socket.error:
+            self._sock.close()
+            raise
+        self._poll = select.poll()
+        self._poll.register(self._sock, select.POLLIN)
+        self._seq = 0
+        # Sequence number of the last request sent, by resource id
+        self._pending = {}
+        # Replies received, by sequence number
+        self._replies = {}
+
+    def send(self, rsrc_id, req_id, req_data):
+        """Send a request to the service (before registering it).
+
+        :raises ``socket.error``:
+            If the service is not reachable anymore.
+        """
+        self.discard(rsrc_id)
+        self._seq += 1
+        self._sock.send(
+            json.dumps({'id': req_id, 'seq': self._seq, 'data': req_data})
+            .encode()
+        )
+        self._pending[rsrc_id] = self._seq
+
+    def discard(self, rsrc_id):
+        """Forget about a request and its reply.
+        """
+        seq = self._pending.pop(rsrc_id, None)
+        self._replies.pop(seq, None)
+
+    def wait(self, rsrc_id, timeout):
+        """Wait at least ``timeout`` seconds for the reply to a request.
+
+        :returns ``dict``:
+            The reply or ``None`` if it is not available through the channel
+            (timeout, not sent through the channel, etc). The reply file should
+            be checked instead.
+        :raises ``socket.error``:
+            If the service is not reachable anymore.
+        """
+        seq = self._pending.get(rsrc_id)
+        if seq is None:
+            return None
+
+        end_time = time.time() + timeout
+        while seq not in self._replies:
+            # poll timeout is in milliseconds
+            if not self._poll.poll(max(0, end_time - time.time()) * 1000):
+                return None
+
+            msg = self._sock.recv(_MAX_MSG_SIZE)
+            if not msg:
+                raise socket.error(errno.ECONNRESET,
+                                   'Request channel closed by the service')
+
+            reply = json.loads(msg.decode())
+            if reply['seq'] in self._pending.values():
+                self._replies[reply['seq']] = reply
+
+        del self._pending[rsrc_id]
+        # Replies which do not fit in a message are only in the reply file.
+        return self._replies.pop(seq).get('reply')
+
+    def close(self):
+        """Close the channel.
+        """
+        self._sock.close()
+
+
 class ResourceServiceClient(object):
     """Client class for all Treadmill services.
 
@@ -107,6 +214,10 @@ class ResourceServiceClient(object):
         request.yml
         reply.yml
         svc_req_id
+
+    With ``use_channel``, requests are also sent through the service request
+    channel (if the service is reachable), replies are then received without
+    watching the request directory.
     """
 
     _REQ_UID_FILE = 'svc_req_id'
@@ -114,12 +225,18 @@ class ResourceServiceClient(object):
     __slots__ = (
         '_serviceinst',
         '_clientdir',
+        '_use_channel',
+        '_channel',
+        '_watcher',
     )
 
-    def __init__(self, serviceinst, clientdir):
+    def __init__(self, serviceinst, clientdir, use_channel=True):
         self._serviceinst = serviceinst
         fs.mkdir_safe(clientdir)
         self._clientdir = os.path.realpath(clientdir)
+        self._use_channel = use_channel
+        self._channel = None
+        self._watcher = None
 
     def put(self, rsrc_id, rsrc_data):
         """Request creation/update of a resource.
@@ -136,6 +253,35 @@ class ResourceServiceClient(object):
         else:
             self._update(rsrc_id, rsrc_data, req_dir)
 
+    def _send(self, rsrc_id, svc_req_uuid, rsrc_data):
+        """Send the request through the service request channel, if enabled
+        and possible.
+        """
+        if not self._use_channel:
+            return
+
+        if self._channel is None:
+            try:
+                self._channel = _RequestChannel(
+                    self._serviceinst.request_sock
+                )
+            except socket.error as err:
+                _LOGGER.debug('Request channel not available: %s', err)
+                return
+
+        try:
+            self._channel.send(rsrc_id, svc_req_uuid, rsrc_data)
+        except socket.error as err:
+            _LOGGER.warning('Request channel failed: %s', err)
+            self._close_channel()
+
+    def _close_channel(self):
+        """Close the service request channel (replies are then read from the
+        request directory).
+        """
+        self._channel.close()
+        self._channel = None
+
     def _create(self, rsrc_id, rsrc_data, req_dir):
         """Request creation of a resource.
         """
@@ -146,6 +292,9 @@ class ResourceServiceClient(object):
                       default_flow_style=False,
                       stream=f)
 
+        # The request is registered under its resource id.
+        self._send(rsrc_id, rsrc_id, rsrc_data)
+
         with lc.LogContext(_LOGGER, rsrc_id):
             try:
                 svc_req_uuid = self._serviceinst.clt_new_request(rsrc_id,
@@ -174,6 +323,8 @@ class ResourceServiceClient(object):
                       default_flow_style=False,
                       stream=f)
 
+        self._send(rsrc_id, svc_req_uuid, rsrc_data)
+
         with lc.LogContext(_LOGGER, rsrc_id):
             self._serviceinst.clt_update_request(svc_req_uuid)
 
@@ -193,6 +344,8 @@ class ResourceServiceClient(object):
                     log.logger.warning('Resource %r does not exist', rsrc_id)
                     return
                 raise
+            if self._channel is not None:
+                self._channel.discard(rsrc_id)
             self._serviceinst.clt_del_request(svc_req_uuid)
             os.rename(
                 req_dir,
@@ -223,10 +376,31 @@ class ResourceServiceClient(object):
         :raises ``ResourceServiceTimeoutError``:
             If the request was not available before timeout.
         """
+        if timeout is None:
+            timeout = 60 * 60
+
+        if self._channel is not None:
+            end_time = time.time() + timeout
+            try:
+                reply = self._channel.wait(rsrc_id, timeout)
+            except socket.error as err:
+                _LOGGER.warning('Request channel failed: %s', err)
+                self._close_channel()
+                reply = None
+
+            if reply is not None:
+                return self._check_reply(reply)
+
+            # Fallback to the reply file for the remaining time.
+            timeout = max(0, end_time - time.time())
+
         req_dir = self._req_dirname(rsrc_id)
         rep_file = os.path.join(req_dir, _REP_FILE)
 
-        if not _wait_for_file(rep_file, timeout):
+        if self._watcher is None and timeout:
+            self._watcher = dirwatch.DirWatcher()
+
+        if not _wait_for_file(rep_file, self._watcher, timeout):
             raise ResourceServiceTimeoutError(
                 'Resource %r not available in time' % rsrc_id
             )
@@ -241,6 +415,12 @@ class ResourceServiceClient(object):
                     'Resource %r not available in time' % rsrc_id
                 )
 
+        return self._check_reply(reply)
+
+    @staticmethod
+    def _check_reply(reply):
+        """Raise the error reported in a reply, if any.
+        """
         if isinstance(reply, dict) and '_error' in reply:
             raise ResourceServiceRequestError(reply['_error']['why'],
                                               reply['_error']['input'])
@@ -298,6 +478,10 @@ class ResourceService(object):
         '_service_class',
         '_service_name',
         '_io_eventfd',
+        '_request_socket',
+        '_channels',
+        '_channels_poll',
+        '_announced',
     )
 
     _IO_EVENT_PENDING = struct.pack('@Q', 1)
@@ -311,6 +495,12 @@ class ResourceService(object):
         self._service_impl = impl
         self._service_class = None
         self._io_eventfd = None
+        self._request_socket = None
+        # Connected request channels, by fd
+        self._channels = {}
+        self._channels_poll = None
+        # Requests sent through the request channels, not registered yet
+        self._announced = {}
         # Figure out the service's name
         if isinstance(self._service_impl, str):
             svc_name = self._service_impl.rsplit('.', 1)[-1]
@@ -329,10 +519,17 @@ class ResourceService(object):
         """
         return os.path.join(self._dir, _STATUS_SOCK)
 
-    def make_client(self, client_dir):
+    @property
+    def request_sock(self):
+        """request channel socket of the service.
+        """
+        return os.path.join(self._dir, _REQUEST_SOCK)
+
+    def make_client(self, client_dir, use_channel=True):
         """Create a client using `clientdir` as request dir location.
         """
-        return ResourceServiceClient(self, client_dir)
+        return ResourceServiceClient(self, client_dir,
+                                     use_channel=use_channel)
 
     def status(self, timeout=30):
         """Query the status of the resource service.
@@ -404,6 +601,10 @@ class ResourceService(object):
 
         # Create the status socket
         ss = self._create_status_socket()
+        # Create the request channel socket
+        self._request_socket = self._create_request_socket()
+        self._channels_poll = select.epoll()
+        self._channels_poll.register(self._request_socket, select.EPOLLIN)
 
         # Run initialization
         impl.initialize(self._dir)
@@ -462,6 +663,11 @@ class ResourceService(object):
                     status_info=status_info,
                 )
             ),
+            (
+                self._channels_poll,
+                select.POLLIN,
+                self._handle_channels,
+            ),
         ]
         # Initial collection of implementation' event handlers
         impl_event_handlers = impl.event_handlers()
@@ -473,6 +679,7 @@ class ResourceService(object):
         )
 
         loop_timeout = impl.WATCHDOG_HEARTBEAT_SEC / 2
+        last_check = time.time()
         while not self._is_dead:
 
             # Check for events
@@ -494,8 +701,11 @@ class ResourceService(object):
                     base_event_handlers + impl_event_handlers,
                 )
 
-            # Clean up stale requests
-            self._check_requests()
+            # Clean up stale requests (not on every cycle, this lists all the
+            # requests)
+            if time.time() - last_check >= _CHECK_REQUESTS_INTERVAL:
+                self._check_requests()
+                last_check = time.time()
 
             # Heartbeat
             watchdog_lease.heartbeat()
@@ -521,6 +731,104 @@ class ResourceService(object):
                 else:
                     raise
 
+    def _accept_channels(self):
+        """Accept the new request channel connections.
+        """
+        while True:
+            try:
+                conn, _addr = self._request_socket.accept()
+            except socket.error as err:
+                if err.errno == errno.EAGAIN:
+                    return
+                raise
+
+            self._channels[conn.fileno()] = conn
+            self._channels_poll.register(conn.fileno(), select.EPOLLIN)
+            _LOGGER.debug('Request channel %r connected', conn.fileno())
+
+    def _close_channel(self, conn):
+        """Close a request channel connection.
+        """
+        _LOGGER.debug('Request channel %r closed', conn.fileno())
+        self._channels_poll.unregister(conn.fileno())
+        del self._channels[conn.fileno()]
+        conn.close()
+        # Its requests will be read from the request files.
+        for req_id, announced in list(self._announced.items()):
+            if announced[0] is conn:
+                del self._announced[req_id]
+
+    def _handle_channels(self):
+        """Accept the new request channels and receive the requests sent
+        through them.
+
+        They are processed once registered (on the request directory event).
+        """
+        self._accept_channels()
+        for (fd, _event) in self._channels_poll.poll(0):
+            # Skip the request socket and channels closed in the meantime.
+            if fd in self._channels:
+                self._receive_requests(self._channels[fd])
+
+        return False
+
+    def _pop_announced(self, req_id):
+        """Get the request sent through a request channel, if any.
+
+        :returns ``tuple``:
+            Request channel connection, request sequence number and data
+            (``None`` if the request was not sent through a channel).
+        """
+        if req_id not in self._announced and self._channels_poll is not None:
+            # Requests are sent before being registered, it was received
+            # already if sent through a channel.
+            self._handle_channels()
+
+        return self._announced.pop(req_id, (None, None, None))
+
+    def _receive_requests(self, conn):
+        """Receive the requests sent through a request channel.
+        """
+        while True:
+            try:
+                msg = conn.recv(_MAX_MSG_SIZE, socket.MSG_DONTWAIT)
+            except socket.error as err:
+                if err.errno == errno.EAGAIN:
+                    return
+                msg = None
+
+            if not msg:
+                self._close_channel(conn)
+                return
+
+            try:
+                request = json.loads(msg.decode())
+                self._announced[request['id']] = (
+                    conn, request['seq'], request['data']
+                )
+            except (ValueError, KeyError, TypeError):
+                _LOGGER.error('Invalid request channel message: %r', msg)
+
+    def _send_reply(self, conn, req_id, seq, res):
+        """Send the reply of a request through its request channel.
+        """
+        try:
+            reply = json.dumps({'id': req_id, 'seq': seq, 'reply': res})
+        except (TypeError, ValueError):
+            reply = None
+
+        if reply is None or len(reply) > _MAX_MSG_SIZE:
+            # The client reads the reply file instead.
+            reply = json.dumps({'id': req_id, 'seq': seq})
+
+        try:
+            conn.send(reply.encode(), socket.MSG_DONTWAIT)
+        except socket.error as err:
+            # Client gone or not reading its replies, it will fallback to the
+            # reply files.
+            _LOGGER.warning('Unable to reply to %r: %s', req_id, err)
+            self._close_channel(conn)
+
     @staticmethod
     def _run_events(loop_poll, loop_timeout, loop_callbacks):
         """Wait for events up to `loop_timeout` and execute each of the
@@ -671,6 +979,21 @@ class ResourceService(object):
 
         return svcs
 
+    def _create_request_socket(self):
+        """Create a listening socket for the request channels.
+        """
+        fs.rm_safe(self.request_sock)
+        request_socket = socket.socket(
+            family=socket.AF_UNIX,
+            type=socket.SOCK_SEQPACKET,
+            proto=0
+        )
+        request_socket.bind(self.request_sock)
+        os.chmod(self.request_sock, 0o600)
+        request_socket.listen(128)
+        request_socket.setblocking(False)
+        return request_socket
+
     def _create_status_socket(self):
         """Create a listening socket to process status requests.
         """
@@ -739,9 +1062,14 @@ class ResourceService(object):
         req_file = os.path.join(filepath, _REQ_FILE)
         rep_file = os.path.join(filepath, _REP_FILE)
 
+        (conn, seq, req_data) = self._pop_announced(req_id)
         try:
-            with open(req_file) as f:
-                req_data = yaml.load(stream=f)
+            if conn is None:
+                with open(req_file) as f:
+                    req_data = yaml.load(stream=f)
+            else:
+                # Check that the request is still there.
+                os.stat(req_file)
 
         except IOError as err:
             if (err.errno == errno.ENOENT or
@@ -780,6 +1108,9 @@ class ResourceService(object):
                       stream=f)
 
         os.rename(f.name, rep_file)
+        if conn is not None:
+            self._send_reply(conn, req_id, seq, res)
+
         # Return True if there were no error
         return not bool(res.get('_error', False))
 
@@ -84,7 +84,7 @@ class NetworkResourceService(BaseResourceServiceImpl):
             netdev.link_set_up(self._TM_DEV1)
             netdev.link_set_up(self._TMBR_DEV)
 
-        except subprocess.CalledProcessError:
+        except (subprocess.CalledProcessError, OSError):
             need_init = True
 
         if need_init:
@@ -175,18 +175,20 @@ class NetworkResourceService(BaseResourceServiceImpl):
                 # VIPs allocation (the owner is the resource link)
                 ip = self._vips.alloc(rsrc_id)
 
-                # Create the interface pair
-                netdev.link_add_veth(veth0, veth1)
-                # Configure the links
-                netdev.link_set_mtu(veth0, self.ext_mtu)
-                netdev.link_set_mtu(veth1, self.ext_mtu)
-                # Tag the interfaces
-                netdev.link_set_alias(veth0, rsrc_id)
-                netdev.link_set_alias(veth1, rsrc_id)
-                # Add interface to the bridge
-                netdev.bridge_addif(self._TMBR_DEV, veth0)
-                netdev.link_set_up(veth0)
-                # We keep veth1 down until inside the container
+                # Setup the interface pair in a single netlink request
+                with netdev.batch():
+                    # Create the interface pair
+                    netdev.link_add_veth(veth0, veth1)
+                    # Configure the links
+                    netdev.link_set_mtu(veth0, self.ext_mtu)
+                    netdev.link_set_mtu(veth1, self.ext_mtu)
+                    # Tag the interfaces
+                    netdev.link_set_alias(veth0, rsrc_id)
+                    netdev.link_set_alias(veth1, rsrc_id)
+                    # Add interface to the bridge
+                    netdev.bridge_addif(self._TMBR_DEV, veth0)
+                    netdev.link_set_up(veth0)
+                    # We keep veth1 down until inside the container
             else:
                 # Re-read what IP we assigned before
                 ip = self._devices[app_unique_name]['ip']
@@ -223,7 +225,7 @@ class NetworkResourceService(BaseResourceServiceImpl):
                 netdev.link_del_veth(veth)
 
             except (OSError, IOError) as err:
-                if err.errno != errno.ENOENT:
+                if err.errno not in (errno.ENOENT, errno.ENODEV):
                     raise
 
             # Remove it from our state (if present)
@@ -247,19 +249,19 @@ class NetworkResourceService(BaseResourceServiceImpl):
             #                 bridge.
             netdev.link_set_down(self._TM_DEV0)
             netdev.bridge_delete(self._TM_DEV0)
-        except subprocess.CalledProcessError:
+        except (subprocess.CalledProcessError, OSError):
             pass
 
         try:
             netdev.link_set_down(self._TM_DEV0)
             netdev.link_del_veth(self._TM_DEV0)
-        except subprocess.CalledProcessError:
+        except (subprocess.CalledProcessError, OSError):
             pass
 
         try:
             netdev.link_set_down(self._TMBR_DEV)
             netdev.bridge_delete(self._TMBR_DEV)
-        except subprocess.CalledProcessError:
+        except (subprocess.CalledProcessError, OSError):
             pass
 
         netdev.bridge_create(self._TMBR_DEV)
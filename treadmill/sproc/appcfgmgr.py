@@ -12,9 +12,11 @@ def init():
     @click.command()
     @click.option('--approot', type=click.Path(exists=True),
                   envvar='TREADMILL_APPROOT', required=True)
-    def top(approot):
+    @click.option('--workers', type=click.IntRange(1, 64), default=4,
+                  help='Number of apps configured concurrently.')
+    def top(approot, workers):
         """Starts appcfgmgr process."""
-        mgr = appcfgmgr.AppCfgMgr(root=approot)
+        mgr = appcfgmgr.AppCfgMgr(root=approot, workers=workers)
         mgr.run()
 
     return top
@@ -9,7 +9,6 @@ import time
 
 import click
 import ldap3
-import yaml
 
 from treadmill import context
 from treadmill import exc
@@ -90,11 +89,11 @@ def reevaluate(instance_api, state):
                 success = False
 
         elif count < current_count:
-            for extra in grouped[name][:current_count - count]:
-                try:
-                    instance_api.delete(extra)
-                except Exception:  # pylint: disable=W0703
-                    _LOGGER.exception('Unable to delete instance: %r', extra)
+            extra = grouped[name][:current_count - count]
+            try:
+                instance_api.bulk_delete(extra)
+            except Exception:  # pylint: disable=W0703
+                _LOGGER.exception('Unable to delete instances: %r', extra)
 
     return success
 
@@ -141,7 +140,7 @@ def _run_sync():
                 return False
 
             try:
-                count = yaml.load(data)['count']
+                count = zkutils.loads(data)['count']
             except Exception:  # pylint: disable=W0703
                 _LOGGER.exception('Invalid monitor: %r', name)
                 return False
@@ -13,7 +13,6 @@ updated in Zookeeper.
 """
 
 
-import functools
 import logging
 import os
 import socket
@@ -34,11 +33,6 @@ from .. import rulefile
 from .. import utils
 from .. import watchdog
 
-
-# R0915: Need to refactor long function into smaller pieces.
-#
-# pylint: disable=R0915
-
 _LOGGER = logging.getLogger(__name__)
 
 _DEFAULT_RULES_DIR = 'rules'
@@ -85,65 +79,107 @@ def _update_nodes_change(data):
         iptables.destroy_set(new_set)
 
 
-def _configure_rules(target):
-    """Configures iptables rules.
+#: NAT chains managed by the firewall watcher.
+_NAT_CHAINS = (
+    iptables.PREROUTING_DNAT,
+    iptables.POSTROUTING_SNAT,
+    iptables.PREROUTING_PASSTHROUGH,
+    iptables.VRING_DNAT,
+    iptables.VRING_SNAT,
+)
 
-    The input to the function is target state - a list of (chain, rule) tuples
-    that needs to be present.
 
-    The function will sync existing iptables configuration with the target
-    state, by adding/removing extra rules.
+class _RuleEngine(object):
+    """Desired NAT rules and passthrough IPs, applied in batches.
 
-    :param ``[tuple(chain, Tuple)]`` target:
-        Desired set of rules
+    Rule file events only update the in-memory state, ``apply`` then loads
+    the changed chains with one `iptables-restore` and the passthrough IPSet
+    changes with one `ipset restore`.
     """
-    chain_configure_callbacks = {
-        iptables.PREROUTING_DNAT:
-            functools.partial(
-                iptables.configure_dnat_rules,
-                chain=iptables.PREROUTING_DNAT
-            ),
-        iptables.POSTROUTING_SNAT:
-            functools.partial(
-                iptables.configure_snat_rules,
-                chain=iptables.POSTROUTING_SNAT
-            ),
-        iptables.PREROUTING_PASSTHROUGH:
-            functools.partial(
-                iptables.configure_passthrough_rules,
-                chain=iptables.PREROUTING_PASSTHROUGH
-            ),
-        iptables.VRING_DNAT:
-            functools.partial(
-                iptables.configure_dnat_rules,
-                chain=iptables.VRING_DNAT
-            ),
-        iptables.VRING_SNAT:
-            functools.partial(
-                iptables.configure_snat_rules,
-                chain=iptables.VRING_SNAT
-            ),
-    }
-    for chain in chain_configure_callbacks:
-        iptables.create_chain('nat', chain)
-
-    chain_rules = {}
-    for chain, rule in target:
-        chain_rules.setdefault(chain, set()).add(rule)
-
-    for chain, rules in chain_rules.items():
-        if chain in chain_configure_callbacks:
-            chain_configure_callbacks[chain](rules)
 
-        else:
+    __slots__ = (
+        'chain_rules',
+        'passthrough',
+        '_changed_chains',
+        '_ipset_changes',
+    )
+
+    def __init__(self):
+        self.chain_rules = {chain: set() for chain in _NAT_CHAINS}
+        self.passthrough = {}
+        self._changed_chains = set()
+        self._ipset_changes = []
+
+    def add_rule(self, chain, rule):
+        """Add rule to the desired state."""
+        if chain not in self.chain_rules:
             raise ValueError('Unknown rule chain %r' % chain)
 
+        rules = self.chain_rules[chain]
+        if rule in rules:
+            return
+
+        rules.add(rule)
+        self._changed_chains.add(chain)
+
+        if isinstance(rule, fw.PassThroughRule):
+            count = self.passthrough.get(rule.src_ip, 0)
+            self.passthrough[rule.src_ip] = count + 1
+            if count == 0:
+                _LOGGER.info('Adding passthrough %r', rule.src_ip)
+                self._ipset_changes.append(
+                    ('add', iptables.SET_PASSTHROUGHS, rule.src_ip)
+                )
+
+    def delete_rule(self, chain, rule):
+        """Remove rule from the desired state."""
+        rules = self.chain_rules.get(chain)
+        if not rules or rule not in rules:
+            return
+
+        rules.remove(rule)
+        self._changed_chains.add(chain)
+
+        if isinstance(rule, fw.PassThroughRule):
+            if self.passthrough[rule.src_ip] == 1:
+                # Remove the IPs from the passthrough set
+                self.passthrough.pop(rule.src_ip)
+                _LOGGER.info('Removing passthrough %r', rule.src_ip)
+                self._ipset_changes.append(
+                    ('del', iptables.SET_PASSTHROUGHS, rule.src_ip)
+                )
+            else:
+                self.passthrough[rule.src_ip] -= 1
+
+    def apply(self, all_chains=False):
+        """Apply pending changes.
+
+        :param ``bool`` all_chains:
+            Replace all the chains, not only the changed ones.
+        """
+        if all_chains:
+            self._changed_chains.update(self.chain_rules)
+
+        if not self._changed_chains and not self._ipset_changes:
+            return
+
+        start_time = time.time()
+        iptables.configure_nat_chains({
+            chain: self.chain_rules[chain]
+            for chain in self._changed_chains
+        })
+        iptables.ipset_update(self._ipset_changes)
+
+        _LOGGER.info('Applied %d chains, %d passthrough changes in %.3fs',
+                     len(self._changed_chains), len(self._ipset_changes),
+                     time.time() - start_time)
+        self._changed_chains.clear()
+        self._ipset_changes = []
+
 
 def _watcher(root_dir, rules_dir, containers_dir, watchdogs_dir):
     """Treadmill Firewall rule watcher.
     """
-    # Too many branches
-    # pylint: disable=R0912
     rules_dir = os.path.join(root_dir, rules_dir)
     containers_dir = os.path.join(root_dir, containers_dir)
     watchdogs_dir = os.path.join(root_dir, watchdogs_dir)
@@ -157,7 +193,7 @@ def _watcher(root_dir, rules_dir, containers_dir, watchdogs_dir):
     )
 
     rulemgr = rulefile.RuleMgr(rules_dir, containers_dir)
-    passthrough = {}
+    engine = _RuleEngine()
 
     def on_created(path):
         """Invoked when a network rule is created."""
@@ -167,13 +203,7 @@ def _watcher(root_dir, rules_dir, containers_dir, watchdogs_dir):
         chain_rule = rulemgr.get_rule(rule_file)
         if chain_rule is not None:
             chain, rule = chain_rule
-            iptables.add_rule(rule, chain=chain)
-            if isinstance(rule, fw.PassThroughRule):
-                passthrough[rule.src_ip] = (
-                    passthrough.setdefault(rule.src_ip, 0) + 1
-                )
-                _LOGGER.info('Adding passthrough %r', rule.src_ip)
-                iptables.add_ip_set(iptables.SET_PASSTHROUGHS, rule.src_ip)
+            engine.add_rule(chain, rule)
         else:
             _LOGGER.warning('Ignoring unparseable rule %r', rule_file)
 
@@ -192,43 +222,29 @@ def _watcher(root_dir, rules_dir, containers_dir, watchdogs_dir):
         chain_rule = rulemgr.get_rule(rule_file)
         if chain_rule is not None:
             chain, rule = chain_rule
-            iptables.delete_rule(rule, chain=chain)
-            if isinstance(rule, fw.PassThroughRule):
-                if passthrough[rule.src_ip] == 1:
-                    # Remove the IPs from the passthrough set
-                    passthrough.pop(rule.src_ip)
-                    _LOGGER.info('Removing passthrough %r', rule.src_ip)
-                    iptables.rm_ip_set(iptables.SET_PASSTHROUGHS, rule.src_ip)
-                else:
-                    passthrough[rule.src_ip] -= 1
-
+            engine.delete_rule(chain, rule)
         else:
             _LOGGER.warning('Ignoring unparseable file %r', rule_file)
 
     _LOGGER.info('Monitoring dnat changes in %r', rulemgr.path)
-    watch = dirwatch.DirWatcher(rulemgr.path)
+    watch = dirwatch.DirWatcher(rulemgr.path, close_write=True)
     watch.on_created = on_created
     watch.on_deleted = on_deleted
 
     # now that we are watching, prime the rules
     current_rules = rulemgr.get_rules()
+    for chain, rule in current_rules:
+        engine.add_rule(chain, rule)
     # Bulk apply rules
-    _configure_rules(current_rules)
-
-    for _chain, rule in current_rules:
-        if isinstance(rule, fw.PassThroughRule):
-            passthrough[rule.src_ip] = (
-                passthrough.setdefault(rule.src_ip, 0) + 1
-            )
-            # Add the IPs to the passthrough set
-            _LOGGER.info('Adding passthrough %r', rule.src_ip)
-            iptables.add_ip_set(iptables.SET_PASSTHROUGHS, rule.src_ip)
+    engine.apply(all_chains=True)
 
     _LOGGER.info('Current rules: %r', current_rules)
     while True:
         if watch.wait_for_events(timeout=_FW_WATCHER_HEARTBEAT):
-            # Process no more than 5 events between heartbeats
-            watch.process_events(max_events=5)
+            # Drain all pending events, then apply them in one batch.
+            while watch.wait_for_events(timeout=0):
+                watch.process_events()
+            engine.apply()
 
         rulemgr.garbage_collect()
         wd.heartbeat()
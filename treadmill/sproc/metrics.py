@@ -3,12 +3,16 @@
 Collects Treadmill metrics and sends them to Graphite.
 """
 
+import concurrent.futures
 import glob
 import logging
 import os
+import subprocess
+import tempfile
 import time
 
 import click
+import yaml
 
 from treadmill import appenv
 from treadmill import exc
@@ -17,8 +21,15 @@ from treadmill import rrdutils
 from treadmill.metrics import rrd
 
 #: Metric collection interval (every X seconds)
-_METRIC_STEP_SEC_MIN = 15
+_METRIC_STEP_SEC_MIN = 5
 _METRIC_STEP_SEC_MAX = 300
+_METRIC_STEP_SEC_DEFAULT = 15
+
+#: Number of threads reading cgroup metrics
+_SAMPLER_THREADS = 8
+
+#: Collector cycle statistics file (in the metrics dir)
+_COLLECTOR_STATS = 'collector.yml'
 
 
 _LOGGER = logging.getLogger(__name__)
@@ -32,6 +43,78 @@ def _core_svcs(root_dir):
         if not (s.endswith('.out') or s.endswith('.err'))])
 
 
+class _Sampler(object):
+    """Reads cgroup metrics concurrently.
+
+    The last values written to each rrd file are kept in memory, so the rrd
+    daemon is only asked for them (`rrdtool lastupdate`) once per file.
+    """
+
+    __slots__ = (
+        '_pool',
+        '_last',
+    )
+
+    def __init__(self, workers=_SAMPLER_THREADS):
+        self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+        self._last = {}
+
+    def reset(self, rrdfile):
+        """Mark rrdfile as (re)created, with no previous values."""
+        self._last[rrdfile] = {}
+
+    def forget(self, rrdfile):
+        """Forget the last values of rrdfile."""
+        self._last.pop(rrdfile, None)
+
+    def _sample(self, target):
+        """Sample a single cgroup."""
+        rrdfile, cgrp, sys_maj_min, block_dev = target
+        rrd_last = self._last.get(rrdfile)
+        if rrd_last is None:
+            try:
+                rrd_last = rrdutils.lastupdate(rrdfile)
+            except subprocess.CalledProcessError:
+                _LOGGER.warning('Unable to read last update of %s', rrdfile)
+                rrd_last = {}
+
+        return rrd.sample(cgrp, rrd_last, sys_maj_min, block_dev)
+
+    def collect(self, targets):
+        """Sample all the targets.
+
+        :param targets:
+            List of (rrdfile, cgrp, sys_maj_min, block_dev) tuples.
+        :returns:
+            List of (rrdfile, data, timestamp) rrd updates.
+        """
+        updates = []
+        samples = self._pool.map(self._sample, targets)
+        for target, data in zip(targets, samples):
+            rrdfile = target[0]
+            if data is None:
+                continue
+
+            self._last[rrdfile] = {
+                'cpu_total': data['cputotal'],
+                'timestamp': data['timestamp'],
+            }
+            updates.append((rrdfile, data, data['timestamp']))
+
+        return updates
+
+
+def _write_stats(path, stats):
+    """Publish the collector cycle statistics."""
+    with tempfile.NamedTemporaryFile(dir=os.path.dirname(path),
+                                     prefix='.tmp',
+                                     delete=False,
+                                     mode='w') as f:
+        yaml.dump(stats, stream=f, default_flow_style=False)
+        os.fchmod(f.fileno(), 0o644)
+    os.rename(f.name, path)
+
+
 def init():
     """Top level command handler."""
 
@@ -42,7 +125,7 @@ def init():
     @click.option('--step', '-s',
                   type=click.IntRange(_METRIC_STEP_SEC_MIN,
                                       _METRIC_STEP_SEC_MAX),
-                  default=_METRIC_STEP_SEC_MIN,
+                  default=_METRIC_STEP_SEC_DEFAULT,
                   help='Metrics collection frequency (sec)')
     @click.option('--approot', type=click.Path(exists=True),
                   envvar='TREADMILL_APPROOT', required=True)
@@ -54,10 +137,18 @@ def init():
         core_metrics_dir = os.path.join(tm_env.metrics_dir, 'core')
         fs.mkdir_safe(app_metrics_dir)
         fs.mkdir_safe(core_metrics_dir)
+        stats_file = os.path.join(tm_env.metrics_dir, _COLLECTOR_STATS)
 
         interval = int(step) * 2
 
         rrdclient = rrdutils.RRDClient('/tmp/treadmill.rrd')
+        sampler = _Sampler()
+
+        def _ensure_rrd(rrdfile):
+            """Create the rrd file if it does not exist."""
+            if not os.path.exists(rrdfile):
+                rrdclient.create(rrdfile, step, interval)
+                sampler.reset(rrdfile)
 
         # Initiate the list for monitored applications
         monitored_apps = set(
@@ -75,33 +166,22 @@ def init():
         _LOGGER.info('Device %s maj:min = %s for approot: %s', sys_block_dev,
                      sys_maj_min, approot)
 
-        core_rrds = ['treadmill.apps.rrd',
-                     'treadmill.core.rrd',
-                     'treadmill.system.rrd']
-
-        for core_rrd in core_rrds:
-            rrdfile = os.path.join(core_metrics_dir, core_rrd)
-            if not os.path.exists(rrdfile):
-                rrdclient.create(rrdfile, step, interval)
+        core_rrds = [('treadmill.apps.rrd', 'treadmill/apps'),
+                     ('treadmill.core.rrd', 'treadmill/core'),
+                     ('treadmill.system.rrd', 'treadmill')]
 
+        next_cycle = time.time()
         while True:
             starttime_sec = time.time()
-            rrd.update(
-                rrdclient,
-                os.path.join(core_metrics_dir, 'treadmill.apps.rrd'),
-                'treadmill/apps', sys_maj_min, sys_block_dev
-            )
-            rrd.update(
-                rrdclient,
-                os.path.join(core_metrics_dir, 'treadmill.core.rrd'),
-                'treadmill/core', sys_maj_min, sys_block_dev
-            )
-            rrd.update(
-                rrdclient,
-                os.path.join(core_metrics_dir, 'treadmill.system.rrd'),
-                'treadmill', sys_maj_min, sys_block_dev
-            )
-            count = 3
+            # How late this cycle started compared to its schedule.
+            skew = starttime_sec - next_cycle
+
+            targets = []
+            for core_rrd, core_cgrp in core_rrds:
+                rrdfile = os.path.join(core_metrics_dir, core_rrd)
+                _ensure_rrd(rrdfile)
+                targets.append((rrdfile, core_cgrp, sys_maj_min,
+                                sys_block_dev))
 
             for svc in sys_svcs:
                 if svc in sys_svcs_no_metrics:
@@ -109,13 +189,11 @@ def init():
 
                 rrdfile = os.path.join(core_metrics_dir,
                                        '{svc}.rrd'.format(svc=svc))
-                if not os.path.exists(rrdfile):
-                    rrdclient.create(rrdfile, step, interval)
+                _ensure_rrd(rrdfile)
 
                 svc_cgrp = os.path.join('treadmill', 'core', svc)
-                rrd.update(rrdclient, rrdfile, svc_cgrp, sys_maj_min,
-                           sys_block_dev)
-                count += 1
+                targets.append((rrdfile, svc_cgrp, sys_maj_min,
+                                sys_block_dev))
 
             seen_apps = set()
             for app_dir in glob.glob('%s/*' % tm_env.apps_dir):
@@ -137,14 +215,15 @@ def init():
 
                 rrd_file = os.path.join(
                     app_metrics_dir, '{app}.rrd'.format(app=app_unique_name))
-
-                if not os.path.exists(rrd_file):
-                    rrdclient.create(rrd_file, step, interval)
+                _ensure_rrd(rrd_file)
 
                 app_cgrp = os.path.join('treadmill', 'apps', app_unique_name)
-                rrd.update(rrdclient, rrd_file, app_cgrp, blkio_major_minor,
-                           block_dev)
-                count += 1
+                targets.append((rrd_file, app_cgrp, blkio_major_minor,
+                                block_dev))
+
+            # Sample all cgroups concurrently, then send all the updates in
+            # a single batch.
+            rrdclient.batch_update(sampler.collect(targets))
 
             for app_unique_name in monitored_apps - seen_apps:
                 # Removed metrics for apps that are not present anymore
@@ -152,15 +231,35 @@ def init():
                     app_metrics_dir, '{app}.rrd'.format(app=app_unique_name))
                 _LOGGER.info('removing %r', rrd_file)
                 rrdclient.forget(rrd_file)
+                sampler.forget(rrd_file)
                 os.unlink(rrd_file)
 
             monitored_apps = seen_apps
 
             second_used = time.time() - starttime_sec
-            _LOGGER.info('Got %d cgroups metrics in %.3f seconds',
-                         count, second_used)
-            if step > second_used:
-                time.sleep(step - second_used)
+            _LOGGER.info('Got %d cgroups metrics in %.3f seconds (skew %.3f)',
+                         len(targets), second_used, skew)
+
+            # Keep a fixed cadence, skip the steps we are too late for.
+            next_cycle += step
+            now = time.time()
+            missed = 0
+            if next_cycle < now:
+                missed = int((now - next_cycle) // step) + 1
+                next_cycle += missed * step
+                _LOGGER.warning('Collection overran step %ds, skipped %d',
+                                step, missed)
+
+            _write_stats(stats_file, {
+                'timestamp': starttime_sec,
+                'step': step,
+                'count': len(targets),
+                'cycle_time': second_used,
+                'skew': skew,
+                'missed': missed,
+            })
+
+            time.sleep(max(0, next_cycle - now))
 
         # Gracefull shutdown.
         _LOGGER.info('service shutdown.')
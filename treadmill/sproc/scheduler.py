@@ -12,13 +12,16 @@ def init():
     """Return top level command handler."""
 
     @click.command()
+    @click.option('--incremental', is_flag=True, default=False,
+                  help='Only reschedule partitions that changed.')
     @click.argument('events-dir', type=click.Path(exists=True))
-    def run(events_dir):
+    def run(incremental, events_dir):
         """Run Treadmill master scheduler."""
         scheduler.DIMENSION_COUNT = 3
         cell_master = master.Master(context.GLOBAL.zk.conn,
                                     context.GLOBAL.cell,
-                                    events_dir)
+                                    events_dir,
+                                    incremental=incremental)
         cell_master.run()
 
     return run
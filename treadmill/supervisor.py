@@ -39,6 +39,7 @@ be responsible for restart and maintaining restart count.
 
 """
 
+import errno
 import glob
 import logging
 import os
@@ -52,6 +53,7 @@ from treadmill import fs
 from treadmill import s6
 from treadmill import subproc
 from treadmill import utils
+from treadmill.s6 import supervise
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -71,6 +73,9 @@ ERR_COMMAND = 111
 # s6-svc exits 100 if no s6-supervise process is running on servicedir.
 ERR_NO_SUP = 100
 
+# s6-svwait exits 99 if the timeout expired.
+ERR_TIMEOUT = 99
+
 
 def open_service(service_dir):
     """Open a service object from a service directry.
@@ -134,50 +139,52 @@ def exec_root_supervisor(directory):
         subproc.exec_pid1(['s6_svscan', directory])
 
 
+def _control_service(service_dir, commands):
+    """Send commands to the service supervisor, ignore if not supervised."""
+    try:
+        supervise.control(service_dir, commands)
+    except OSError as err:
+        if err.errno not in (errno.ENXIO, errno.ENOENT):
+            raise
+        _LOGGER.warning('%s not supervised, %r not sent.',
+                        service_dir, commands)
+
+
 def start_service(app_root, service, once=True):
     """Starts a service in the app_root/services/service directory."""
     if once:
-        opt = '-o'
+        cmd = 'o'
     else:
-        opt = '-u'
-    subproc.call(['s6_svc', opt, os.path.join(app_root, service)])
+        cmd = 'u'
+    _control_service(os.path.join(app_root, service), cmd)
 
 
 def stop_service(app_root, service):
     """Stops the service and do not restart it."""
-    subproc.call(['s6_svc', '-d', os.path.join(app_root, service)])
+    _control_service(os.path.join(app_root, service), 'd')
 
 
 def kill_service(app_root, service, signal='TERM'):
     """Send the service the specified signal."""
-    signal_opts = dict([
-        ('STOP', '-p'),
-        ('CONT', '-c'),
-        ('HUP', '-h'),
-        ('ALRM', '-a'),
-        ('INT', '-i'),
-        ('TERM', '-t'),
-        ('KILL', '-k')
+    signal_cmds = dict([
+        ('STOP', 'p'),
+        ('CONT', 'c'),
+        ('HUP', 'h'),
+        ('ALRM', 'a'),
+        ('INT', 'i'),
+        ('TERM', 't'),
+        ('KILL', 'k')
     ])
 
-    if signal not in signal_opts:
+    if signal not in signal_cmds:
         utils.fatal('Unsupported signal: %s', signal)
-    opt = signal_opts[signal]
-    subproc.call(['s6_svc', opt, os.path.join(app_root, service)])
+    cmd = signal_cmds[signal]
+    _control_service(os.path.join(app_root, service), cmd)
 
 
 def is_supervisor_running(app_root, service):
     """Checks if the supervisor is running."""
-    # svok returns 0 if supervisor is running.
-    try:
-        subproc.check_call(['s6_svok', os.path.join(app_root, service)],
-                           stderr=subprocess.STDOUT)
-        return True
-    except subprocess.CalledProcessError as err:
-        _LOGGER.info('exit code: %d, %s', err.returncode, err.cmd)
-        if err.output:
-            _LOGGER.info(err.output)
-        return False
+    return supervise.is_supervised(os.path.join(app_root, service))
 
 
 def is_running(app_root, service):
@@ -187,9 +194,32 @@ def is_running(app_root, service):
 
 def get_pid(app_root, service):
     """Returns pid of the service or None if the service is not running."""
-    output = subproc.check_output(['s6_svstat',
-                                   os.path.join(app_root, service)])
-    return _parse_state(output).get('pid', None)
+    return _service_state(os.path.join(app_root, service)).get('pid', None)
+
+
+def _service_state(service_dir):
+    """Returns the state of a service (see `_parse_state`).
+
+    The supervise status is decoded directly, `s6_svstat` is only used for
+    unknown status formats.
+    """
+    try:
+        status = supervise.read_status(service_dir)
+    except ValueError:
+        _LOGGER.warning('Unknown status format, using s6_svstat: %s',
+                        service_dir)
+        return _parse_state(
+            subproc.check_output(['s6_svstat', service_dir])
+        )
+
+    actual = 'up' if status.is_up else 'down'
+    normally_down = os.path.exists(os.path.join(service_dir, 'down'))
+    return {
+        'pid': status.pid if status.is_up else None,
+        'since': int(status.stamp),
+        'state': actual,
+        'intended': 'down' if normally_down else 'up',
+    }
 
 
 def _parse_state(state):
@@ -233,14 +263,25 @@ def get_state(svcroot):
     services = glob.glob(os.path.join(svcroot, '*'))
     services_state = {}
     for service in services:
-        state = subproc.check_output(['s6_svstat', service])
-        services_state[os.path.basename(service)] = _parse_state(state)
+        services_state[os.path.basename(service)] = _service_state(service)
 
     return services_state
 
 
+_WAIT_STATES = {
+    '-u': supervise.WaitFor.up,
+    '-d': supervise.WaitFor.down,
+    '-D': supervise.WaitFor.really_down,
+}
+
+
 def _service_wait(svcroot, up_opt, any_all_opt, timeout=0, subset=None):
-    """Given services directory, wait for services to be in given state."""
+    """Given services directory, wait for services to be in given state.
+
+    :raises:
+        subprocess.CalledProcessError (ERR_TIMEOUT) if the timeout (in
+        milliseconds) expires, as `s6_svwait` does.
+    """
     services = glob.glob(os.path.join(svcroot, '*'))
     if subset is not None:
         services = [svc for svc in services if os.path.basename(svc) in subset]
@@ -248,10 +289,14 @@ def _service_wait(svcroot, up_opt, any_all_opt, timeout=0, subset=None):
     if not services:
         return
 
-    cmdline = ['s6_svwait', up_opt, '-t', str(timeout), any_all_opt] + services
-
     # This will block until service status changes or timeout expires.
-    subproc.check_call(cmdline)
+    if not supervise.wait_for(services, _WAIT_STATES[up_opt],
+                              wait_all=(any_all_opt == '-a'),
+                              timeout=timeout):
+        raise subprocess.CalledProcessError(
+            ERR_TIMEOUT,
+            ['s6_svwait', up_opt, '-t', str(timeout), any_all_opt] + services
+        )
 
 
 def wait_all_up(svcroot, timeout=0, subset=None):
@@ -459,7 +459,8 @@ class Inotify(object):
         event_buffer = os.read(self._inotify_fd, event_buffer_size)
         event_list = []
         for wd, mask, cookie, name in _parse_buffer(event_buffer):
-            wd_path = self._paths[wd]
+            # Queue overflow events are not associated with any watch.
+            wd_path = '' if wd == -1 else self._paths[wd]
             src_path = os.path.normpath(os.path.join(wd_path, name))
             inotify_event = InotifyEvent(wd, mask, cookie, src_path)
             _LOGGER.debug('Received event %r', inotify_event)
@@ -0,0 +1,412 @@
+"""Minimal rtnetlink(7) client.
+
+Network devices, addresses and routes are configured by sending rtnetlink
+requests over a single persistent AF_NETLINK socket, instead of forking
+`ip`/`brctl` for every change. Requests can be queued with ``batch`` and are
+then sent to the kernel in a single datagram.
+"""
+
+
+import contextlib
+import errno
+import itertools
+import logging
+import os
+import socket
+import struct
+
+import enum
+
+
+_LOGGER = logging.getLogger(__name__)
+
+
+###############################################################################
+# Constants copied from linux/netlink.h, linux/rtnetlink.h, linux/if_link.h
+# and linux/if_addr.h
+#
+# See man netlink(7) and rtnetlink(7) for more details.
+#
+NETLINK_ROUTE = 0
+
+NLMSG_ERROR = 2
+NLMSG_DONE = 3
+
+NLM_F_REQUEST = 0x1
+NLM_F_ACK = 0x4
+NLM_F_EXCL = 0x200
+NLM_F_CREATE = 0x400
+
+
+class RTMType(enum.IntEnum):
+    """rtnetlink message types."""
+
+    NEWLINK = 16
+    DELLINK = 17
+    SETLINK = 19
+    NEWADDR = 20
+    NEWROUTE = 24
+
+
+# Interface link attributes.
+IFLA_ADDRESS = 1
+IFLA_IFNAME = 3
+IFLA_MTU = 4
+IFLA_MASTER = 10
+IFLA_LINKINFO = 18
+IFLA_NET_NS_PID = 19
+IFLA_IFALIAS = 20
+
+IFLA_INFO_KIND = 1
+IFLA_INFO_DATA = 2
+
+VETH_INFO_PEER = 1
+
+IFLA_BR_FORWARD_DELAY = 1
+
+IFF_UP = 0x1
+
+# Address attributes.
+IFA_ADDRESS = 1
+IFA_LOCAL = 2
+
+# Route attributes.
+RTA_DST = 1
+RTA_OIF = 4
+RTA_GATEWAY = 5
+RTA_PREFSRC = 7
+
+RT_TABLE_MAIN = 254
+RTPROT_BOOT = 3
+RTN_UNICAST = 1
+
+
+class RTScope(enum.IntEnum):
+    """Address/route scopes."""
+
+    UNIVERSE = 0
+    SITE = 200
+    LINK = 253
+    HOST = 254
+    NOWHERE = 255
+
+    @classmethod
+    def parse(cls, scope):
+        """Parse scope name (as used by `ip`) or value."""
+        if isinstance(scope, str):
+            if scope == 'global':
+                return cls.UNIVERSE
+            return cls[scope.upper()]
+        return cls(scope)
+
+
+# struct nlmsghdr
+_NLMSGHDR = struct.Struct('=IHHII')
+# struct nlmsgerr (error code only, followed by the original header)
+_NLMSGERR = struct.Struct('=i')
+# struct ifinfomsg
+_IFINFOMSG = struct.Struct('=BxHiII')
+# struct ifaddrmsg
+_IFADDRMSG = struct.Struct('=BBBBi')
+# struct rtmsg
+_RTMSG = struct.Struct('=BBBBBBBBI')
+# struct rtattr
+_RTATTR = struct.Struct('=HH')
+
+_RECV_BUFSIZE = 65536
+
+
+###############################################################################
+# Message encoding
+
+def _align(length):
+    """Align length on 4 bytes boundary (NLMSG_ALIGN/RTA_ALIGN)."""
+    return (length + 3) & ~3
+
+
+def _attr(attr_type, payload):
+    """Encode a routing attribute."""
+    length = _RTATTR.size + len(payload)
+    return (
+        _RTATTR.pack(length, attr_type) +
+        payload +
+        b'\0' * (_align(length) - length)
+    )
+
+
+def _attr_str(attr_type, value):
+    """Encode a NUL terminated string attribute."""
+    return _attr(attr_type, value.encode() + b'\0')
+
+
+def _attr_u32(attr_type, value):
+    """Encode an unsigned 32 bits attribute."""
+    return _attr(attr_type, struct.pack('=I', value))
+
+
+def _attr_ipv4(attr_type, addr):
+    """Encode an IPv4 address attribute."""
+    return _attr(attr_type, socket.inet_aton(addr))
+
+
+def _ifinfomsg(index=0, flags=0, change=0):
+    """Encode an interface info message header."""
+    return _IFINFOMSG.pack(socket.AF_UNSPEC, 0, index, flags, change)
+
+
+def _link_attrs(name=None, mtu=None, alias=None, master=None, address=None,
+                netns_pid=None):
+    """Encode optional link attributes."""
+    attrs = []
+    if name is not None:
+        attrs.append(_attr_str(IFLA_IFNAME, name))
+    if mtu is not None:
+        attrs.append(_attr_u32(IFLA_MTU, mtu))
+    if alias is not None:
+        attrs.append(_attr(IFLA_IFALIAS, alias.encode()))
+    if master is not None:
+        attrs.append(_attr_u32(IFLA_MASTER, master))
+    if address is not None:
+        attrs.append(
+            _attr(IFLA_ADDRESS,
+                  bytes(bytearray(int(b, 16) for b in address.split(':'))))
+        )
+    if netns_pid is not None:
+        attrs.append(_attr_u32(IFLA_NET_NS_PID, netns_pid))
+    return b''.join(attrs)
+
+
+def _parse_prefix(addr):
+    """Parse address with optional prefix length."""
+    if addr == 'default':
+        return '0.0.0.0', 0
+    addr, _sep, prefixlen = addr.partition('/')
+    return addr, int(prefixlen) if prefixlen else 32
+
+
+###############################################################################
+# Netlink socket
+
+class RtNetlink(object):
+    """rtnetlink socket.
+
+    Every request is acknowledged by the kernel. Requests sent in the same
+    batch are processed in order, errors are raised as ``OSError`` once all
+    acknowledgments are received.
+    """
+
+    __slots__ = (
+        '_sock',
+        '_seq',
+        '_pending',
+    )
+
+    def __init__(self):
+        self._sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW,
+                                   NETLINK_ROUTE)
+        self._sock.bind((0, 0))
+        self._seq = itertools.count(1)
+        self._pending = None
+
+    def close(self):
+        """Close the netlink socket."""
+        self._sock.close()
+
+    @contextlib.contextmanager
+    def batch(self):
+        """Queue requests and send them in a single datagram on exit.
+
+        Nested batches are merged into the outermost one.
+        """
+        if self._pending is not None:
+            yield self
+            return
+
+        self._pending = []
+        try:
+            yield self
+            requests, self._pending = self._pending, None
+            self._send(requests)
+        finally:
+            self._pending = None
+
+    def _request(self, msg_type, flags, payload, desc):
+        """Send (or queue) a request."""
+        seq = next(self._seq)
+        msg = _NLMSGHDR.pack(
+            _NLMSGHDR.size + len(payload),
+            msg_type,
+            NLM_F_REQUEST | NLM_F_ACK | flags,
+            seq,
+            0
+        ) + payload
+        request = (seq, msg, desc)
+
+        if self._pending is not None:
+            self._pending.append(request)
+        else:
+            self._send([request])
+
+    def _send(self, requests):
+        """Send requests, wait for all acknowledgments."""
+        if not requests:
+            return
+
+        self._sock.send(b''.join(msg for _seq, msg, _desc in requests))
+
+        waiting = {seq: desc for seq, _msg, desc in requests}
+        errors = []
+        while waiting:
+            data = self._sock.recv(_RECV_BUFSIZE)
+            offset = 0
+            while offset + _NLMSGHDR.size <= len(data):
+                length, msg_type, _flags, seq, _pid = _NLMSGHDR.unpack_from(
+                    data, offset
+                )
+                if msg_type == NLMSG_ERROR and seq in waiting:
+                    desc = waiting.pop(seq)
+                    err, = _NLMSGERR.unpack_from(data,
+                                                 offset + _NLMSGHDR.size)
+                    if err < 0:
+                        errors.append((-err, desc))
+                elif msg_type == NLMSG_DONE:
+                    waiting.pop(seq, None)
+                offset += _align(length) if length else len(data)
+
+        if errors:
+            err, desc = errors[0]
+            raise OSError(err, os.strerror(err), desc)
+
+    def link_add_veth(self, veth0, veth1, mtu=None):
+        """Create a virtual ethernet device pair."""
+        peer = _ifinfomsg() + _link_attrs(name=veth1, mtu=mtu)
+        linkinfo = (
+            _attr_str(IFLA_INFO_KIND, 'veth') +
+            _attr(IFLA_INFO_DATA, _attr(VETH_INFO_PEER, peer))
+        )
+        self._request(
+            RTMType.NEWLINK,
+            NLM_F_CREATE | NLM_F_EXCL,
+            (_ifinfomsg() +
+             _link_attrs(name=veth0, mtu=mtu) +
+             _attr(IFLA_LINKINFO, linkinfo)),
+            'link add %s type veth peer %s' % (veth0, veth1)
+        )
+
+    def link_add_bridge(self, devname):
+        """Create a bridge device."""
+        linkinfo = _attr_str(IFLA_INFO_KIND, 'bridge')
+        self._request(
+            RTMType.NEWLINK,
+            NLM_F_CREATE | NLM_F_EXCL,
+            (_ifinfomsg() +
+             _link_attrs(name=devname) +
+             _attr(IFLA_LINKINFO, linkinfo)),
+            'link add %s type bridge' % devname
+        )
+
+    def link_del(self, devname):
+        """Delete a network device."""
+        self._request(
+            RTMType.DELLINK,
+            0,
+            _ifinfomsg() + _link_attrs(name=devname),
+            'link delete %s' % devname
+        )
+
+    def link_set(self, devname, up=None, mtu=None, alias=None, master=None,
+                 address=None, netns_pid=None):
+        """Change network device attributes.
+
+        Device is looked up by name, so it can be created in the same batch.
+        """
+        flags = change = 0
+        if up is not None:
+            change = IFF_UP
+            flags = IFF_UP if up else 0
+
+        self._request(
+            RTMType.SETLINK,
+            0,
+            (_ifinfomsg(flags=flags, change=change) +
+             _link_attrs(name=devname, mtu=mtu, alias=alias, master=master,
+                         address=address, netns_pid=netns_pid)),
+            'link set %s' % devname
+        )
+
+    def link_set_name(self, index, newname):
+        """Rename a network device."""
+        self._request(
+            RTMType.SETLINK,
+            0,
+            _ifinfomsg(index=index) + _link_attrs(name=newname),
+            'link set %d name %s' % (index, newname)
+        )
+
+    def bridge_set_forward_delay(self, devname, forward_delay):
+        """Set bridge forward delay (in seconds)."""
+        linkinfo = (
+            _attr_str(IFLA_INFO_KIND, 'bridge') +
+            _attr(IFLA_INFO_DATA,
+                  _attr_u32(IFLA_BR_FORWARD_DELAY, forward_delay * 100))
+        )
+        self._request(
+            RTMType.NEWLINK,
+            0,
+            (_ifinfomsg() +
+             _link_attrs(name=devname) +
+             _attr(IFLA_LINKINFO, linkinfo)),
+            'link set %s type bridge forward_delay %s' % (devname,
+                                                          forward_delay)
+        )
+
+    def addr_add(self, index, addr, scope=RTScope.UNIVERSE):
+        """Add an IPv4 address (with optional prefix length) to a device."""
+        ip, prefixlen = _parse_prefix(addr)
+        self._request(
+            RTMType.NEWADDR,
+            NLM_F_CREATE | NLM_F_EXCL,
+            (_IFADDRMSG.pack(socket.AF_INET, prefixlen, 0,
+                             RTScope.parse(scope), index) +
+             _attr_ipv4(IFA_LOCAL, ip) +
+             _attr_ipv4(IFA_ADDRESS, ip)),
+            'addr add %s dev %d' % (addr, index)
+        )
+
+    def route_add(self, dest, via=None, index=None, src=None, scope=None):
+        """Add an IPv4 route to the main table."""
+        ip, prefixlen = _parse_prefix(dest)
+        if scope is None:
+            # Same default as `ip route add`.
+            scope = RTScope.UNIVERSE if via is not None else RTScope.LINK
+
+        attrs = []
+        if prefixlen:
+            attrs.append(_attr_ipv4(RTA_DST, ip))
+        if via is not None:
+            attrs.append(_attr_ipv4(RTA_GATEWAY, via))
+        if index is not None:
+            attrs.append(_attr_u32(RTA_OIF, index))
+        if src is not None:
+            attrs.append(_attr_ipv4(RTA_PREFSRC, src))
+
+        self._request(
+            RTMType.NEWROUTE,
+            NLM_F_CREATE | NLM_F_EXCL,
+            (_RTMSG.pack(socket.AF_INET, prefixlen, 0, 0, RT_TABLE_MAIN,
+                         RTPROT_BOOT, RTScope.parse(scope), RTN_UNICAST, 0) +
+             b''.join(attrs)),
+            'route add %s' % dest
+        )
+
+
+def link_index(devname):
+    """Return the index of a network device.
+
+    :raises:
+        OSError (ENODEV) if the device doesn't exist.
+    """
+    try:
+        return socket.if_nametoindex(devname)
+    except OSError:
+        raise OSError(errno.ENODEV, os.strerror(errno.ENODEV), devname)
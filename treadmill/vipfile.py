@@ -3,7 +3,6 @@
 
 import errno
 
-import glob
 import logging
 import os
 
@@ -13,9 +12,53 @@ from . import fs
 _LOGGER = logging.getLogger(__name__)
 
 
+#: Number of addresses in the 192.168.0.0/16 pool.
+_POOL_SIZE = 256 ** 2
+
+
+def _index_ip(index):
+    """Return the IP address of a pool index."""
+    return '192.168.{major}.{minor}'.format(major=(index >> 8),
+                                            minor=(index % 256))
+
+
+def _ip_index(ip):
+    """Return the pool index of an IP address, None if not in the pool."""
+    try:
+        octets = [int(octet) for octet in ip.split('.')]
+    except ValueError:
+        return None
+    if len(octets) != 4 or octets[:2] != [192, 168]:
+        return None
+    major, minor = octets[2:]
+    if not (0 <= major < 256 and 0 <= minor < 256):
+        return None
+    return (major << 8) + minor
+
+
+def _is_reserved(index):
+    """Check if pool index is reserved (x.x.128.x and x.x.x.0 addresses)."""
+    return (index >> 8) == 128 or (index % 256) == 0
+
+
+#: Allocation map with only the reserved addresses marked as used.
+_RESERVED_MAP = bytes(
+    bytearray(
+        _is_reserved(index) for index in range(0, _POOL_SIZE)
+    )
+)
+
+
 class VipMgr(object):
     """VIP allocation manager.
 
+    Allocated VIPs are symlinks in the base directory, pointing to their
+    owner. Symlinks are the durable record and creating one is what
+    atomically grabs an IP. An allocation map (one byte per address of the
+    pool), loaded from the directory once, is only used to pick a free IP
+    without probing the allocated ones. Allocations start from a rotating
+    cursor, so recently freed IPs are not reused right away.
+
     :param basepath:
         Base directory that will contain all the allocated VIPs.
     :type basepath:
@@ -24,6 +67,8 @@ class VipMgr(object):
     __slots__ = (
         '_base_path',
         '_owner_path',
+        '_used',
+        '_cursor',
     )
 
     def __init__(self, path, owner_path):
@@ -31,10 +76,19 @@ class VipMgr(object):
         fs.mkdir_safe(path)
         self._base_path = os.path.realpath(path)
         self._owner_path = os.path.realpath(owner_path)
+        self._cursor = 0
+        self._used = bytearray(_RESERVED_MAP)
+        for name in os.listdir(self._base_path):
+            index = _ip_index(name)
+            if index is not None:
+                self._used[index] = 1
 
     def initialize(self):
         """Initialize the vip folder."""
-        map(os.unlink, glob.glob(os.path.join(self._base_path, '*')))
+        for name in os.listdir(self._base_path):
+            os.unlink(os.path.join(self._base_path, name))
+        self._used = bytearray(_RESERVED_MAP)
+        self._cursor = 0
 
     def alloc(self, owner, picked_ip=None):
         """Atomically allocates virtual IP pair for the container.
@@ -45,22 +99,21 @@ class VipMgr(object):
                                 picked_ip, owner)
             return picked_ip
 
-        for index in range(0, 256**2):
-            major, minor = (index >> 8), (index % 256)
-            if major in [128, 256]:
-                continue
-            if minor in [0, 256]:
-                continue
-            ip = '192.168.{major}.{minor}'.format(major=major, minor=minor)
-            if not self._alloc(owner, ip):
-                continue
-            # We were able to grab the IP.
-            break
-
-        else:
-            raise Exception('Unabled to find free IP for %r', owner)
-
-        return ip
+        # Search from the cursor to the end of the pool, then wrap around.
+        # Each candidate is grabbed with a symlink, the map is only a hint:
+        # an address taken outside of this manager fails with EEXIST and is
+        # marked as used.
+        for start, end in ((self._cursor, _POOL_SIZE), (0, self._cursor)):
+            index = self._used.find(0, start, end)
+            while index != -1:
+                ip = _index_ip(index)
+                if self._alloc(owner, ip):
+                    # We were able to grab the IP.
+                    self._cursor = (index + 1) % _POOL_SIZE
+                    return ip
+                index = self._used.find(0, index + 1, end)
+
+        raise Exception('Unabled to find free IP for %r', owner)
 
     def free(self, owner, owned_ip):
         """Atomically frees virtual IP associated with the container.
@@ -73,10 +126,12 @@ class VipMgr(object):
                                  owner, owned_ip)
                 return
             os.unlink(path)
+            self._mark(owned_ip, 0)
             _LOGGER.debug('Freed %r', owned_ip)
 
         except OSError as err:
             if err.errno == errno.ENOENT:
+                self._mark(owned_ip, 0)
                 _LOGGER.exception('Freed unallocated ip %r', owned_ip)
             else:
                 raise
@@ -84,10 +139,8 @@ class VipMgr(object):
     def garbage_collect(self):
         """Garbage collect all VIPs without owner.
         """
-        allocated = glob.glob(
-            os.path.join(self._base_path, '*')
-        )
-        for link in allocated:
+        for name in os.listdir(self._base_path):
+            link = os.path.join(self._base_path, name)
             try:
                 _link_st = os.stat(link)  # noqa: F841
             except OSError as err:
@@ -100,6 +153,7 @@ class VipMgr(object):
                             pass
                         else:
                             raise
+                    self._mark(name, 0)
                 else:
                     raise
 
@@ -107,21 +161,24 @@ class VipMgr(object):
         """List all allocated IPs and their owner
         """
         ips = []
-        allocated = glob.glob(
-            os.path.join(self._base_path, '*')
-        )
-        for link in allocated:
+        for name in os.listdir(self._base_path):
             try:
-                ip_owner = os.readlink(link)
+                ip_owner = os.readlink(os.path.join(self._base_path, name))
             except OSError as err:
                 if err.errno == errno.EINVAL:
                     # not a link
                     continue
                 raise
-            ips.append((os.path.basename(link), os.path.basename(ip_owner)))
+            ips.append((name, os.path.basename(ip_owner)))
 
         return ips
 
+    def _mark(self, ip, used):
+        """Mark pool IP as used/free in the allocation map."""
+        index = _ip_index(ip)
+        if index is not None and not _is_reserved(index):
+            self._used[index] = used
+
     def _alloc(self, owner, new_ip):
         """Atomaticly grab an IP for an owner.
         """
@@ -132,6 +189,8 @@ class VipMgr(object):
             _LOGGER.debug('Allocated %r for %r', new_ip, owner)
         except OSError as err:
             if err.errno == errno.EEXIST:
+                self._mark(new_ip, 1)
                 return False
             raise
+        self._mark(new_ip, 1)
         return True
@@ -17,6 +17,7 @@ ENDPOINTS = '/endpoints'
 EVENTS = '/events'
 IDENTITY_GROUPS = '/identity-groups'
 PLACEMENT = '/placement'
+PLACEMENT_DELTAS = '/placement.deltas'
 RUNNING = '/running'
 SCHEDULED = '/scheduled'
 SCHEDULER = '/scheduler'
@@ -108,6 +109,7 @@ path = collections.namedtuple('path', """
     chroot
     event
     placement
+    placement_delta
     running
     scheduled
     scheduler
@@ -134,6 +136,7 @@ path.event = _make_path_f(EVENTS)
 path.identity_group = _make_path_f(IDENTITY_GROUPS)
 path.partition = _make_path_f(PARTITIONS)
 path.placement = _make_path_f(PLACEMENT)
+path.placement_delta = _make_path_f(PLACEMENT_DELTAS)
 path.reboot = _make_path_f(REBOOTS)
 path.running = _make_path_f(RUNNING)
 path.scheduled = _make_path_f(SCHEDULED)
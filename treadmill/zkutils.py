@@ -4,8 +4,10 @@ import sys
 
 import os
 
+import concurrent.futures
 import fnmatch
 import importlib
+import json
 import logging
 import pickle
 import threading
@@ -28,9 +30,28 @@ logging.getLogger('kazoo.client').setLevel(logging.WARNING)
 
 # This is the maximum time the start will try to connect for, i.e. 30 sec
 ZK_MAX_CONNECTION_START_TIMEOUT = 30
+
+# Max size of the single transaction request, well below the default
+# jute.maxbuffer (1M) of the Zookeeper server.
+ZK_MAX_TRANSACTION_SIZE = 512 * 1024
+
+# Estimated size of the transaction operation header and acl.
+_TRANSACTION_OP_OVERHEAD = 256
+
+# Max number of requests in flight when reading nodes in bulk.
+ZK_MAX_INFLIGHT = 64
+
 _VAGRANT_PROFILE = 'vagrant'
 _ZK_PLUGIN_MOD = None
 
+# libyaml based loader/dumper are order of magnitude faster, fallback to pure
+# python implementation if libyaml is not installed.
+_YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+_YAML_DUMPER = getattr(yaml, 'CSafeDumper', yaml.SafeDumper)
+
+# Loader for nodes with python specific tags, written by the default dumper.
+_YAML_FULL_LOADER = getattr(yaml, 'FullLoader', yaml.Loader)
+
 if os.environ.get('TREADMILL_PROFILE', None) != _VAGRANT_PROFILE:
     try:
         _ZK_PLUGIN_MOD = importlib.import_module(
@@ -369,14 +390,105 @@ def watch_sequence(zkclient, path, func, delim='-', pattern=None,
             watcher.invoke_callback(path, node)
 
 
+class _YamlDumper(_YAML_DUMPER):
+    """YAML dumper, representing tuples as lists."""
+    # pylint: disable=too-many-ancestors
+    pass
+
+
+_YamlDumper.add_representer(
+    tuple,
+    lambda dumper, data: dumper.represent_list(list(data))
+)
+
+
+class YamlCodec(object):
+    """YAML node payload codec."""
+
+    name = 'yaml'
+
+    @staticmethod
+    def dumps(data):
+        """Serialize data.
+
+        Flow style is set explicitly, so the payload does not depend on the
+        PyYAML version (its default changed in 5.1).
+        """
+        return yaml.dump(data, Dumper=_YamlDumper,
+                         default_flow_style=None).encode()
+
+    @staticmethod
+    def loads(payload):
+        """Parse payload."""
+        try:
+            return yaml.load(payload, Loader=_YAML_LOADER)
+        except yaml.constructor.ConstructorError:
+            return yaml.load(payload, Loader=_YAML_FULL_LOADER)
+
+
+class JsonCodec(object):
+    """JSON node payload codec."""
+
+    name = 'json'
+
+    @staticmethod
+    def dumps(data):
+        """Serialize data."""
+        return json.dumps(data, separators=(',', ':')).encode()
+
+    @staticmethod
+    def loads(payload):
+        """Parse payload."""
+        if isinstance(payload, bytes):
+            payload = payload.decode()
+        return json.loads(payload)
+
+
+_CODECS = {codec.name: codec for codec in [YamlCodec, JsonCodec]}
+
+# Codec used to serialize new node data. Nodes are always parsed according
+# to the detected format, so the codec can be changed without migration.
+_CODEC = _CODECS[os.environ.get('TREADMILL_ZK_CODEC', YamlCodec.name)]
+
+
+def set_codec(name):
+    """Set codec used to serialize node data (yaml or json)."""
+    global _CODEC  # pylint: disable=global-statement
+    _CODEC = _CODECS[name]
+
+
+def _is_json(payload):
+    """Check if payload looks like JSON object or array."""
+    payload = payload.lstrip()
+    if isinstance(payload, bytes):
+        return payload[:1] in (b'{', b'[')
+    return payload[:1] in ('{', '[')
+
+
+def loads(payload):
+    """Parse node payload, JSON or YAML.
+
+    JSON parser is tried first for payload that looks like JSON, YAML
+    flow style is parsed by YAML codec if JSON parser fails.
+    """
+    if _is_json(payload):
+        try:
+            return JsonCodec.loads(payload)
+        except ValueError:
+            pass
+    return YamlCodec.loads(payload)
+
+
 def _payload(data=None):
-    """Converts payload to yaml."""
+    """Converts payload to bytes, serialize data with current codec."""
     payload = b''
     if data is not None:
-        if isinstance(data, str):
+        if isinstance(data, bytes):
+            payload = data
+        elif isinstance(data, str):
             payload = data.encode()
         else:
-            payload = yaml.dump(data).encode()
+            payload = _CODEC.dumps(data)
     return payload
 
 
@@ -448,13 +560,13 @@ def update(zkclient, path, data, check_content=False):
 
 
 def get(zkclient, path, watcher=None, strict=True, need_metadata=False):
-    """Read content of Zookeeper node and return YAML parsed object."""
+    """Read content of Zookeeper node and return parsed object."""
     data, metadata = zkclient.get(path, watch=watcher)
 
     result = None
     if data is not None:
         try:
-            result = yaml.load(data)
+            result = loads(data)
         except yaml.YAMLError:
             if strict:
                 raise
@@ -481,6 +593,53 @@ def get_default(zkclient, path, watcher=None, strict=True, need_metadata=False,
             return default
 
 
+def map_concurrent(func, items, max_inflight=None):
+    """Apply func to each item concurrently, return results in order.
+
+    Zookeeper client pipelines requests over single connection, so running
+    at most max_inflight (default ZK_MAX_INFLIGHT) blocking calls at a time
+    hides the round trip latency. Exception raised by func is propagated.
+    """
+    if max_inflight is None:
+        max_inflight = ZK_MAX_INFLIGHT
+
+    items = list(items)
+    if len(items) <= 1 or max_inflight <= 1:
+        return [func(item) for item in items]
+
+    workers = min(max_inflight, len(items))
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(func, items))
+
+
+def get_many(zkclient, paths, strict=True, default=None, max_inflight=None):
+    """Read content of Zookeeper nodes concurrently, return parsed objects.
+
+    Missing nodes are returned as default.
+    """
+    return map_concurrent(
+        lambda path: get_default(zkclient, path, strict=strict,
+                                 default=default),
+        paths,
+        max_inflight=max_inflight
+    )
+
+
+def get_children_many(zkclient, paths, default=None, max_inflight=None):
+    """Get children of Zookeeper nodes concurrently.
+
+    Missing nodes are returned as default.
+    """
+    def _get_children(path):
+        """Get node children, default if node does not exist."""
+        try:
+            return zkclient.get_children(path)
+        except kazoo.client.NoNodeError:
+            return default
+
+    return map_concurrent(_get_children, paths, max_inflight=max_inflight)
+
+
 def get_children_count(zkclient, path, exc_safe=True):
     """Gets the node children count."""
     try:
@@ -530,6 +689,112 @@ def ensure_deleted(zkclient, path, recursive=True):
         _LOGGER.debug('Node %s does not exist.', path)
 
 
+def _transaction_chunks(ops, max_size):
+    """Split operations into chunks that fit in single transaction."""
+    chunk = []
+    chunk_size = 0
+    for op in ops:
+        op_size = len(op[1]) + _TRANSACTION_OP_OVERHEAD
+        if len(op) > 2:
+            op_size += len(_payload(op[2]))
+
+        if chunk and chunk_size + op_size > max_size:
+            yield chunk
+            chunk = []
+            chunk_size = 0
+
+        chunk.append(op)
+        chunk_size += op_size
+
+    if chunk:
+        yield chunk
+
+
+def _apply_op(zkclient, op):
+    """Apply single operation outside of transaction."""
+    if op[0] == 'delete':
+        ensure_deleted(zkclient, op[1])
+    else:
+        _op, path, data, acl = op
+        put(zkclient, path, data, acl=acl)
+
+
+def apply_transactions(zkclient, ops, max_size=ZK_MAX_TRANSACTION_SIZE):
+    """Apply operations in order, in chunked transactions.
+
+    Operations are tuples of:
+
+      - ('delete', path)
+      - ('create', path, data, acl)
+      - ('set', path, data, acl)
+
+    Chunks are committed in order, each chunk is atomic. If a chunk fails
+    (e.g. node to create already exists or node to delete does not), it is
+    applied one operation at a time with ensure_deleted/put.
+
+    Returns number of transactions committed.
+    """
+    count = 0
+    for chunk in _transaction_chunks(ops, max_size):
+        transaction = zkclient.transaction()
+        for op in chunk:
+            if op[0] == 'delete':
+                transaction.delete(op[1])
+            elif op[0] == 'create':
+                _op, path, data, acl = op
+                transaction.create(path, _payload(data),
+                                   acl=make_default_acl(acl))
+            else:
+                _op, path, data, _acl = op
+                transaction.set_data(path, _payload(data))
+
+        results = transaction.commit()
+        count += 1
+
+        if any(isinstance(result, Exception) for result in results):
+            errors = [
+                (op[:2], result) for op, result in zip(chunk, results)
+                if (isinstance(result, Exception) and
+                    not isinstance(result, kazoo.exceptions.RolledBackError))
+            ]
+            _LOGGER.info('Transaction failed: %r, applying %d operations.',
+                         errors, len(chunk))
+            for op in chunk:
+                _apply_op(zkclient, op)
+
+    return count
+
+
+def create_sequential(zkclient, path, data, count, acl=None,
+                      max_size=ZK_MAX_TRANSACTION_SIZE):
+    """Create count sequential nodes with the same data, return their paths.
+
+    Nodes are created in chunked transactions. If a chunk fails (e.g. parent
+    node does not exist), it is created one node at a time with put.
+    """
+    payload = _payload(data)
+    realacl = make_default_acl(acl)
+
+    created = []
+    ops = [('create', path, payload, acl)] * count
+    for chunk in _transaction_chunks(ops, max_size):
+        transaction = zkclient.transaction()
+        for _op in chunk:
+            transaction.create(path, payload, acl=realacl, sequence=True)
+
+        results = transaction.commit()
+        if any(isinstance(result, Exception) for result in results):
+            _LOGGER.info('Transaction failed: %r, creating %d nodes.',
+                         results[0], len(chunk))
+            results = [
+                put(zkclient, path, payload, acl=acl, sequence=True)
+                for _op in chunk
+            ]
+        created.extend(results)
+
+    return created
+
+
 def exists(zk_client, zk_path, timeout=60):
     """wrapping the zk exists function with timeout"""
     node_created_event = threading.Event()